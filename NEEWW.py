@@ -6,6 +6,10 @@ from datetime import datetime
 from PIL import Image
 import tempfile
 import os
+from expense_store import get_store
+from categorizer import categorize_expense
+
+PAGE_SIZE = 50  # expenses per page in the history and delete views
 
 # --- Moonstone & Dark Denim Color Theme ---
 PRIMARY_COLOR = "#4A6572"  # Dark Denim
@@ -80,42 +84,48 @@ OCR_ENABLED = False   # Control variable
 # -------------------------------
 # 2. ANALYTICS ENGINE
 # -------------------------------
-def categorize_expense(description):
-    """Categorize expenses based on description."""
-    if not description:
-        return 'Other'
-        
-    description_lower = description.lower()
-    categories = {
-        'Food': ['coffee', 'mcdonald', 'kfc', 'restaurant', 'food', 'grocery', 'supermarket', 'cafe'],
-        'Transport': ['shell', 'gas', 'petrol', 'metro', 'bus', 'uber', 'transport', 'fuel', 'taxi'],
-        'Entertainment': ['cine', 'movie', 'netflix', 'entertain', 'concert', 'game'],
-        'Utilities': ['rent', 'electric', 'water', 'internet', 'bill', 'wifi'],
-        'Shopping': ['mall', 'clothes', 'amazon', 'store', 'shop']
-    }
-    
-    for category, keywords in categories.items():
-        if any(keyword in description_lower for keyword in keywords):
-            return category
-    return 'Other'
+# categorize_expense comes from categorizer.py (keyword rules compiled into one regex,
+# the served model, if any, for descriptions no rule matches)
+
+def expense_pager(key):
+    """
+    Search box + page controls over the expense store. Returns the current
+    page (newest first, indexed by expense ID); only that page is fetched
+    and rendered, however long the history is.
+    """
+    search = st.text_input("🔎 Search descriptions", key=f"{key}_search").strip()
+    page_key = f"{key}_page"
+    if st.session_state.get(f"{key}_last_search") != search:
+        st.session_state[f"{key}_last_search"] = search
+        st.session_state[page_key] = 0
+    page_number = st.session_state.get(page_key, 0)
 
-def load_data():
-    """Load expense data from CSV."""
-    try:
-        return pd.read_csv('expenses.csv', parse_dates=['Date'])
-    except FileNotFoundError:
-        return pd.DataFrame(columns=['Date', 'Description', 'Amount', 'Category'])
+    # One extra row tells us whether there's a next page without counting matches.
+    expenses = store.page(offset=page_number * PAGE_SIZE, limit=PAGE_SIZE + 1, search=search or None)
+    has_next = len(expenses) > PAGE_SIZE
+    expenses = expenses.iloc[:PAGE_SIZE]
 
-def save_data(df):
-    """Save DataFrame to CSV."""
-    df.to_csv('expenses.csv', index=False)
+    prev_col, info_col, next_col = st.columns([1, 3, 1])
+    if prev_col.button("⬅️ Previous", key=f"{key}_prev", disabled=page_number == 0):
+        st.session_state[page_key] = page_number - 1
+        st.rerun()
+    if next_col.button("Next ➡️", key=f"{key}_next", disabled=not has_next):
+        st.session_state[page_key] = page_number + 1
+        st.rerun()
+    if search:
+        info_col.caption(f"Page {page_number + 1} of matches for “{search}”")
+    else:
+        total_pages = max(1, -(-store.count() // PAGE_SIZE))
+        info_col.caption(f"Page {page_number + 1} of {total_pages}")
+    return expenses
 
 # -------------------------------
 # 3. THE HUB (Streamlit UI)
 # -------------------------------
-# Initialize session state
-if 'df_expenses' not in st.session_state:
-    st.session_state.df_expenses = load_data()
+# Shared expense store (journaled CSV or SQLite, see BUDGETBEE_STORAGE);
+# refresh picks up expenses added by other sessions since the last rerun
+store = get_store()
+store.refresh()
 
 # Page Config
 st.set_page_config(page_title="BudgetBee - Premium Tracker", layout="wide", page_icon="🐝")
@@ -139,25 +149,26 @@ page = st.sidebar.radio("Navigate", ["📊 Dashboard", "💸 Add Expense", "📷
 if page == "📊 Dashboard":
     st.header("📊 Financial Dashboard")
     
-    if not st.session_state.df_expenses.empty:
+    summary = store.summary()
+    if summary['count']:
         # Metrics Cards
         col1, col2, col3 = st.columns(3)
         with col1:
             st.markdown(f"""
             <div class='metric-card'>
                 <h3>Total Expenses</h3>
-                <h2>${st.session_state.df_expenses['Amount'].sum():.2f}</h2>
+                <h2>${summary['total']:.2f}</h2>
             </div>
             """, unsafe_allow_html=True)
         with col2:
             st.markdown(f"""
             <div class='metric-card'>
                 <h3>Total Transactions</h3>
-                <h2>{len(st.session_state.df_expenses)}</h2>
+                <h2>{summary['count']}</h2>
             </div>
             """, unsafe_allow_html=True)
         with col3:
-            avg_expense = st.session_state.df_expenses['Amount'].mean()
+            avg_expense = summary['average']
             st.markdown(f"""
             <div class='metric-card'>
                 <h3>Average Expense</h3>
@@ -167,13 +178,18 @@ if page == "📊 Dashboard":
 
         # Expenses Table
         st.subheader("💰 Expense History")
-        st.dataframe(st.session_state.df_expenses.style.format({'Amount': '${:.2f}'}), use_container_width=True)
+        history_page = expense_pager("history")
+        st.dataframe(history_page.style.format({'Amount': '${:.2f}'}), use_container_width=True)
 
         # Spending by Category Chart
         st.subheader("📈 Spending by Category")
-        category_totals = st.session_state.df_expenses.groupby('Category')['Amount'].sum()
+        category_totals = store.category_totals()
         st.bar_chart(category_totals)
 
+        # Spending by Month Chart
+        st.subheader("📅 Spending by Month")
+        st.bar_chart(store.month_totals())
+
     else:
         st.info("No expenses recorded yet. Add some via 'Add Expense'!")
 
@@ -194,10 +210,7 @@ elif page == "💸 Add Expense":
         
         if submitted:
             if desc and amount > 0:
-                new_row = pd.DataFrame([[date, desc, amount, category]], 
-                                      columns=['Date', 'Description', 'Amount', 'Category'])
-                st.session_state.df_expenses = pd.concat([st.session_state.df_expenses, new_row], ignore_index=True)
-                save_data(st.session_state.df_expenses)
+                store.add(date, desc, amount, category)
                 st.markdown(f"""
                 <div class='success-message'>
                     ✅ Expense added successfully! ${amount:.2f} for {desc}
@@ -238,10 +251,7 @@ elif page == "📷 Receipt Scanner":
                     vendor_text = f" at {receipt_vendor}" if receipt_vendor else ""
                     desc = f"{receipt_description}{vendor_text}"
                     
-                    new_row = pd.DataFrame([[receipt_date, desc, receipt_total, receipt_category]], 
-                                          columns=['Date', 'Description', 'Amount', 'Category'])
-                    st.session_state.df_expenses = pd.concat([st.session_state.df_expenses, new_row], ignore_index=True)
-                    save_data(st.session_state.df_expenses)
+                    store.add(receipt_date, desc, receipt_total, receipt_category)
                     
                     st.markdown(f"""
                     <div class='success-message'>
@@ -256,29 +266,29 @@ elif page == "📷 Receipt Scanner":
 elif page == "⚙️ Manage Expenses":
     st.header("⚙️ Manage Expenses")
     
-    if not st.session_state.df_expenses.empty:
+    if store.count():
         st.subheader("Current Expenses")
-        st.dataframe(st.session_state.df_expenses.style.format({'Amount': '${:.2f}'}), use_container_width=True)
+        expense_page = expense_pager("manage")
+        st.dataframe(expense_page.style.format({'Amount': '${:.2f}'}), use_container_width=True)
         
         st.subheader("🗑️ Delete Expenses")
         
-        # Option 1: Delete by selection
-        expense_options = [f"{row['Date']} - {row['Description']} (${row['Amount']})" 
-                          for _, row in st.session_state.df_expenses.iterrows()]
+        # Option 1: Delete by selection (options are stable expense IDs from this page)
+        expense_labels = {
+            expense_id: f"{row.Date.date() if pd.notna(row.Date) else 'no date'} - {row.Description} (${row.Amount:.2f})"
+            for expense_id, row in zip(expense_page.index, expense_page.itertuples(index=False))
+        }
+        selected_id = st.selectbox("Select expense to delete:", list(expense_labels),
+                                   format_func=expense_labels.get)
         
-        selected_expense = st.selectbox("Select expense to delete:", expense_options)
-        
-        if st.button("🚮 Delete Selected Expense", type="secondary"):
-            # Find the index of the selected expense
-            selected_index = expense_options.index(selected_expense)
-            
+        if st.button("🚮 Delete Selected Expense", type="secondary", disabled=selected_id is None):
             # Get the description for confirmation
-            expense_desc = st.session_state.df_expenses.iloc[selected_index]['Description']
-            expense_amount = st.session_state.df_expenses.iloc[selected_index]['Amount']
+            expense_id = selected_id
+            expense_desc = expense_page.loc[expense_id, 'Description']
+            expense_amount = expense_page.loc[expense_id, 'Amount']
             
             # Remove the expense
-            st.session_state.df_expenses = st.session_state.df_expenses.drop(selected_index).reset_index(drop=True)
-            save_data(st.session_state.df_expenses)
+            store.delete(expense_id)
             
             st.markdown(f"""
             <div class='success-message'>
@@ -290,8 +300,7 @@ elif page == "⚙️ Manage Expenses":
         # Option 2: Clear all data
         st.subheader("🔄 Reset All Data")
         if st.button("🧹 Clear All Expenses", type="primary"):
-            st.session_state.df_expenses = pd.DataFrame(columns=['Date', 'Description', 'Amount', 'Category'])
-            save_data(st.session_state.df_expenses)
+            store.clear()
             st.success("All expenses have been cleared!")
             st.rerun()
             
@@ -0,0 +1,114 @@
+# aggregates.py - Running dashboard totals maintained on add / delete
+#
+# Usage (consistency check against the raw expenses):
+#   python aggregates.py [--backend csv|sqlite] [--path expenses.csv] [--repair]
+import argparse
+import math
+
+
+def to_cents(amount):
+    """Amount in integer cents, rounding half away from zero like SQLite's ROUND."""
+    cents = abs(float(amount)) * 100
+    return int(math.copysign(math.floor(cents + 0.5), float(amount)))
+
+
+class ExpenseAggregates:
+    """
+    Total, count, per-category and per-month sums, kept in integer cents so
+    repeated add/remove never drifts. Every update is O(1).
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.total_cents = 0
+        self.count = 0
+        self.categories = {}  # category -> [cents, count]
+        self.months = {}      # 'YYYY-MM' -> [cents, count]
+
+    @classmethod
+    def from_rows(cls, rows):
+        aggregates = cls()
+        for row in rows:
+            aggregates.add(row)
+        return aggregates
+
+    def _bump(self, buckets, key, cents, count):
+        bucket = buckets.setdefault(key, [0, 0])
+        bucket[0] += cents
+        bucket[1] += count
+        if bucket[1] == 0:
+            del buckets[key]
+
+    def _apply(self, row, sign):
+        cents = sign * to_cents(row['Amount'])
+        self.total_cents += cents
+        self.count += sign
+        self._bump(self.categories, row['Category'], cents, sign)
+        self._bump(self.months, str(row['Date'])[:7], cents, sign)
+
+    def add(self, row):
+        self._apply(row, 1)
+
+    def remove(self, row):
+        self._apply(row, -1)
+
+    def snapshot(self):
+        """Plain-dict view used for comparisons and by the stores."""
+        return {
+            'total_cents': self.total_cents,
+            'count': self.count,
+            'categories': {key: tuple(value) for key, value in self.categories.items()},
+            'months': {key: tuple(value) for key, value in self.months.items()},
+        }
+
+
+def diff_snapshots(expected, actual):
+    """Human-readable differences between two aggregate snapshots."""
+    problems = []
+    for field in ('total_cents', 'count'):
+        if expected[field] != actual[field]:
+            problems.append(f"{field}: expected {expected[field]}, maintained {actual[field]}")
+    for section in ('categories', 'months'):
+        for key in sorted(set(expected[section]) | set(actual[section])):
+            want = expected[section].get(key, (0, 0))
+            have = actual[section].get(key, (0, 0))
+            if want != have:
+                problems.append(f"{section}[{key}]: expected {want}, maintained {have}")
+    return problems
+
+
+def check_consistency(store):
+    """Rebuilds the aggregates and rollups from the store's raw rows and lists any mismatches."""
+    from rollups import SpendingRollups, diff_rollups
+
+    store.refresh()
+    rows = store.rows()
+    problems = diff_snapshots(ExpenseAggregates.from_rows(rows).snapshot(), store.aggregates_snapshot())
+    return problems + diff_rollups(SpendingRollups.from_rows(rows).snapshot(), store.rollups_snapshot())
+
+
+def main(argv=None):
+    from expense_store import get_store
+
+    parser = argparse.ArgumentParser(description="Check the maintained dashboard aggregates against the raw expenses.")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default=None)
+    parser.add_argument("--path", default=None)
+    parser.add_argument("--repair", action="store_true", help="rebuild the aggregates if they don't match")
+    args = parser.parse_args(argv)
+
+    store = get_store(args.path, args.backend)
+    problems = check_consistency(store)
+    for problem in problems:
+        print(problem)
+    if not problems:
+        print("Aggregates are consistent.")
+    elif args.repair:
+        store.rebuild_aggregates()
+        print("Aggregates rebuilt." if not check_consistency(store) else "Aggregates still inconsistent!")
+    return 1 if problems and not args.repair else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
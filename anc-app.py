@@ -1,9 +1,48 @@
-from flask import Flask, render_template, request
-import pandas as pd
-import joblib
+import startup
+from flask import Flask, Response, jsonify, render_template, request, stream_with_context
+import datetime
+import json
+import os
+from categorizer import HybridCategorizer
+from expense_store import get_store
+from microbatch import MicroBatcher
+from model_registry import ModelServer
+from prediction_cache import PredictionCache
+from rollups import PERIODS
 
 app = Flask(__name__)
-pipeline = joblib.load("budgetbee_pipeline.joblib")
+# Largest number of items one /v1/categorize request may carry
+app.config["MAX_BATCH_SIZE"] = int(os.environ.get("BUDGETBEE_MAX_BATCH", 10000))
+# Items per predict call (and per flush) when streaming the response
+app.config["STREAM_CHUNK_SIZE"] = int(os.environ.get("BUDGETBEE_STREAM_CHUNK", 1000))
+# Single /predict calls are coalesced for up to this long / this many items
+app.config["MICROBATCH_MAX_WAIT_MS"] = float(os.environ.get("BUDGETBEE_MICROBATCH_WAIT_MS", 5))
+app.config["MICROBATCH_MAX_BATCH"] = int(os.environ.get("BUDGETBEE_MICROBATCH_MAX", 64))
+# Prediction cache: LRU size, optional TTL (seconds) and optional shared SQLite file
+app.config["CACHE_SIZE"] = int(os.environ.get("BUDGETBEE_CACHE_SIZE", 10000))
+app.config["CACHE_TTL"] = float(os.environ["BUDGETBEE_CACHE_TTL"]) if os.environ.get("BUDGETBEE_CACHE_TTL") else None
+app.config["CACHE_DISK_PATH"] = os.environ.get("BUDGETBEE_CACHE_DB")
+startup.mark('imports')
+# Cached predictions belong to one model version and are dropped when it changes
+cache = PredictionCache(maxsize=app.config["CACHE_SIZE"],
+                        ttl=app.config["CACHE_TTL"],
+                        disk_path=app.config["CACHE_DISK_PATH"])
+# Active version from the model registry (models/), memory-mapped so every
+# worker process shares one copy; a newly activated version is loaded and
+# warmed up in the background, then swapped in without a restart
+model = ModelServer(on_switch=cache.invalidate).start()
+# Keyword rules answer what they can; only unmatched descriptions reach the model
+engine = HybridCategorizer(model)
+batcher = MicroBatcher(engine.categorize_records,
+                       max_batch=app.config["MICROBATCH_MAX_BATCH"],
+                       max_wait=app.config["MICROBATCH_MAX_WAIT_MS"] / 1000)
+startup.mark('model ready')
+
+# Time-to-first-render: the first response this process sends
+@app.after_request
+def _first_response(response):
+    startup.mark_rendered()
+    return response
 
 @app.route("/")
 def home():
@@ -14,13 +53,108 @@ def predict():
     if request.method == "POST":
         desc = request.form["description"]
         amt = request.form["amount"]
-        category = pipeline.predict([desc])[0]
+        prediction = cache.lookup(desc, batcher.predict_one)
         return render_template("result.html",
                                description=desc,
                                amount=amt,
-                               category=category)
+                               category=prediction["category"],
+                               source=prediction["source"],
+                               confidence=prediction["confidence"],
+                               model_version=prediction["model_version"])
 
-if __name__ == "__main__":
-    app.run(debug=True)
+@app.route("/v1/categorize", methods=["POST"])
+def categorize_batch():
+    """
+    JSON batch categorization. Body is a list of {"description", "amount"}
+    objects (or {"items": [...]}). The keyword rules run over the whole
+    batch and the descriptions they don't match go through one
+    pipeline.predict call; each result says which ("source") and how sure
+    it is ("confidence"). Add ?stream=1 (or Accept: application/x-ndjson)
+    to get newline-delimited JSON back, predicted and flushed in chunks.
+    """
+    payload = request.get_json(silent=True)
+    items = payload.get("items") if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        return jsonify(error="Expected a JSON list of {description, amount} objects"), 400
+
+    max_batch = app.config["MAX_BATCH_SIZE"]
+    if len(items) > max_batch:
+        return jsonify(error=f"Batch of {len(items)} items exceeds the limit of {max_batch}"), 413
+
+    descriptions = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get("description"), str):
+            return jsonify(error=f"Item {i} needs a string 'description'"), 400
+        descriptions.append(item["description"])
+
+    def result(item, prediction):
+        return {"description": item["description"], "amount": item.get("amount"), **prediction}
+
+    def predict_chunk(chunk):
+        """Predictions for `chunk` plus the model version behind them (the cache's, when the model wasn't asked)."""
+        predictions = cache.predict_many(chunk, engine.categorize_records)
+        version = next((p["model_version"] for p in predictions if p["model_version"]), cache.model_hash)
+        return predictions, version
+
+    stream = request.args.get("stream") == "1" or "application/x-ndjson" in request.headers.get("Accept", "")
+    if stream:
+        chunk = app.config["STREAM_CHUNK_SIZE"]
 
+        def generate():
+            for start in range(0, len(items), chunk):
+                predictions, _ = predict_chunk(descriptions[start:start + chunk])
+                yield "".join(json.dumps(result(item, prediction)) + "\n"
+                              for item, prediction in zip(items[start:start + chunk], predictions))
 
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    predictions, version = predict_chunk(descriptions)
+    return jsonify(count=len(items), model_version=version,
+                   results=[result(item, prediction) for item, prediction in zip(items, predictions)])
+
+@app.route("/metrics")
+def metrics():
+    """Micro-batcher histograms, prediction-cache counters, rows per categorization source, model version and startup timings (Prometheus text format)."""
+    return Response(batcher.prometheus() + cache.prometheus() + engine.prometheus() + model.prometheus()
+                    + startup.prometheus(),
+                    mimetype="text/plain; version=0.0.4")
+
+@app.route("/v1/model", methods=["GET"])
+def model_status():
+    """Served model version, whether a new one is loading, the last load error, and how many rows the rules answered."""
+    return jsonify(dict(model.status(), categorizer=engine.stats()))
+
+@app.route("/v1/spending", methods=["GET"])
+def spending_over_time():
+    """
+    Spending per day / week / month and category, read from the store's
+    maintained rollups (one row per bucket, however many expenses). Query:
+    period (day, week or month; default month), start and end (yyyy-mm-dd,
+    inclusive) or days (the last N days up to end / today), and category
+    (repeatable; default all).
+    """
+    period = request.args.get("period", "month")
+    if period not in PERIODS:
+        return jsonify(error=f"period must be one of {', '.join(PERIODS)}"), 400
+    try:
+        start, end = (datetime.date.fromisoformat(request.args[name]) if request.args.get(name) else None
+                      for name in ("start", "end"))
+        days = request.args.get("days", type=int)
+    except ValueError as e:
+        return jsonify(error=f"Bad date: {e}"), 400
+    if days:
+        end = end or datetime.date.today()
+        start = end - datetime.timedelta(days=days - 1)
+
+    store = get_store()
+    store.refresh()
+    table = store.spending(period, start, end, request.args.getlist("category") or None)
+    return jsonify(period=period,
+                   start=start.isoformat() if start else None,
+                   end=end.isoformat() if end else None,
+                   buckets=[bucket.strftime("%Y-%m-%d") for bucket in table.index],
+                   categories={category: table[category].round(2).tolist() for category in table.columns},
+                   totals=table.sum(axis=1).round(2).tolist())
+
+if __name__ == "__main__":
+    app.run(debug=True)
@@ -0,0 +1,141 @@
+# batch_ingest.py - Bulk receipt ingestion over a process pool
+#
+# Usage:
+#   python batch_ingest.py receipts/ --workers 4 --output receipts.jsonl
+#   python batch_ingest.py month_end.zip
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+# -------------------------------
+# 1. SOURCES (directory or zip of images)
+# -------------------------------
+def iter_receipt_images(source):
+    """
+    Yields (name, payload) for every receipt image in a directory or zip file.
+    Directory payloads are file paths; zip payloads are the raw image bytes.
+    """
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for file_name in sorted(files):
+                if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, file_name)
+                    yield os.path.relpath(path, source), path
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                    yield info.filename, archive.read(info)
+    else:
+        raise ValueError(f"{source} is neither a directory nor a zip file")
+
+
+# -------------------------------
+# 2. WORKER SIDE (one warm OCR reader per process)
+# -------------------------------
+def _init_worker(languages):
+    import ocr_engine
+    ocr_engine.warm_up(languages, background=False)
+
+
+def _scan_receipt(name, payload, languages, preset, use_cache, ocr_mode):
+    import ocr_cache
+    import ocr_engine
+    import receipt_image
+
+    start = time.perf_counter()
+    record = {'file': name, 'vendor': None, 'total': None, 'items': [], 'error': None}
+    try:
+        gray_image = receipt_image.load_receipt(payload)
+        parsed, report = ocr_cache.scan_receipt(
+            gray_image, lambda image: ocr_engine.readtext(image, languages), preset=preset,
+            cache=ocr_cache.get_cache(languages) if use_cache else None, ocr_mode=ocr_mode)
+        record['vendor'], record['total'], record['items'] = parsed
+        record['preset'], record['confidence'], record['cached'] = report['preset'], report['confidence'], report['cached']
+    except Exception as e:
+        record['error'] = str(e)
+    record['seconds'] = time.perf_counter() - start
+    return record
+
+
+# -------------------------------
+# 3. DRIVER (fan out, stream records back as they finish)
+# -------------------------------
+def ingest_receipts(source, workers=None, languages=('en',), stats=None, preset='auto', use_cache=True,
+                    ocr_mode='full'):
+    """
+    Scans every receipt in `source` over a pool of `workers` processes and
+    yields one record dict per image as soon as it finishes. If `stats` is a
+    dict it is kept updated with images, errors, seconds and images_per_sec.
+    """
+    workers = workers or os.cpu_count() or 1
+    languages = list(languages)
+    stats = stats if stats is not None else {}
+    stats.update({'images': 0, 'errors': 0, 'seconds': 0.0, 'images_per_sec': 0.0})
+
+    # Cap in-flight work so large zips aren't read into memory all at once.
+    max_in_flight = workers * 4
+    images = iter_receipt_images(source)
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(languages,)) as pool:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    name, payload = next(images)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(_scan_receipt, name, payload, languages, preset, use_cache, ocr_mode))
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                record = future.result()
+                stats['images'] += 1
+                stats['errors'] += record['error'] is not None
+                stats['seconds'] = time.perf_counter() - start
+                stats['images_per_sec'] = stats['images'] / stats['seconds'] if stats['seconds'] else 0.0
+                yield record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scan a directory or zip of receipt images in bulk.")
+    parser.add_argument("source", help="directory or .zip containing receipt images")
+    parser.add_argument("--workers", type=int, default=None, help="OCR worker processes (default: CPU count)")
+    parser.add_argument("--lang", action="append", dest="languages", help="OCR language (repeatable, default: en)")
+    parser.add_argument("--preset", default="auto", help="preprocessing preset (default: auto)")
+    parser.add_argument("--ocr-mode", choices=["full", "tiled"], default="full",
+                        help="'tiled' reads only the text regions of each receipt (default: full)")
+    parser.add_argument("--no-cache", action="store_true", help="always re-run OCR instead of using the OCR cache")
+    parser.add_argument("--output", help="write JSON lines here instead of stdout")
+    args = parser.parse_args(argv)
+
+    stats = {}
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for record in ingest_receipts(args.source, args.workers, args.languages or ['en'], stats, args.preset, not args.no_cache,
+                                      args.ocr_mode):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            print(f"[{stats['images']}] {record['file']}: {stats['images_per_sec']:.2f} images/sec", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Scanned {stats['images']} images ({stats['errors']} errors) in {stats['seconds']:.1f}s "
+          f"- {stats['images_per_sec']:.2f} images/sec", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# bench_categorize_api.py - Single-item /predict vs batched /v1/categorize
+#
+# Runs both routes of anc-app.py in-process through Flask's test client, so
+# the numbers cover request handling + pipeline.predict without network.
+# Needs budgetbee_pipeline.joblib in the working directory.
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_categorize_api --items 5000 --batch-size 500
+import argparse
+import importlib.util
+import os
+import statistics
+import time
+
+from benchmarks.bench_categorizer import synthetic_descriptions
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_ROOT, 'anc-app.py')
+
+
+def load_app():
+    spec = importlib.util.spec_from_file_location('anc_app', APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # result.html lives at the repo root rather than in templates/
+    module.app.jinja_loader.searchpath.append(REPO_ROOT)
+    return module.app
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(label, latencies, items, seconds):
+    print(f"{label:34} p50 {statistics.median(latencies) * 1000:8.2f} ms   "
+          f"p95 {percentile(latencies, 95) * 1000:8.2f} ms   {items / seconds:10,.0f} items/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Single-item /predict vs batched /v1/categorize")
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    app = load_app()
+    app.config["MAX_BATCH_SIZE"] = max(app.config["MAX_BATCH_SIZE"], args.batch_size)
+    client = app.test_client()
+    descriptions = synthetic_descriptions(args.items, unique_ratio=0.2)
+
+    latencies = []
+    start = time.perf_counter()
+    for desc in descriptions:
+        t = time.perf_counter()
+        client.post("/predict", data={"description": desc, "amount": "9.99"})
+        latencies.append(time.perf_counter() - t)
+    report("/predict (1 item/request)", latencies, args.items, time.perf_counter() - start)
+
+    for stream in (False, True):
+        latencies = []
+        start = time.perf_counter()
+        for i in range(0, args.items, args.batch_size):
+            batch = [{"description": d, "amount": 9.99} for d in descriptions[i:i + args.batch_size]]
+            t = time.perf_counter()
+            response = client.post("/v1/categorize" + ("?stream=1" if stream else ""), json=batch)
+            response.get_data()
+            latencies.append(time.perf_counter() - t)
+        label = f"/v1/categorize ({args.batch_size}/req{', stream' if stream else ''})"
+        report(label, latencies, args.items, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
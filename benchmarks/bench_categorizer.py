@@ -0,0 +1,68 @@
+# bench_categorizer.py - Keyword cascade vs compiled categorizer
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_categorizer --rows 1000000
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from categorizer import CATEGORY_KEYWORDS, KeywordCategorizer
+
+WORDS = ['payment', 'card', 'pos', 'online', 'ltd', 'inc', 'purchase', 'ref', 'store', 'the', 'city', 'market']
+MERCHANTS = ['Starbucks coffee', 'Uber trip', 'Netflix.com', 'Shell petrol', 'Amazon mktplace', 'KFC',
+             'Metro card', 'Rent transfer', 'Cinema city', 'Water bill', 'Zara clothes', 'Bookshop']
+
+
+def synthetic_descriptions(n, unique_ratio=0.05, seed=0):
+    """`n` descriptions, roughly `unique_ratio` of them distinct (merchants repeat)."""
+    rng = random.Random(seed)
+    pool = [
+        f"{rng.choice(WORDS).upper()} {rng.choice(MERCHANTS)} {rng.randrange(10000)} {rng.choice(WORDS)}"
+        for _ in range(max(1, int(n * unique_ratio)))
+    ]
+    return [rng.choice(pool) for _ in range(n)]
+
+
+def cascade_categorize(description):
+    """The original nested any(keyword in ...) scan, for comparison."""
+    if not description:
+        return 'Other'
+    description_lower = description.lower()
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(keyword in description_lower for keyword in keywords):
+            return category
+    return 'Other'
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keyword cascade vs compiled categorizer")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--unique-ratio", type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    descriptions = synthetic_descriptions(args.rows, args.unique_ratio)
+    series = pd.Series(descriptions)
+    categorizer = KeywordCategorizer()
+
+    expected, cascade_seconds = timed(lambda: [cascade_categorize(d) for d in descriptions])
+    single, single_seconds = timed(lambda: [categorizer.categorize(d) for d in descriptions])
+    batch, batch_seconds = timed(lambda: categorizer.categorize_many(series))
+
+    assert single == expected and batch.tolist() == expected, "compiled categorizer disagrees with the cascade"
+    print(f"rows: {args.rows:,} ({series.nunique():,} distinct)")
+    for label, seconds in [("keyword cascade", cascade_seconds),
+                           ("compiled, per item", single_seconds),
+                           ("categorize_many", batch_seconds)]:
+        print(f"{label:20} {seconds:8.3f} s  {args.rows / seconds:12,.0f} rows/s  ({cascade_seconds / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# bench_duplicates.py - Duplicate detection: one-expense checks and bulk flagging
+#
+# Builds `--rows` synthetic stored expenses (bank-style descriptions, two
+# years of dates) and times, for a mix of probes that are a stored expense
+# re-entered as a receipt a few days later and probes that match nothing:
+#
+#   scan      the full DataFrame filter a check used to need (a few probes)
+#   index     duplicates.DuplicateIndex, as ExpenseStore keeps it
+#   sqlite    SQLiteExpenseStore.find_duplicates on the (amount, date) index
+#   bulk      BulkDuplicateIndex built from the stored rows, then flagging
+#             an imported file of `--rows` rows in chunks
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_duplicates [--rows 1000000] [--probes 10000] [--no-sqlite]
+import argparse
+import os
+import random
+import shutil
+import statistics
+import string
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_categorizer import synthetic_descriptions
+from duplicates import BulkDuplicateIndex, DuplicateIndex, WINDOW_DAYS, normalize_vendor, normalize_vendors
+
+START = pd.Timestamp('2023-01-01')
+DAYS = 730
+
+
+def stored_rows(n, seed=0):
+    rng = random.Random(seed)
+    dates = (START + pd.to_timedelta(np.random.default_rng(seed).integers(0, DAYS, n), unit='D')).strftime('%Y-%m-%d')
+    return [{'ID': f"{i:016x}", 'Date': date, 'Description': description,
+             'Amount': round(rng.uniform(1, 500), 2), 'Category': 'Other'}
+            for i, (date, description) in enumerate(zip(dates, synthetic_descriptions(n, seed=seed)))]
+
+
+def as_receipt(row, rng):
+    """The same purchase entered again from a receipt: vendor only, up to WINDOW_DAYS later."""
+    date = (pd.Timestamp(row['Date']) + pd.Timedelta(days=rng.randrange(WINDOW_DAYS + 1))).strftime('%Y-%m-%d')
+    return date, f"{normalize_vendor(row['Description']).title()} (Receipt)", row['Amount']
+
+
+def probes(rows, n, seed=1):
+    """(date, description, amount, planted) - half re-entered stored expenses, half new ones."""
+    rng = random.Random(seed)
+    result = []
+    for i in range(n):
+        if i % 2 == 0:
+            result.append(as_receipt(rng.choice(rows), rng) + (True,))
+        else:
+            date = (START + pd.Timedelta(days=rng.randrange(DAYS))).strftime('%Y-%m-%d')
+            result.append((date, rng.choice(rows)['Description'], round(rng.uniform(500, 900), 2), False))
+    return result
+
+
+def time_checks(find, checks):
+    timings, hits = [], 0
+    for date, description, amount, planted in checks:
+        start = time.perf_counter()
+        found = find(date, description, amount)
+        timings.append(time.perf_counter() - start)
+        hits += bool(found) == planted
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99)], hits / len(checks)
+
+
+def report(name, median, p99, accuracy, extra=""):
+    print(f"{name:8} {median * 1e6:12,.1f} {p99 * 1e6:12,.1f} {accuracy:9.1%}  {extra}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Duplicate detection: one-expense checks and bulk flagging")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--probes", type=int, default=10_000)
+    parser.add_argument("--no-sqlite", action="store_true", help="skip the SQLite store (loading it takes a while)")
+    args = parser.parse_args(argv)
+
+    rows = stored_rows(args.rows)
+    checks = probes(rows, args.probes)
+    print(f"{args.rows:,} stored expenses, {args.probes:,} probes (half of them duplicates)\n")
+    print(f"{'check':8} {'median us':>12} {'p99 us':>12} {'correct':>9}")
+
+    frame = pd.DataFrame(rows)
+    frame['Day'] = pd.to_datetime(frame['Date']).to_numpy().astype('datetime64[D]').astype(np.int64)
+    frame['Vendor'] = normalize_vendors(frame['Description'])
+
+    def scan(date, description, amount):
+        day = pd.Timestamp(date).to_datetime64().astype('datetime64[D]').astype(np.int64)
+        mask = ((frame['Amount'] - amount).abs() < 0.005) & ((frame['Day'] - day).abs() <= WINDOW_DAYS) \
+            & (frame['Vendor'] == normalize_vendor(description))
+        return frame.index[mask].tolist()
+
+    report("scan", *time_checks(scan, checks[:20]), "(20 probes)")
+    del frame
+
+    start = time.perf_counter()
+    index = DuplicateIndex.from_rows(rows)
+    build = time.perf_counter() - start
+    tracemalloc.start()
+    traced = DuplicateIndex.from_rows(rows)
+    index_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del traced
+    report("index", *time_checks(index.find, checks), f"build {build:.1f}s, {index_bytes / 1e6:.0f} MB")
+    del index
+
+    if not args.no_sqlite:
+        from sqlite_store import SQLiteExpenseStore
+
+        workdir = tempfile.mkdtemp(prefix="budgetbee-dupes-")
+        try:
+            store = SQLiteExpenseStore(os.path.join(workdir, 'expenses.db'), import_from=os.devnull)
+            start = time.perf_counter()
+            with store.bulk_add() as add:
+                add((row['Date'], row['Description'], row['Amount'], row['Category']) for row in rows)
+            load = time.perf_counter() - start
+            report("sqlite", *time_checks(store.find_duplicates, checks), f"(load {load:.1f}s)")
+            store.close()
+        finally:
+            shutil.rmtree(workdir)
+
+    start = time.perf_counter()
+    bulk = BulkDuplicateIndex.from_rows(rows)
+    build = time.perf_counter() - start
+
+    # An imported file as long as the store: 10% re-entered expenses, the rest new
+    rng = random.Random(2)
+    imported = [as_receipt(rng.choice(rows), rng) if i % 10 == 0 else
+                ((START + pd.Timedelta(days=DAYS + rng.randrange(365))).strftime('%Y-%m-%d'),
+                 f"POS {''.join(rng.choices(string.ascii_uppercase, k=8))} {i}", round(rng.uniform(1, 500), 2))
+                for i in range(args.rows)]
+    file_frame = pd.DataFrame(imported, columns=['Date', 'Description', 'Amount'])
+    start = time.perf_counter()
+    flagged = np.concatenate([bulk.flag(chunk['Date'], chunk['Description'], chunk['Amount'])
+                              for chunk in (file_frame.iloc[i:i + 50000] for i in range(0, len(file_frame), 50000))])
+    seconds = time.perf_counter() - start
+    planted = np.arange(len(imported)) % 10 == 0
+    print(f"\nbulk     index of {args.rows:,} stored expenses built in {build:.1f}s ({bulk.keys.nbytes / 1e6:.0f} MB "
+          f"before the import)")
+    print(f"         flagged {len(imported):,} imported rows in {seconds:.2f}s ({len(imported) / seconds:,.0f} rows/s): "
+          f"{int(flagged[planted].sum()):,} of {int(planted.sum()):,} re-entered found, "
+          f"{int(flagged[~planted].sum()):,} of the rest flagged")
+
+
+if __name__ == "__main__":
+    main()
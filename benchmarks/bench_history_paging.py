@@ -0,0 +1,62 @@
+# bench_history_paging.py - Cost of one history page vs. history length
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_history_paging --rows 1000 10000 100000 1000000
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.bench_storage_formats import synthetic_rows
+from expense_store import ExpenseStore
+from sqlite_store import SQLiteExpenseStore
+
+PAGE_SIZE = 50
+
+
+def timed(fn, repeat=5):
+    """Best of `repeat` runs, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def bench_store(store, n):
+    first_page, first_ms = timed(lambda: store.page(limit=PAGE_SIZE + 1))
+    _, deep_ms = timed(lambda: store.page(offset=max(0, n - PAGE_SIZE), limit=PAGE_SIZE + 1))
+    _, search_ms = timed(lambda: store.page(limit=PAGE_SIZE + 1, search='netflix #99'))
+    _, render_ms = timed(lambda: first_page.iloc[:PAGE_SIZE].style.format({'Amount': '${:.2f}'}).to_html())
+
+    victims = iter(first_page.index)
+    _, delete_ms = timed(lambda: store.delete(next(victims)))
+    return first_ms, deep_ms, search_ms, render_ms, delete_ms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cost of one history page vs. history length")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10_000, 100_000, 1_000_000])
+    args = parser.parse_args(argv)
+
+    print(f"{'backend':8} {'rows':>10} {'page 1':>9} {'last page':>10} {'search':>9} {'render':>9} {'delete':>9}   (ms)")
+    for n in args.rows:
+        workdir = tempfile.mkdtemp(prefix="budgetbee-bench-")
+        try:
+            csv_path = os.path.join(workdir, 'expenses.csv')
+            pd.DataFrame(synthetic_rows(n)).to_csv(csv_path, index=False)
+            stores = [('csv', ExpenseStore(csv_path, use_arrow=False)),
+                      ('sqlite', SQLiteExpenseStore(os.path.join(workdir, 'expenses.db'), import_from=csv_path))]
+            for name, store in stores:
+                first_ms, deep_ms, search_ms, render_ms, delete_ms = bench_store(store, n)
+                print(f"{name:8} {n:>10,} {first_ms:9.2f} {deep_ms:10.2f} {search_ms:9.2f} {render_ms:9.2f} {delete_ms:9.2f}")
+        finally:
+            shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# bench_hybrid_categorizer.py - How much model traffic the keyword rules absorb
+#
+# Categorizes synthetic bank descriptions with a HybridCategorizer (rules
+# first, model for the rest) and with the same model answering every row
+# (what anc-app.py did before), at several shares of descriptions that no
+# keyword rule covers. The model is a small hashed char n-gram logistic
+# regression trained in-process, so predict_proba gives real confidences.
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_hybrid_categorizer [--rows 200000] [--unmatched 0.1 0.3 0.6]
+import argparse
+import random
+import time
+
+from benchmarks.bench_categorizer import MERCHANTS, WORDS
+from categorizer import HybridCategorizer, KeywordCategorizer
+
+# Merchants no keyword rule matches, with the category a person would give them
+UNMATCHED = {'Apollo pharmacy': 'Health', 'Dr Mehta clinic': 'Health', 'Indigo airlines': 'Travel',
+             'Taj hotel': 'Travel', 'Cult fitness': 'Health', 'Udemy course': 'Education',
+             'Coursera': 'Education', 'LIC premium': 'Insurance', 'Policy renewal': 'Insurance'}
+# 'store' is a Shopping keyword, so it can't pad descriptions meant to miss the rules
+FILLER = [word for word in WORDS if word != 'store']
+
+
+def descriptions(n, unmatched_share, unique_ratio=0.05, seed=0):
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(max(1, int(n * unique_ratio))):
+        merchant = rng.choice(list(UNMATCHED) if rng.random() < unmatched_share else MERCHANTS)
+        pool.append(f"{rng.choice(FILLER).upper()} {merchant} {rng.randrange(10000)} {rng.choice(FILLER)}")
+    return [rng.choice(pool) for _ in range(n)]
+
+
+def train_model(seed=0):
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import make_pipeline
+
+    rules = KeywordCategorizer()
+    rng = random.Random(seed)
+    labelled = [(merchant, rules.categorize(merchant)) for merchant in MERCHANTS] + list(UNMATCHED.items())
+    texts, labels = [], []
+    for _ in range(20):
+        for merchant, category in labelled:
+            texts.append(f"{rng.choice(FILLER)} {merchant} {rng.randrange(10000)}")
+            labels.append(category)
+    pipeline = make_pipeline(HashingVectorizer(n_features=2 ** 18, analyzer='char_wb', ngram_range=(2, 4),
+                                               alternate_sign=False),
+                             SGDClassifier(loss='log_loss', random_state=seed))
+    return pipeline.fit(texts, labels)
+
+
+def run(engine, rows):
+    start = time.perf_counter()
+    frame = engine.categorize_many(rows)
+    return frame, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="How much model traffic the keyword rules absorb")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--unmatched", type=float, nargs="+", default=[0.1, 0.3, 0.6],
+                        help="share of distinct descriptions no keyword rule covers")
+    args = parser.parse_args(argv)
+
+    model = train_model()
+    model.predict_proba(['warm up'])  # first call pays for lazy sklearn setup
+    print(f"rows per run: {args.rows:,}; model: hashed char n-grams + logistic regression")
+    print(f"{'unmatched':>9}  {'engine':12} {'seconds':>8} {'rows/s':>12} {'model inputs':>13} "
+          f"{'rules':>7} {'model':>7} {'default':>7}  absorbed")
+    for share in args.unmatched:
+        rows = descriptions(args.rows, share)
+        model_only = HybridCategorizer(model, rules={})
+        hybrid = HybridCategorizer(model)
+        results = {}
+        for label, engine in (('model only', model_only), ('hybrid', hybrid)):
+            frame, seconds = run(engine, rows)
+            stats = engine.stats()
+            results[label] = stats
+            counts = frame['Source'].value_counts()
+            absorbed = 1 - stats['model_inputs'] / max(1, results['model only']['model_inputs'])
+            print(f"{share:9.0%}  {label:12} {seconds:8.3f} {args.rows / seconds:12,.0f} {stats['model_inputs']:13,} "
+                  + " ".join(f"{counts.get(source, 0) / args.rows:7.1%}" for source in ('rules', 'model', 'default'))
+                  + f"  {absorbed:7.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# bench_model_reload.py - Prediction latency and errors while model versions switch
+#
+# Client threads predict through a ModelServer (the path anc-app.py and
+# fullCode.py use) while the active version is switched back and forth.
+# Reports failed predictions, latency percentiles with and without a switch
+# in progress, and how long each switch took from activation to serving.
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_model_reload [--switches 6] [--clients 4]
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_categorize_api import percentile
+from benchmarks.bench_startup import write_model
+from model_registry import ModelRegistry, ModelServer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prediction latency and errors while model versions switch")
+    parser.add_argument("--switches", type=int, default=6)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=0.05, help="watcher poll interval (seconds)")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="budgetbee-reload-")
+    try:
+        registry = ModelRegistry(os.path.join(workdir, 'models'))
+        versions = []
+        for n_features in (2 ** 18, 2 ** 19):
+            path = os.path.join(workdir, f'model-{n_features}.joblib')
+            write_model(path, n_features=n_features)
+            versions.append(registry.publish(path))
+        registry.activate(versions[0])
+        server = ModelServer(registry, check_interval=args.interval).start()
+
+        samples, errors, stop = [], [], threading.Event()
+        switching = threading.Event()
+
+        def client():
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    server.predict_with_version(["uber to airport"])
+                except Exception as e:
+                    errors.append(e)
+                samples.append((time.perf_counter() - start, switching.is_set()))
+
+        threads = [threading.Thread(target=client) for _ in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+
+        switch_seconds = []
+        for i in range(args.switches):
+            target = versions[(i + 1) % len(versions)]
+            switching.set()
+            start = time.perf_counter()
+            registry.activate(target)
+            while server.version != target:
+                time.sleep(0.001)
+            switch_seconds.append(time.perf_counter() - start)
+            switching.clear()
+            time.sleep(0.5)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        steady = [seconds for seconds, during in samples if not during]
+        during = [seconds for seconds, during in samples if during]
+        print(f"{len(samples)} predictions, {len(errors)} failed, {args.switches} switches")
+        print(f"switch (activate -> serving): median {statistics.median(switch_seconds) * 1000:.0f}ms, "
+              f"max {max(switch_seconds) * 1000:.0f}ms")
+        for label, latencies in (('steady', steady), ('during switch', during)):
+            if latencies:
+                print(f"  {label:14} n={len(latencies):6}  p50 {percentile(latencies, 50) * 1000:7.2f}ms  "
+                      f"p99 {percentile(latencies, 99) * 1000:7.2f}ms  max {max(latencies) * 1000:7.2f}ms")
+        server.stop()
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
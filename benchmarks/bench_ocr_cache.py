@@ -0,0 +1,60 @@
+# bench_ocr_cache.py - Repeat-scan latency with the receipt OCR cache
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_ocr_cache [--repeat 20]
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import ocr_cache
+import ocr_engine
+import receipt_image
+from benchmarks.bench_preprocessing import SAMPLE_RECEIPT
+from benchmarks.bench_upload_decode import synthetic_receipt_jpeg
+
+# Stand-in OCR output (about the size of a real receipt's) when easyocr is missing
+FAKE_RESULTS = [([[0, 20 * i], [300, 20 * i], [300, 20 * i + 18], [0, 20 * i + 18]], f"Line item {i} 3.49", 0.9)
+                for i in range(40)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Repeat-scan latency with the receipt OCR cache")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if ocr_engine.OCR_AVAILABLE:
+        ocr_engine.warm_up(background=False)
+        readtext = lambda image: ocr_engine.readtext(image, ['en'])
+    else:
+        print("easyocr not installed: misses time preprocessing + a stand-in OCR that returns instantly")
+        readtext = lambda image: FAKE_RESULTS
+
+    samples = [('sample receipt', receipt_image.load_receipt(SAMPLE_RECEIPT)),
+               ('phone 12MP', receipt_image.load_receipt(synthetic_receipt_jpeg(3024, 4032)))]
+    workdir = tempfile.mkdtemp(prefix="budgetbee-bench-")
+    try:
+        cache = ocr_cache.OCRCache(os.path.join(workdir, 'ocr_cache.db'), version=ocr_engine.model_version())
+        print(f"{'image':16} {'size':>10} {'miss':>10} {'hit':>9} {'speedup':>8}")
+        for label, image in samples:
+            start = time.perf_counter()
+            _, report = ocr_cache.scan_receipt(image, readtext, cache=cache)
+            miss_ms = (time.perf_counter() - start) * 1000
+            assert not report['cached']
+
+            hit_ms = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                _, report = ocr_cache.scan_receipt(image, readtext, cache=cache)
+                hit_ms = min(hit_ms, (time.perf_counter() - start) * 1000)
+                assert report['cached']
+            size = f"{image.shape[1]}x{image.shape[0]}"
+            print(f"{label:16} {size:>10} {miss_ms:8.1f}ms {hit_ms:7.2f}ms {miss_ms / hit_ms:7.0f}x")
+        print(cache.stats())
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
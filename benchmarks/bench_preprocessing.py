@@ -0,0 +1,63 @@
+# bench_preprocessing.py - Per-stage cost of each preprocessing preset
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_preprocessing [--ocr] [image ...]
+import argparse
+import os
+
+import cv2
+
+import preprocessing
+import receipt_image
+from benchmarks.bench_upload_decode import synthetic_receipt_jpeg
+
+SAMPLE_RECEIPT = os.path.join('smart-expense-tracker', 'receipt_image.jpg')
+
+
+def skewed(image, angle=4):
+    height, width = image.shape[:2]
+    rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(image, rotation, (width, height), borderMode=cv2.BORDER_REPLICATE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-stage cost of each preprocessing preset")
+    parser.add_argument("images", nargs="*", help=f"receipt images (default: {SAMPLE_RECEIPT} + synthetic phone photos)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--ocr", action="store_true", help="also run EasyOCR and report confidence per preset")
+    args = parser.parse_args(argv)
+
+    samples = [(path, receipt_image.load_receipt(path)) for path in args.images]
+    if not samples:
+        samples.append(('sample receipt', receipt_image.load_receipt(SAMPLE_RECEIPT)))
+        phone = receipt_image.load_receipt(synthetic_receipt_jpeg(3024, 4032))
+        samples += [('phone 12MP', phone), ('phone 12MP, 4° skew', skewed(phone))]
+
+    readtext = None
+    if args.ocr:
+        import ocr_engine
+        if not ocr_engine.OCR_AVAILABLE:
+            raise SystemExit("easyocr is not installed")
+        readtext = lambda image: ocr_engine.readtext(image, ['en'])
+
+    for label, image in samples:
+        print(f"\n{label} ({image.shape[1]}x{image.shape[0]})")
+        for preset in preprocessing.PRESETS:
+            best = None
+            for _ in range(args.repeat):
+                timings = {}
+                processed = preprocessing.preprocess(image, preset, timings)
+                if best is None or sum(timings.values()) < sum(best.values()):
+                    best = timings
+            line = f"  {preset:9} {sum(best.values()) * 1000:8.1f}ms  " + "  ".join(
+                f"{stage} {seconds * 1000:.1f}" for stage, seconds in best.items())
+            if readtext:
+                line += f"  | confidence {preprocessing.ocr_confidence(readtext(processed)):.2f}"
+            print(line)
+        if readtext:
+            _, report = preprocessing.read_receipt(image, readtext)
+            print(f"  auto -> {report['preset']} after {len(report['attempts'])} OCR pass(es), {report['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# bench_receipt_parser.py - Parse time and field accuracy, old vs line-aware parser
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_receipt_parser --receipts 2000
+import argparse
+import re
+import time
+
+import receipt_parser
+from benchmarks.receipt_corpus import corpus
+
+
+def legacy_parse_receipt(results):
+    """The position-based parser this module replaced, kept for comparison."""
+    total_amount = None
+    vendor_name = None
+    items_list = []
+    for _, text, prob in results:
+        text_clean = text.upper().replace(' ', '').replace('$', '')
+        if 'TOTAL' in text_clean and prob > 0.3:
+            numbers_found = re.findall(r'\d+\.\d{2}', text_clean)
+            if numbers_found:
+                total_amount = float(numbers_found[0])
+                break
+    for i, (_, text, prob) in enumerate(results):
+        if i < 3 and prob > 0.4 and vendor_name is None:
+            vendor_name = text
+        if prob > 0.3:
+            numbers_in_text = re.findall(r'\d+\.\d{2}', text)
+            if numbers_in_text and len(text) > 3:
+                item_desc = re.sub(r'\d+\.\d{2}', '', text).strip()
+                items_list.append({'item': item_desc, 'price': float(numbers_in_text[0])})
+            else:
+                try:
+                    next_text = results[i+1][1]
+                    if re.match(r'^\d+\.\d{2}$', next_text.strip()):
+                        items_list.append({'item': text, 'price': float(next_text)})
+                except IndexError:
+                    continue
+    return vendor_name, total_amount, items_list
+
+
+def _item_key(name, price):
+    return re.sub(r'\W', '', str(name)).lower(), round(float(price), 2)
+
+
+def score(truth, vendor, total, items):
+    """Per-field correctness; items as precision / recall over exact (name, price) pairs."""
+    expected = {_item_key(name, price) for name, price in truth['items']}
+    found = [_item_key(item['item'], item['price']) for item in items]
+    matched = len(expected & set(found))
+    return {
+        'vendor': vendor == truth['vendor'],
+        'total': total is not None and abs(total - truth['total']) < 0.005,
+        'item_precision': matched / len(found) if found else 0.0,
+        'item_recall': matched / len(expected),
+    }
+
+
+def run(parse, receipts):
+    start = time.perf_counter()
+    parsed = [parse(results) for _, results in receipts]
+    seconds = time.perf_counter() - start
+    scores = [score(truth, *fields) for (truth, _), fields in zip(receipts, parsed)]
+    summary = {field: sum(s[field] for s in scores) / len(scores) for field in scores[0]}
+    return seconds, summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse time and field accuracy, old vs line-aware parser")
+    parser.add_argument("--receipts", type=int, default=2000)
+    parser.add_argument("--noise", type=float, default=0.02, help="character garble rate on low-confidence boxes")
+    parser.add_argument("--wrap", type=float, default=0.1, help="fraction of prices printed on the next line")
+    args = parser.parse_args(argv)
+
+    receipts = list(corpus(args.receipts, noise=args.noise, wrap=args.wrap))
+    print(f"{args.receipts} synthetic receipts ({sum(len(r) for _, r in receipts)} OCR boxes)")
+    print(f"{'parser':12} {'µs/receipt':>11} {'vendor':>7} {'total':>7} {'item P':>7} {'item R':>7}")
+    for name, parse in (('legacy', legacy_parse_receipt), ('line-aware', receipt_parser.parse_receipt)):
+        seconds, summary = run(parse, receipts)
+        print(f"{name:12} {seconds / len(receipts) * 1e6:11.1f} {summary['vendor']:7.1%} {summary['total']:7.1%} "
+              f"{summary['item_precision']:7.1%} {summary['item_recall']:7.1%}")
+
+    details = [receipt_parser.parse_receipt_details(results) for _, results in receipts]
+    subtotal = sum(d['subtotal'] is not None and abs(d['subtotal'] - t['subtotal']) < 0.005
+                   for d, (t, _) in zip(details, receipts)) / len(receipts)
+    tax = sum(d['tax'] is not None and abs(d['tax'] - t['tax']) < 0.005
+              for d, (t, _) in zip(details, receipts)) / len(receipts)
+    print(f"line-aware subtotal {subtotal:.1%}, tax {tax:.1%}")
+
+
+if __name__ == "__main__":
+    main()
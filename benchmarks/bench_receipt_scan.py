@@ -0,0 +1,229 @@
+# bench_receipt_scan.py - End-to-end receipt scan benchmark and regression check
+#
+# Renders synthetic receipts with known ground truth (receipt_corpus) and
+# runs each through the scanner's path: decode -> preprocess -> OCR -> parse.
+# Reports per-stage latency percentiles, images/sec, peak RSS and field
+# accuracy. --json saves a run; --baseline compares against a saved one and
+# exits non-zero on regressions.
+#
+# Without easyocr the OCR stage answers with each receipt's simulated boxes
+# (--ocr simulated), so decode, preprocessing and parsing are still covered
+# but OCR time and accuracy are not real.
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_receipt_scan --receipts 50 --json scan.json
+#   python -m benchmarks.bench_receipt_scan --receipts 50 --baseline scan.json
+#   python -m benchmarks.bench_receipt_scan --save-corpus receipts/   # then --corpus receipts/
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import ocr_engine
+import preprocessing
+import receipt_image
+from benchmarks.bench_categorize_api import percentile
+from benchmarks.bench_receipt_parser import score
+from benchmarks.receipt_corpus import ocr_boxes, render_receipt, synthetic_receipt
+from receipt_parser import parse_receipt_details
+
+STAGES = ('decode', 'preprocess', 'ocr', 'parse', 'total')
+FIELDS = ('vendor', 'subtotal', 'tax', 'total', 'item_precision', 'item_recall')
+# Allowed slack before a metric counts as regressed
+DEFAULT_TOLERANCE = 0.15     # relative, for latency / throughput / memory
+ACCURACY_TOLERANCE = 0.01    # absolute, for field accuracy
+
+
+# -------------------------------
+# 1. CORPUS
+# -------------------------------
+def build_corpus(n, seed=0, photo_fraction=0.5):
+    """[(truth, jpeg bytes, simulated OCR boxes)]; a `photo_fraction` of them look like phone photos."""
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(n):
+        truth = synthetic_receipt(rng)
+        image = render_receipt(truth, rng, photo=rng.random() < photo_fraction)
+        samples.append((truth, image, ocr_boxes(truth, rng)))
+    return samples
+
+
+def save_corpus(path, samples):
+    """Writes receipt_NNNN.jpg files plus truth.json (ground truth and simulated OCR boxes)."""
+    os.makedirs(path, exist_ok=True)
+    manifest = []
+    for i, (truth, image, boxes) in enumerate(samples):
+        name = f"receipt_{i:04d}.jpg"
+        with open(os.path.join(path, name), 'wb') as f:
+            f.write(image)
+        manifest.append({'image': name, 'truth': truth, 'simulated_ocr': boxes})
+    with open(os.path.join(path, 'truth.json'), 'w') as f:
+        json.dump(manifest, f)
+
+
+def load_corpus(path):
+    with open(os.path.join(path, 'truth.json')) as f:
+        manifest = json.load(f)
+    samples = []
+    for entry in manifest:
+        with open(os.path.join(path, entry['image']), 'rb') as f:
+            samples.append((entry['truth'], f.read(), entry['simulated_ocr']))
+    return samples
+
+
+# -------------------------------
+# 2. RUN
+# -------------------------------
+def scan(image_bytes, readtext, preset):
+    """One receipt through the scanner's path. Returns (parsed details, {stage: seconds})."""
+    timings = {}
+    start = time.perf_counter()
+    image = receipt_image.load_receipt(image_bytes)
+    timings['decode'] = time.perf_counter() - start
+
+    results, report = preprocessing.read_receipt(image, readtext, preset=preset)
+    timings['preprocess'] = sum(sum(attempt['stages'].values()) for attempt in report['attempts'])
+    timings['ocr'] = sum(attempt['ocr_seconds'] for attempt in report['attempts'])
+
+    start = time.perf_counter()
+    details = parse_receipt_details(results)
+    timings['parse'] = time.perf_counter() - start
+    timings['total'] = sum(timings.values())
+    return details, timings
+
+
+def accuracy(truth, details):
+    fields = score(truth, details['vendor'], details['total'], details['items'])
+    for field in ('subtotal', 'tax'):
+        fields[field] = details[field] is not None and abs(details[field] - truth[field]) < 0.005
+    return fields
+
+
+def peak_rss_mb():
+    """High-water resident set size of this process, or None where `resource` is unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def run(samples, ocr, preset):
+    if ocr == 'easyocr':
+        ocr_engine.warm_up(background=False)
+        make_readtext = lambda boxes: (lambda image: ocr_engine.readtext(image, ['en']))
+    else:
+        make_readtext = lambda boxes: (lambda image: [(bbox, text, prob) for bbox, text, prob in boxes])
+
+    latencies = {stage: [] for stage in STAGES}
+    scores = []
+    start = time.perf_counter()
+    for truth, image, boxes in samples:
+        details, timings = scan(image, make_readtext(boxes), preset)
+        for stage in STAGES:
+            latencies[stage].append(timings[stage])
+        scores.append(accuracy(truth, details))
+    seconds = time.perf_counter() - start
+
+    return {
+        'config': {'receipts': len(samples), 'ocr': ocr, 'preset': preset,
+                   'ocr_model': ocr_engine.model_version() if ocr == 'easyocr' else 'simulated'},
+        'latency_ms': {stage: {'p50': percentile(values, 50) * 1000, 'p95': percentile(values, 95) * 1000,
+                               'p99': percentile(values, 99) * 1000, 'mean': sum(values) / len(values) * 1000}
+                       for stage, values in latencies.items()},
+        'images_per_second': len(samples) / seconds,
+        'peak_rss_mb': peak_rss_mb(),
+        'accuracy': {field: sum(s[field] for s in scores) / len(scores) for field in FIELDS},
+    }
+
+
+# -------------------------------
+# 3. COMPARE
+# -------------------------------
+def regressions(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Human-readable list of metrics in `current` that are worse than `baseline` beyond tolerance."""
+    found = []
+    for stage, stats in baseline['latency_ms'].items():
+        for pct in ('p50', 'p95'):
+            old, new = stats[pct], current['latency_ms'].get(stage, {}).get(pct)
+            # Sub-0.1ms stages are all timer noise
+            if new is not None and old >= 0.1 and new > old * (1 + tolerance):
+                found.append(f"{stage} {pct} {old:.2f}ms -> {new:.2f}ms")
+    old, new = baseline['images_per_second'], current['images_per_second']
+    if new < old / (1 + tolerance):
+        found.append(f"throughput {old:.1f} -> {new:.1f} images/s")
+    old, new = baseline.get('peak_rss_mb'), current.get('peak_rss_mb')
+    if old and new and new > old * (1 + tolerance):
+        found.append(f"peak RSS {old:.0f} -> {new:.0f} MB")
+    for field, old in baseline['accuracy'].items():
+        new = current['accuracy'].get(field)
+        if new is not None and new < old - ACCURACY_TOLERANCE:
+            found.append(f"{field} accuracy {old:.1%} -> {new:.1%}")
+    return found
+
+
+def print_summary(summary):
+    config = summary['config']
+    print(f"{config['receipts']} receipts, preset {config['preset']}, OCR {config['ocr_model']}")
+    print(f"{'stage':10} {'p50':>9} {'p95':>9} {'p99':>9} {'mean':>9}  (ms)")
+    for stage, stats in summary['latency_ms'].items():
+        print(f"{stage:10} " + " ".join(f"{stats[key]:9.2f}" for key in ('p50', 'p95', 'p99', 'mean')))
+    rss = summary['peak_rss_mb']
+    print(f"{summary['images_per_second']:.1f} images/s, peak RSS "
+          + (f"{rss:.0f} MB" if rss is not None else "n/a"))
+    print("accuracy  " + "  ".join(f"{field} {value:.1%}" for field, value in summary['accuracy'].items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end receipt scan benchmark and regression check")
+    parser.add_argument("--receipts", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--photo-fraction", type=float, default=0.5, help="share of receipts rendered as phone photos")
+    parser.add_argument("--corpus", help="directory written by --save-corpus to scan instead of rendering")
+    parser.add_argument("--save-corpus", help="write the rendered receipts + ground truth here")
+    parser.add_argument("--preset", default=preprocessing.AUTO, choices=[preprocessing.AUTO, *preprocessing.PRESETS])
+    parser.add_argument("--ocr", choices=['auto', 'easyocr', 'simulated'], default='auto',
+                        help="'auto' uses easyocr when installed, else the simulated boxes")
+    parser.add_argument("--json", help="write the run's metrics to this file")
+    parser.add_argument("--baseline", help="metrics JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="relative slack for latency, throughput and memory")
+    args = parser.parse_args(argv)
+
+    ocr = args.ocr
+    if ocr == 'auto':
+        ocr = 'easyocr' if ocr_engine.OCR_AVAILABLE else 'simulated'
+    elif ocr == 'easyocr' and not ocr_engine.OCR_AVAILABLE:
+        raise SystemExit("easyocr is not installed")
+    if ocr == 'simulated':
+        print("OCR stage is simulated: OCR latency and accuracy don't reflect EasyOCR")
+
+    samples = load_corpus(args.corpus) if args.corpus else build_corpus(args.receipts, args.seed, args.photo_fraction)
+    if args.save_corpus:
+        save_corpus(args.save_corpus, samples)
+
+    summary = run(samples, ocr, args.preset)
+    print_summary(summary)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['config'] != summary['config']:
+            print(f"note: baseline config differs: {baseline['config']}")
+        found = regressions(summary, baseline, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            raise SystemExit(1)
+        print("no regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
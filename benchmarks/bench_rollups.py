@@ -0,0 +1,128 @@
+# bench_rollups.py - Spending-over-time queries: full scans vs. maintained rollups
+#
+# Builds `--rows` synthetic expenses over five years and times range
+# queries a dashboard asks for, answered two ways:
+#
+#   scan      a pandas filter + groupby over every expense (how the charts
+#             were drawn before)
+#   rollups   rollups.spending() on a SpendingRollups, as ExpenseStore
+#             keeps it (and on SQLiteExpenseStore's `rollups` table)
+#
+# then the cost of keeping the rollups current: building them from scratch
+# and one add + remove.
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_rollups [--rows 1000000] [--repeat 20] [--no-sqlite]
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from rollups import SpendingRollups, spending
+
+CATEGORIES = ['Food', 'Transport', 'Shopping', 'Utilities', 'Entertainment', 'Health', 'Other']
+DAYS = 5 * 365
+END = pd.Timestamp('2024-12-31')
+
+# (name, period, days back from END or None for everything, categories)
+QUERIES = [
+    ("Food, 90 days by week", 'week', 90, ['Food']),
+    ("all, 12 months by month", 'month', 365, None),
+    ("all, 30 days by day", 'day', 30, None),
+    ("all time by day", 'day', None, None),
+]
+
+
+def synthetic_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = (END - pd.to_timedelta(rng.integers(0, DAYS, n), unit='D')).strftime('%Y-%m-%d')
+    amounts = np.round(rng.uniform(1, 300, n), 2)
+    categories = np.array(CATEGORIES)[rng.integers(0, len(CATEGORIES), n)]
+    return [{'ID': f"{i:016x}", 'Date': date, 'Description': 'x', 'Amount': float(amount), 'Category': category}
+            for i, (date, amount, category) in enumerate(zip(dates, amounts, categories))]
+
+
+def window(days):
+    return (None, None) if days is None else ((END - pd.Timedelta(days=days - 1)).date(), END.date())
+
+
+def scan(frame, period, days, categories):
+    start, end = window(days)
+    rows = frame
+    if start is not None:
+        rows = rows[(rows['Date'] >= pd.Timestamp(start)) & (rows['Date'] <= pd.Timestamp(end))]
+    if categories:
+        rows = rows[rows['Category'].isin(categories)]
+    freq = {'day': 'D', 'week': 'W-SUN', 'month': 'MS'}[period]
+    return rows.groupby([pd.Grouper(key='Date', freq=freq), 'Category'])['Amount'].sum().unstack(fill_value=0)
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Spending-over-time queries: full scans vs. maintained rollups")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--no-sqlite", action="store_true", help="skip the SQLite store (loading it takes a while)")
+    args = parser.parse_args(argv)
+
+    rows = synthetic_rows(args.rows)
+    frame = pd.DataFrame(rows)
+    frame['Date'] = pd.to_datetime(frame['Date'])
+
+    start = time.perf_counter()
+    rollups = SpendingRollups.from_rows(rows)
+    build = time.perf_counter() - start
+    entries = sum(len(categories) for cube in rollups.cubes.values() for categories in cube.values())
+    print(f"{args.rows:,} expenses over {DAYS} days; rollups built in {build:.1f}s ({entries:,} entries)\n")
+
+    store = workdir = None
+    if not args.no_sqlite:
+        from sqlite_store import SQLiteExpenseStore
+
+        workdir = tempfile.mkdtemp(prefix="budgetbee-rollups-")
+        store = SQLiteExpenseStore(os.path.join(workdir, 'expenses.db'), import_from=os.devnull)
+        start = time.perf_counter()
+        with store.bulk_add() as add:
+            add((row['Date'], row['Description'], row['Amount'], row['Category']) for row in rows)
+        print(f"SQLite store loaded in {time.perf_counter() - start:.1f}s\n")
+
+    try:
+        print(f"{'query':26} {'scan ms':>10} {'rollups ms':>11} {'sqlite ms':>10} {'speedup':>9}")
+        for name, period, days, categories in QUERIES:
+            scanned = timed(lambda: scan(frame, period, days, categories), max(1, args.repeat // 4))
+            rolled = timed(lambda: spending(rollups.records, period, *window(days), categories), args.repeat)
+            on_disk = timed(lambda: store.spending(period, *window(days), categories), args.repeat) if store else None
+            sqlite_ms = f"{on_disk * 1e3:10.2f}" if on_disk is not None else f"{'-':>10}"
+            print(f"{name:26} {scanned * 1e3:10.2f} {rolled * 1e3:11.2f} {sqlite_ms} {scanned / rolled:8.0f}x")
+
+        # Keeping them current: one expense in and out again touches three buckets
+        row = dict(rows[0], ID='bench')
+        maintain = timed(lambda: (rollups.add(row), rollups.remove(row)), args.repeat * 100)
+        print(f"\nadd + remove one expense: {maintain * 1e6:.1f} us in memory", end="")
+        if store:
+            def add_delete():
+                store.delete(store.add(row['Date'], row['Description'], row['Amount'], row['Category']))
+            print(f", {timed(add_delete, args.repeat) * 1e3:.2f} ms in SQLite (triggers, one commit each)")
+        else:
+            print()
+    finally:
+        if store:
+            store.close()
+            shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
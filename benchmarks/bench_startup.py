@@ -0,0 +1,151 @@
+# bench_startup.py - App cold start, heavy-import cost and mmap'd model sharing
+#
+# Every measurement runs in a fresh interpreter, in a scratch directory
+# (so expense files and caches don't touch the repo):
+#   1. import cost of each heavy dependency (python -X importtime);
+#   2. time-to-first-render of each app: Streamlit apps through AppTest,
+#      anc-app.py as its first request through Flask's test client;
+#   3. model load time and private memory of N worker processes loading a
+#      ~80 MB linear model with and without mmap.
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_startup [--workers 4] [--skip-apps]
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['pandas', 'numpy', 'PIL.Image', 'cv2', 'easyocr', 'joblib', 'streamlit', 'flask']
+STREAMLIT_APPS = ['main_app.py', 'new.py', 'fullCode.py']
+
+
+def python(code, cwd, *flags):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    return subprocess.run([sys.executable, *flags, '-c', code], cwd=cwd, env=env,
+                          capture_output=True, text=True, timeout=600)
+
+
+def import_seconds(module, cwd):
+    """Cumulative import time of `module` from -X importtime, or None if it isn't installed."""
+    result = python(f"import {module}", cwd, '-X', 'importtime')
+    if result.returncode:
+        return None
+    for line in reversed(result.stderr.splitlines()):
+        parts = [part.strip() for part in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1e6
+    return None
+
+
+def write_model(path, n_features=2 ** 20, classes=10):
+    """An ~80 MB hashed-features linear model (coef_ is classes x n_features float64)."""
+    code = f"""
+        import joblib, numpy as np
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.linear_model import SGDClassifier
+        from sklearn.pipeline import make_pipeline
+        words = ['pizza', 'uber', 'rent', 'netflix', 'grocery', 'fuel', 'doctor', 'cinema', 'flight', 'gym']
+        pipeline = make_pipeline(HashingVectorizer(n_features={n_features}, analyzer='char_wb', ngram_range=(2, 4)),
+                                 SGDClassifier())
+        pipeline.fit(words * 3, [f'Category {{i % {classes}}}' for i in range(30)])
+        joblib.dump(pipeline, {path!r})
+    """
+    result = python(textwrap.dedent(code), os.path.dirname(path))
+    if result.returncode:
+        raise SystemExit(result.stderr)
+
+
+def first_render_seconds(app, cwd):
+    if app == 'anc-app.py':
+        code = f"""
+            import time; start = time.perf_counter()
+            import importlib.util
+            spec = importlib.util.spec_from_file_location('anc_app', {os.path.join(REPO_ROOT, app)!r})
+            module = importlib.util.module_from_spec(spec); spec.loader.exec_module(module)
+            module.app.jinja_loader.searchpath.append({REPO_ROOT!r})
+            module.app.test_client().get('/')
+            print(time.perf_counter() - start)
+        """
+    else:
+        code = f"""
+            import time; start = time.perf_counter()
+            from streamlit.testing.v1 import AppTest
+            AppTest.from_file({os.path.join(REPO_ROOT, app)!r}, default_timeout=300).run()
+            print(time.perf_counter() - start)
+        """
+    result = python(textwrap.dedent(code), cwd)
+    if result.returncode:
+        return None, result.stderr.strip().splitlines()[-1]
+    startup_lines = [line for line in result.stderr.splitlines() if line.startswith('[startup]')]
+    return float(result.stdout.strip().splitlines()[-1]), startup_lines[-1] if startup_lines else ''
+
+
+def worker_memory(model_path, workers, mmap, cwd):
+    """Starts `workers` processes that each load the model and predict once; returns (load s, private MB, shared MB) per worker."""
+    code = f"""
+        import time, os
+        from model_loader import load_pipeline
+        import sklearn.feature_extraction.text, sklearn.linear_model, sklearn.pipeline  # time the load, not imports
+        start = time.perf_counter()
+        pipeline = load_pipeline({model_path!r}, mmap={mmap})
+        seconds = time.perf_counter() - start
+        pipeline.predict(['pizza hut'])
+        fields = {{}}
+        for line in open('/proc/self/smaps_rollup'):
+            parts = line.split()
+            if parts[0].endswith(':') and len(parts) == 3:
+                fields[parts[0][:-1]] = int(parts[1])
+        private = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+        shared = fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+        print(seconds, private / 1024, shared / 1024, flush=True)
+        import sys; sys.stdin.read()  # stay alive until every worker has measured
+    """
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    procs = [subprocess.Popen([sys.executable, '-c', textwrap.dedent(code)], cwd=cwd, env=env, text=True,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE) for _ in range(workers)]
+    rows = [tuple(map(float, proc.stdout.readline().split())) for proc in procs]
+    for proc in procs:
+        proc.communicate('')
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="App cold start, heavy-import cost and mmap'd model sharing")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--skip-apps", action="store_true", help="only measure imports and model loading")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="budgetbee-startup-")
+    try:
+        print("import cost (fresh interpreter, cumulative)")
+        for module in HEAVY_MODULES:
+            seconds = import_seconds(module, workdir)
+            print(f"  {module:12} " + (f"{seconds * 1000:8.0f}ms" if seconds is not None else "  not installed"))
+
+        model_path = os.path.join(workdir, 'budgetbee_pipeline.joblib')
+        write_model(model_path)
+        print(f"\nmodel: {os.path.getsize(model_path) / 1e6:.0f} MB, {args.workers} worker processes")
+        print(f"  {'load':8} {'load time':>10} {'private/worker':>15} {'shared/worker':>14} {'private total':>14}")
+        for mmap in (False, True):
+            rows = worker_memory(model_path, args.workers, mmap, workdir)
+            load = sum(row[0] for row in rows) / len(rows)
+            private = sum(row[1] for row in rows) / len(rows)
+            shared = sum(row[2] for row in rows) / len(rows)
+            print(f"  {'mmap' if mmap else 'heap':8} {load * 1000:8.1f}ms {private:12.0f} MB {shared:11.0f} MB "
+                  f"{private * len(rows):11.0f} MB")
+
+        if not args.skip_apps:
+            print("\ntime to first render (fresh process, scratch data directory)")
+            for app in STREAMLIT_APPS + ['anc-app.py']:
+                seconds, detail = first_render_seconds(app, workdir)
+                print(f"  {app:12} " + (f"{seconds:6.2f}s  {detail}" if seconds is not None else f"failed: {detail}"))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# bench_statement_import.py - Bulk statement import throughput, memory and dedupe
+#
+# Writes a synthetic CSV bank statement of `--rows` transactions (debit /
+# credit columns, about 10% credits) and an OFX export of a tenth of that,
+# then imports them with statement_import.py into a fresh store of each
+# backend: once into the empty store and once more, when every row should
+# come back as a duplicate. Each import runs in its own process so its
+# peak RSS is its own; it should stay flat as --rows grows for the SQLite
+# store (the CSV store keeps every row in memory by design).
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_statement_import [--rows 1000000] [--backends csv sqlite]
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+
+from benchmarks.bench_categorizer import synthetic_descriptions
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_csv_statement(path, rows, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Txn Date', 'Narration', 'Chq/Ref No', 'Withdrawal Amt', 'Deposit Amt', 'Balance'])
+        for i, description in enumerate(synthetic_descriptions(rows, seed=seed)):
+            date = f"{rng.randrange(1, 29):02d}/{rng.randrange(1, 13):02d}/{rng.choice((2023, 2024))}"
+            amount = f"{rng.uniform(1, 2000):,.2f}"
+            credit = rng.random() < 0.1
+            writer.writerow([date, description, f"REF{i:09d}", '' if credit else amount, amount if credit else '', ''])
+
+
+def write_ofx_statement(path, rows, seed=1):
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write("OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n")
+        for i, description in enumerate(synthetic_descriptions(rows, seed=seed)):
+            amount = rng.uniform(1, 500) * (1 if rng.random() < 0.1 else -1)
+            f.write(f"<STMTTRN><TRNTYPE>{'CREDIT' if amount > 0 else 'DEBIT'}"
+                    f"<DTPOSTED>2024{rng.randrange(1, 13):02d}{rng.randrange(1, 29):02d}"
+                    f"<TRNAMT>{amount:.2f}<FITID>{i}<NAME>{description}\n")
+        f.write("</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n")
+
+
+def import_in_subprocess(statement, backend, data, cwd):
+    code = f"""
+        import json, resource
+        from expense_store import get_store
+        from statement_import import import_statement
+        report = import_statement({statement!r}, get_store({data!r}, {backend!r}), dayfirst=True)
+        report['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(json.dumps(report))
+    """
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    result = subprocess.run([sys.executable, '-c', textwrap.dedent(code)], cwd=cwd, env=env,
+                            capture_output=True, text=True, timeout=3600)
+    if result.returncode:
+        raise SystemExit(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk statement import throughput, memory and dedupe")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--backends", nargs="+", choices=('csv', 'sqlite'), default=['sqlite', 'csv'])
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="budgetbee-import-")
+    try:
+        statements = [os.path.join(workdir, 'statement.csv'), os.path.join(workdir, 'statement.ofx')]
+        write_csv_statement(statements[0], args.rows)
+        write_ofx_statement(statements[1], max(1, args.rows // 10))
+        for path in statements:
+            print(f"{os.path.basename(path)}: {os.path.getsize(path) / 1e6:.0f} MB")
+
+        print(f"\n{'backend':8} {'statement':14} {'run':7} {'rows':>10} {'imported':>10} {'dupes':>10} "
+              f"{'seconds':>8} {'rows/s':>10} {'index s':>8} {'peak RSS':>9}")
+        for backend in args.backends:
+            data = os.path.join(workdir, backend, 'expenses.db' if backend == 'sqlite' else 'expenses.csv')
+            os.makedirs(os.path.dirname(data))
+            for path in statements:
+                for run in ('first', 'again'):
+                    report = import_in_subprocess(path, backend, data, os.path.dirname(data))
+                    print(f"{backend:8} {os.path.basename(path):14} {run:7} {report['rows']:10,} "
+                          f"{report['imported']:10,} {report['duplicates']:10,} {report['seconds']:8.1f} "
+                          f"{report['rows_per_second']:10,.0f} {report['index_seconds']:8.1f} "
+                          f"{report['peak_rss_mb']:7.0f}MB")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# bench_storage_formats.py - CSV vs Arrow snapshot load time and memory
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_storage_formats --rows 1000000
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+import columnar
+from expense_store import ExpenseStore, new_expense_id
+
+CATEGORIES = ['Food', 'Transport', 'Entertainment', 'Utilities', 'Shopping', 'Other']
+MERCHANTS = ['Starbucks', 'Uber', 'Netflix', 'Shell', 'Amazon', 'Walmart', 'KFC', 'Metro', 'Rent', 'Cinema']
+
+
+def synthetic_rows(n, seed=0):
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    for i in range(n):
+        yield {
+            'ID': new_expense_id(),
+            'Date': (start + timedelta(days=rng.randrange(3650))).isoformat(),
+            'Description': f"{rng.choice(MERCHANTS)} #{rng.randrange(1000)}",
+            'Amount': round(rng.uniform(1, 500), 2),
+            'Category': rng.choice(CATEGORIES),
+        }
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CSV vs Arrow snapshot load time and memory")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+    if not columnar.ARROW_AVAILABLE:
+        raise SystemExit("pyarrow is not installed")
+
+    workdir = tempfile.mkdtemp(prefix="budgetbee-bench-")
+    try:
+        csv_path = os.path.join(workdir, 'expenses.csv')
+        pd.DataFrame(synthetic_rows(args.rows)).to_csv(csv_path, index=False)
+
+        # Building the store once converts the CSV snapshot to expenses.arrow.
+        ExpenseStore(csv_path)
+        arrow_path = os.path.join(workdir, 'expenses.arrow')
+
+        csv_df, csv_seconds = timed(lambda: pd.read_csv(csv_path, parse_dates=['Date']))
+        arrow_df, arrow_seconds = timed(lambda: columnar.load_frame(arrow_path))
+        _, store_csv_seconds = timed(lambda: ExpenseStore(csv_path, use_arrow=False))
+        _, store_arrow_seconds = timed(lambda: ExpenseStore(csv_path, use_arrow=True))
+
+        csv_mb = csv_df.memory_usage(deep=True).sum() / 1e6
+        arrow_mb = arrow_df.memory_usage(deep=True).sum() / 1e6
+        print(f"rows: {args.rows:,}")
+        print(f"file size          csv {os.path.getsize(csv_path) / 1e6:8.1f} MB   arrow {os.path.getsize(arrow_path) / 1e6:8.1f} MB")
+        print(f"DataFrame load     csv {csv_seconds:8.3f} s    arrow {arrow_seconds:8.3f} s   ({csv_seconds / arrow_seconds:.1f}x)")
+        print(f"DataFrame memory   csv {csv_mb:8.1f} MB   arrow {arrow_mb:8.1f} MB")
+        print(f"store cold start   csv {store_csv_seconds:8.3f} s    arrow {store_arrow_seconds:8.3f} s   ({store_csv_seconds / store_arrow_seconds:.1f}x)")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# bench_tiled_ocr.py - Full-frame vs tiled (text regions only) OCR on long receipts
+#
+# Long receipts are rendered with blank stretches, preprocessed with the
+# 'fast' preset and read both ways. With easyocr installed (--ocr easyocr)
+# the timings and parsed totals are real. Otherwise a stand-in OCR is used:
+# a per-pixel convolution (the detector's cost grows with pixel count) plus
+# connected text lines labelled by their pixels. Tiled output must then
+# match full-frame output box for box, which checks the seams.
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_tiled_ocr [--receipts 10] [--items 60] [--workers 1]
+import argparse
+import hashlib
+import random
+import time
+
+import cv2
+import numpy as np
+
+import ocr_engine
+import ocr_regions
+import preprocessing
+import receipt_image
+from benchmarks.receipt_corpus import PRODUCTS, render_receipt, synthetic_receipt
+from receipt_parser import parse_receipt
+
+
+def long_receipt(rng, items):
+    truth = synthetic_receipt(rng)
+    truth['items'] = [(rng.choice(PRODUCTS), round(rng.uniform(0.5, 40), 2)) for _ in range(items)]
+    truth['subtotal'] = round(sum(price for _, price in truth['items']), 2)
+    truth['tax'] = round(truth['subtotal'] * 0.05, 2)
+    truth['total'] = round(truth['subtotal'] + truth['tax'], 2)
+    return truth
+
+
+def stand_in_readtext(image):
+    """Detector-like per-pixel work, then one box per connected text line, 'read' as a hash of its pixels."""
+    cv2.GaussianBlur(image.astype(np.float32), (31, 31), 0)
+    ink = (image < 128).astype(np.uint8)
+    lines = cv2.dilate(ink, np.ones((3, 25), np.uint8))
+    count, _, boxes, _ = cv2.connectedComponentsWithStats(lines)
+    results = []
+    for x, y, w, h, _ in boxes[1:count]:
+        # Tight around the ink, so a box doesn't depend on how much margin the crop has
+        dx, dy, w, h = cv2.boundingRect(ink[y:y + h, x:x + w])
+        x, y = x + dx, y + dy
+        text = hashlib.blake2b(np.ascontiguousarray(ink[y:y + h, x:x + w]), digest_size=6).hexdigest()
+        results.append(([[x, y], [x + w, y], [x + w, y + h], [x, y + h]], text, 0.9))
+    return results
+
+
+def best_of(fn, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-frame vs tiled (text regions only) OCR on long receipts")
+    parser.add_argument("--receipts", type=int, default=10)
+    parser.add_argument("--items", type=int, default=60, help="line items per receipt")
+    parser.add_argument("--gaps", type=float, default=0.15, help="fraction of lines followed by blank space")
+    parser.add_argument("--workers", type=int, default=1, help="tile recognition threads")
+    parser.add_argument("--tile-height", type=int, default=ocr_regions.TILE_HEIGHT)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--ocr", choices=['stand-in', 'easyocr'], default='stand-in')
+    args = parser.parse_args(argv)
+
+    if args.ocr == 'easyocr':
+        if not ocr_engine.OCR_AVAILABLE:
+            raise SystemExit("easyocr is not installed")
+        ocr_engine.warm_up(background=False)
+        readtext = lambda image: ocr_engine.readtext(image, ['en'])
+    else:
+        print("stand-in OCR: timings are a per-pixel cost proxy, not EasyOCR")
+        readtext = stand_in_readtext
+
+    rng = random.Random(0)
+    print(f"{'receipt':8} {'size':>10} {'tiles':>5} {'pixels':>7} {'plan':>7} {'full':>9} {'tiled':>9} {'speedup':>8}  result")
+    full_total = tiled_total = 0.0
+    for i in range(args.receipts):
+        truth = long_receipt(rng, args.items)
+        image = preprocessing.preprocess(receipt_image.load_receipt(render_receipt(truth, rng, gaps=args.gaps)), 'fast')
+
+        full, full_seconds = best_of(lambda: readtext(image), args.repeat)
+        stats = {}
+        tiled, tiled_seconds = best_of(lambda: ocr_regions.readtext_tiled(
+            image, readtext, args.tile_height, workers=args.workers, stats=stats), args.repeat)
+        full_total += full_seconds
+        tiled_total += tiled_seconds
+
+        if args.ocr == 'easyocr':
+            got = parse_receipt(tiled)[1], parse_receipt(full)[1]
+            result = f"total tiled {got[0]} / full {got[1]} / truth {truth['total']}"
+        else:
+            key = lambda box: (box[1], tuple(map(tuple, np.round(box[0]).astype(int).tolist())))
+            same = sorted(map(key, full)) == sorted(map(key, tiled))
+            result = f"{len(tiled)} boxes, {'match' if same else 'DIFFER from'} full frame"
+        size = f"{image.shape[1]}x{image.shape[0]}"
+        print(f"{i:<8} {size:>10} {stats['tiles']:5} {stats['pixel_fraction']:7.0%} {stats['plan_seconds'] * 1000:5.1f}ms "
+              f"{full_seconds * 1000:7.1f}ms {tiled_seconds * 1000:7.1f}ms {full_seconds / tiled_seconds:7.2f}x  {result}")
+    print(f"overall speedup {full_total / tiled_total:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
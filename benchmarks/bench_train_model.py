@@ -0,0 +1,58 @@
+# bench_train_model.py - train_model.py on a synthetic expense history
+#
+# Writes an expenses.csv of `--rows` synthetic bank descriptions, labelled by
+# the keyword rules or, for merchants the rules don't cover, by hand (see
+# bench_hybrid_categorizer.UNMATCHED), with `--noise` of the labels
+# scrambled, then runs the training command on it in a scratch directory.
+# train_model.py prints train time, model size, holdout accuracy and
+# single / batch predict throughput.
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_train_model [--rows 100000] [--unmatched 0.3] [--noise 0.02]
+import argparse
+import csv
+import os
+import random
+import shutil
+import tempfile
+
+import train_model
+from benchmarks.bench_hybrid_categorizer import UNMATCHED, descriptions
+from categorizer import KeywordCategorizer
+
+
+def write_history(path, rows, unmatched_share, noise, seed=0):
+    rng = random.Random(seed)
+    rules = KeywordCategorizer()
+    categories = sorted(set(rules.categories) | set(UNMATCHED.values()))
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Date', 'Description', 'Amount', 'Category'])
+        for description in descriptions(rows, unmatched_share, seed=seed):
+            merchant = next((m for m in UNMATCHED if m in description), None)
+            category = UNMATCHED[merchant] if merchant else rules.categorize(description)
+            if rng.random() < noise:
+                category = rng.choice(categories)
+            writer.writerow([f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}", description,
+                             f"{rng.uniform(1, 500):.2f}", category])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="train_model.py on a synthetic expense history")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--unmatched", type=float, default=0.3, help="share of merchants the rules don't cover")
+    parser.add_argument("--noise", type=float, default=0.02, help="share of labels replaced at random")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="budgetbee-train-")
+    try:
+        data = os.path.join(workdir, 'expenses.csv')
+        write_history(data, args.rows, args.unmatched, args.noise)
+        train_model.main(['--backend', 'csv', '--data', data, '--no-publish',
+                          '--output', os.path.join(workdir, 'budgetbee_pipeline.joblib')])
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# bench_upload_decode.py - Temp-file vs in-memory receipt upload path
+#
+# Usage (from the repo root):
+#   python -m benchmarks.bench_upload_decode [--ocr]
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import receipt_image
+
+# (label, width, height) of common phone / scanner captures
+SIZES = [
+    ('scan 1.2MP', 960, 1280),
+    ('phone 3MP', 1512, 2016),
+    ('phone 12MP', 3024, 4032),
+    ('phone 48MP', 6048, 8064),
+]
+LINES = ['BUDGET MART', '123 Main St', 'Milk 2% 1gal      3.49', 'Bread            2.99',
+         'Eggs 12ct         4.29', 'Coffee           8.99', 'SUBTOTAL        19.76',
+         'TAX              1.58', 'TOTAL           21.34']
+
+
+def synthetic_receipt_jpeg(width, height):
+    """A receipt-like photo: light paper on a darker table, some sensor noise."""
+    rng = np.random.default_rng(0)
+    image = np.full((height, width, 3), 90, np.uint8)
+    left, right = width // 6, width - width // 6
+    cv2.rectangle(image, (left, 0), (right, height), (235, 235, 230), -1)
+    scale = width / 900
+    for i, line in enumerate(LINES):
+        y = int((i + 2) * 60 * scale)
+        cv2.putText(image, line, (left + int(20 * scale), y), cv2.FONT_HERSHEY_SIMPLEX, scale, (20, 20, 20), max(1, int(2 * scale)))
+    image = cv2.add(image, rng.integers(0, 12, image.shape, dtype=np.uint8))
+    ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+
+def threshold(gray_image):
+    return cv2.adaptiveThreshold(gray_image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+
+
+def temp_file_path(data):
+    """The old process_receipt_image: write, imread, delete, then preprocess."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
+        tmp_file.write(data)
+        tmp_img_path = tmp_file.name
+    try:
+        image = cv2.imread(tmp_img_path)
+        return threshold(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+    finally:
+        os.unlink(tmp_img_path)
+
+
+def in_memory_path(data):
+    return threshold(receipt_image.load_receipt(memoryview(data)))
+
+
+def best_of(fn, data, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(data)
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Temp-file vs in-memory receipt upload path")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--ocr", action="store_true", help="also time EasyOCR on both outputs (needs easyocr)")
+    args = parser.parse_args(argv)
+
+    readtext = None
+    if args.ocr:
+        import ocr_engine
+        if not ocr_engine.OCR_AVAILABLE:
+            raise SystemExit("easyocr is not installed")
+        ocr_engine.warm_up(background=False)
+        readtext = lambda image: ocr_engine.readtext(image, ['en'])
+
+    print(f"target: {receipt_image.TARGET_DPI} DPI -> short side <= {receipt_image.target_side()} px")
+    print(f"{'capture':12} {'size':>11} {'temp file':>10} {'in memory':>10} {'saved':>8} {'OCR input':>12}")
+    for label, width, height in SIZES:
+        data = synthetic_receipt_jpeg(width, height)
+        old_image, old_ms = best_of(temp_file_path, data, args.repeat)
+        new_image, new_ms = best_of(in_memory_path, data, args.repeat)
+        if readtext:
+            old_ms += best_of(readtext, old_image, 1)[1]
+            new_ms += best_of(readtext, new_image, 1)[1]
+        shape = f"{new_image.shape[1]}x{new_image.shape[0]}"
+        print(f"{label:12} {width:>5}x{height:<5} {old_ms:8.1f}ms {new_ms:8.1f}ms {old_ms - new_ms:6.1f}ms {shape:>12}")
+    if not readtext:
+        print("(preprocessing only; OCR time shrinks further with the smaller input, see --ocr)")
+
+
+if __name__ == "__main__":
+    main()
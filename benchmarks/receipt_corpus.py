@@ -0,0 +1,117 @@
+# receipt_corpus.py - Synthetic receipts with known ground truth
+#
+# synthetic_receipt() draws the content; ocr_boxes() turns it into what
+# EasyOCR typically returns for it (one box per text run, label and price
+# as separate boxes, jittered geometry, imperfect confidences);
+# render_receipt() prints it to an image for benchmarks that run real OCR.
+import random
+
+VENDORS = ['BUDGET MART', 'CORNER CAFE', 'FRESH FOODS', 'CITY PHARMACY', 'QUICK STOP', 'GREEN GROCER',
+           'BOOK NOOK', 'PIZZA PALACE', 'HARDWARE HUB', 'SUNRISE BAKERY']
+PRODUCTS = ['Milk 2%', 'Bread', 'Eggs 12ct', 'Coffee', 'Orange Juice', 'Apples', 'Tomato', 'Fish', 'Beef',
+            'Onion', 'Cheese', 'Bananas', 'Rice 2kg', 'Pasta', 'Yogurt', 'Chicken', 'Butter', 'Cereal',
+            'Shampoo', 'Batteries', 'Notebook', 'Soap', 'Tea', 'Water 6pk']
+HEADERS = ['RECEIPT', '123 Main St', 'Tel 555-0100', 'Date 03/14/2024']
+
+
+def synthetic_receipt(rng):
+    """Ground truth: vendor, items [(name, price)], subtotal, tax, total."""
+    items = [(name, round(rng.uniform(0.5, 40), 2)) for name in rng.sample(PRODUCTS, rng.randint(2, 12))]
+    subtotal = round(sum(price for _, price in items), 2)
+    tax = round(subtotal * rng.choice([0.0, 0.05, 0.0825, 0.1]), 2)
+    return {
+        'vendor': rng.choice(VENDORS),
+        'header': rng.sample(HEADERS, rng.randint(1, 3)),
+        'items': items,
+        'subtotal': subtotal,
+        'tax': tax,
+        'total': round(subtotal + tax, 2),
+        'paid_with': rng.choice(['CASH', 'VISA', None]),
+    }
+
+
+def receipt_lines(truth):
+    """Printed lines as (left text, right text or None)."""
+    lines = [(truth['vendor'], None)] + [(header, None) for header in truth['header']]
+    lines += [(name, f"{price:.2f}") for name, price in truth['items']]
+    lines += [('SUBTOTAL', f"{truth['subtotal']:.2f}"), ('TAX', f"{truth['tax']:.2f}"),
+              ('TOTAL', f"${truth['total']:.2f}")]
+    if truth['paid_with']:
+        lines.append((truth['paid_with'], f"{truth['total']:.2f}"))
+    lines.append(('THANK YOU', None))
+    return lines
+
+
+def _garble(text, rng, rate):
+    swaps = {'0': 'O', '1': 'l', '5': 'S', 'O': '0', 'l': '1', 'S': '5', 'e': 'c'}
+    return ''.join(swaps.get(ch, ch) if rng.random() < rate else ch for ch in text)
+
+
+def ocr_boxes(truth, rng, noise=0.02, wrap=0.1, line_height=28, width=600):
+    """
+    Simulated EasyOCR readtext output for `truth`, in EasyOCR's rough
+    reading order. A `wrap` fraction of prices sit on the line below their
+    label, as on narrow receipts.
+    """
+    results = []
+    y = 20.0
+    skew = rng.uniform(-0.01, 0.01)  # slight rotation: y drifts with x
+    for left, right in receipt_lines(truth):
+        for text, x in ((left, 20), (right, width - 20 - 12 * len(right or ''))):
+            if text is None:
+                continue
+            if text is right and rng.random() < wrap:
+                y += line_height * rng.uniform(1.1, 1.5)
+            top = y + skew * x + rng.uniform(-3, 3)
+            height = line_height * rng.uniform(0.8, 1.1)
+            w = 12 * len(text)
+            bbox = [[x, top], [x + w, top], [x + w, top + height], [x, top + height]]
+            prob = min(1.0, max(0.05, rng.gauss(0.85, 0.1)))
+            results.append((bbox, _garble(text, rng, noise) if prob < 0.6 else text, prob))
+        y += line_height * rng.uniform(1.1, 1.5)
+    # EasyOCR sorts roughly by top edge, so same-line boxes can come out interleaved
+    results.sort(key=lambda r: r[0][0][1] + rng.uniform(-8, 8))
+    return results
+
+
+def corpus(n, seed=0, noise=0.02, wrap=0.1):
+    """Yields (truth, simulated OCR results) pairs."""
+    rng = random.Random(seed)
+    for _ in range(n):
+        truth = synthetic_receipt(rng)
+        yield truth, ocr_boxes(truth, rng, noise, wrap)
+
+
+def render_receipt(truth, rng, width=576, line_height=34, photo=False, quality=90, gaps=0.0):
+    """
+    JPEG bytes of `truth` printed like a thermal receipt (`width` px is 80 mm
+    paper at ~180 DPI). With `photo`, the paper sits on a darker table with
+    a slight rotation and sensor noise, as in a phone picture. A `gaps`
+    fraction of lines is followed by 2-8 blank lines (coupons, long footers).
+    """
+    import cv2
+    import numpy as np
+
+    lines = receipt_lines(truth)
+    baselines, y = [], line_height * 2
+    for _ in lines:
+        baselines.append(y)
+        y += line_height * (1 + (rng.randint(2, 8) if gaps and rng.random() < gaps else 0))
+    height = y + line_height
+    image = np.full((height, width), 250, np.uint8)
+    for (left, right), y in zip(lines, baselines):
+        cv2.putText(image, left, (16, y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, 20, 2, cv2.LINE_AA)
+        if right:
+            (text_width, _), _ = cv2.getTextSize(right, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
+            cv2.putText(image, right, (width - 16 - text_width, y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, 20, 2, cv2.LINE_AA)
+
+    if photo:
+        margin = width // 4
+        table = np.full((height + 2 * margin, width + 2 * margin), 90, np.uint8)
+        table[margin:margin + height, margin:margin + width] = image
+        rotation = cv2.getRotationMatrix2D((table.shape[1] / 2, table.shape[0] / 2), rng.uniform(-3, 3), 1.0)
+        image = cv2.warpAffine(table, rotation, table.shape[::-1], borderMode=cv2.BORDER_REPLICATE)
+        noise = np.random.default_rng(rng.randrange(2 ** 32)).integers(0, 12, image.shape, dtype=np.uint8)
+        image = cv2.add(image, noise)
+    ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return encoded.tobytes()
@@ -0,0 +1,295 @@
+# categorizer.py - Rule-based expense categorization, with an ML model for the rest
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from model_loader import MODEL_PATH
+from model_registry import ModelRegistry, ModelServer
+from prediction_cache import PredictionCache
+
+# Checked in this order: the first category with a keyword anywhere in the
+# description wins.
+CATEGORY_KEYWORDS = {
+    'Food': ['coffee', 'mcdonald', 'kfc', 'restaurant', 'food', 'grocery', 'supermarket', 'cafe'],
+    'Transport': ['shell', 'gas', 'petrol', 'metro', 'bus', 'uber', 'transport', 'fuel', 'taxi'],
+    'Entertainment': ['cine', 'movie', 'netflix', 'entertain', 'concert', 'game'],
+    'Utilities': ['rent', 'electric', 'water', 'internet', 'bill', 'wifi'],
+    'Shopping': ['mall', 'clothes', 'amazon', 'store', 'shop'],
+}
+DEFAULT_CATEGORY = 'Other'
+# Reported for a keyword hit; model answers report their own top-class probability
+RULE_CONFIDENCE = 0.9
+# Model answers less confident than this fall back to DEFAULT_CATEGORY
+MIN_MODEL_CONFIDENCE = 0.5
+# Where a category came from
+SOURCES = ('rules', 'model', 'default')
+
+
+def _trie_pattern(keywords):
+    """
+    One regex for a set of literal keywords, with common prefixes factored
+    out (e.g. 're(?:nt|staurant)') so the regex engine walks a trie instead
+    of retrying every keyword at every position.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            # A keyword ends here but longer ones continue; greedy '?' prefers the longest.
+            body = ('(?:' + body + ')' if len(branches) == 1 and len(body) > 1 else body) + '?'
+        return body
+
+    return build(trie)
+
+
+class KeywordCategorizer:
+    """
+    Keyword rules compiled into one trie-shaped regex, so a description is
+    scanned once no matter how many categories and keywords there are.
+
+    At any start position the regex returns the longest keyword there, and
+    every other keyword matching at that position is a prefix of it, so each
+    keyword maps to the best priority among its prefixes. Searching again
+    from just after each match start (rather than after its end) means
+    overlapping keywords are still seen, so the result is the same as
+    checking the categories one by one in order.
+    """
+
+    def __init__(self, rules=None, default=DEFAULT_CATEGORY):
+        self.rules = dict(CATEGORY_KEYWORDS if rules is None else rules)
+        self.default = default
+        self.categories = list(self.rules)
+
+        own_priority = {}
+        for priority, keywords in enumerate(self.rules.values()):
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if keyword and keyword not in own_priority:
+                    own_priority[keyword] = priority
+        self._priority = {
+            keyword: min(p for other, p in own_priority.items() if keyword.startswith(other))
+            for keyword in own_priority
+        }
+        self._pattern = re.compile(_trie_pattern(own_priority)) if own_priority else None
+
+    def match(self, description):
+        """Category of the best matching keyword, or None if no rule matches."""
+        if not description or self._pattern is None:
+            return None
+        text = str(description).lower()
+        search = self._pattern.search
+        priority_of = self._priority
+        best = None
+        match = search(text)
+        while match is not None:
+            priority = priority_of[match.group()]
+            if best is None or priority < best:
+                best = priority
+                if best == 0:
+                    break
+            match = search(text, match.start() + 1)
+        return None if best is None else self.categories[best]
+
+    def categorize(self, description):
+        """Category for a single description."""
+        category = self.match(description)
+        return self.default if category is None else category
+
+    def categorize_many(self, descriptions):
+        """
+        Categories for a whole pandas Series (or any iterable) of descriptions.
+        Each distinct lowercase description is matched once and the results
+        are broadcast back, so repeated merchants cost nothing extra.
+        """
+        series = descriptions if isinstance(descriptions, pd.Series) else pd.Series(list(descriptions), dtype=object)
+        lowered = series.fillna('').astype(str).str.lower()
+        codes, uniques = pd.factorize(lowered, sort=False)
+        labels = np.array([self.categorize(text) for text in uniques] + [self.default], dtype=object)
+        # factorize gives -1 for missing values; that indexes the trailing default.
+        return pd.Series(labels[codes], index=series.index, name='Category')
+
+
+class HybridCategorizer:
+    """
+    Keyword rules first; the ML model only sees what they leave unmatched.
+
+    categorize_many() runs the compiled rules over a batch, once per distinct
+    description, then sends the distinct descriptions no rule matched to the
+    model in a single call. Each row reports its Source ('rules', 'model' or
+    'default') and a Confidence: RULE_CONFIDENCE for keyword hits, the top
+    class probability for models with predict_proba (NaN for ones without),
+    0 otherwise. Model answers below `min_confidence` fall back to the
+    default category, as does everything unmatched when there is no model
+    or the predict call fails.
+
+    `model` is a ModelServer (the version it served is reported) or any
+    object with predict(); it can be attached later with use_model().
+    """
+
+    def __init__(self, model=None, rules=None, default=DEFAULT_CATEGORY,
+                 rule_confidence=RULE_CONFIDENCE, min_confidence=MIN_MODEL_CONFIDENCE):
+        self.rules = KeywordCategorizer(rules, default)
+        self.model = model
+        self.default = default
+        self.rule_confidence = rule_confidence
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._stats = {'rows': 0, 'rules': 0, 'model': 0, 'default': 0,
+                       'model_calls': 0, 'model_inputs': 0, 'model_errors': 0, 'last_error': None}
+
+    def use_model(self, model):
+        self.model = model
+
+    def _predict(self, texts):
+        """(categories, confidences or None, version) for `texts` from one model call."""
+        model = self.model
+        version, pipeline = model.snapshot() if hasattr(model, 'snapshot') else (None, model)
+        if hasattr(pipeline, 'predict_proba') and hasattr(pipeline, 'classes_'):
+            proba = np.asarray(pipeline.predict_proba(texts))
+            best = proba.argmax(axis=1)
+            return np.asarray(pipeline.classes_, dtype=object)[best], proba[np.arange(len(texts)), best], version
+        return np.asarray(list(pipeline.predict(texts)), dtype=object), None, version
+
+    def categorize_many(self, descriptions):
+        """
+        DataFrame with Category, Source, Confidence and ModelVersion (set on
+        rows the model was asked about) for a Series or iterable of
+        descriptions, indexed like the input.
+        """
+        series = descriptions if isinstance(descriptions, pd.Series) else pd.Series(list(descriptions), dtype=object)
+        lowered = series.fillna('').astype(str).str.lower()
+        codes, uniques = pd.factorize(lowered, sort=False)
+        n = len(uniques)
+
+        matches = [self.rules.match(text) for text in uniques]
+        matched = np.array([m is not None for m in matches] + [False])
+        categories = np.array([m if m is not None else self.default for m in matches] + [self.default], dtype=object)
+        sources = np.where(matched, 'rules', 'default').astype(object)
+        confidence = np.where(matched, self.rule_confidence, 0.0)
+        versions = np.full(n + 1, None, dtype=object)
+
+        # Blank descriptions (and the trailing slot factorize's -1 would index) never reach the model
+        ask = np.flatnonzero(~matched[:n] & (np.asarray(uniques, dtype=object) != ''))
+        calls = errors = 0
+        error = None
+        if len(ask) and self.model is not None:
+            calls = 1
+            try:
+                predicted, predicted_confidence, version = self._predict(list(uniques[ask]))
+            except Exception as e:
+                errors, error = 1, f"{type(e).__name__}: {e}"
+            else:
+                versions[ask] = version
+                if predicted_confidence is None:
+                    predicted_confidence = np.full(len(ask), np.nan)
+                confidence[ask] = predicted_confidence
+                # NaN (no probabilities) compares False, so those answers are kept
+                keep = ~(predicted_confidence < self.min_confidence)
+                categories[ask[keep]] = [str(c) for c in predicted[keep]]
+                sources[ask[keep]] = 'model'
+
+        counts = np.bincount(codes[codes >= 0], minlength=n + 1)
+        counts[n] += int((codes < 0).sum())
+        with self._lock:
+            stats = self._stats
+            stats['rows'] += len(codes)
+            for source in SOURCES:
+                stats[source] += int(counts[sources == source].sum())
+            stats['model_calls'] += calls
+            stats['model_inputs'] += len(ask) if calls else 0
+            stats['model_errors'] += errors
+        if error:
+            self.record_error(error)
+
+        return pd.DataFrame({'Category': categories[codes], 'Source': sources[codes],
+                             'Confidence': confidence[codes], 'ModelVersion': versions[codes]},
+                            index=series.index)
+
+    def categorize_records(self, descriptions):
+        """categorize_many as a list of JSON-ready dicts (category, source, confidence, model_version)."""
+        frame = self.categorize_many(descriptions)
+        return [{'category': category, 'source': source,
+                 'confidence': None if np.isnan(confidence) else round(float(confidence), 4),
+                 'model_version': None if pd.isna(version) else version}
+                for category, source, confidence, version in zip(
+                    frame['Category'], frame['Source'], frame['Confidence'], frame['ModelVersion'])]
+
+    def categorize(self, description):
+        """categorize_records for one description."""
+        return self.categorize_records([description])[0]
+
+    def record_error(self, message):
+        """Kept as stats()['last_error'] (a failed predict call, or a model that wouldn't load)."""
+        with self._lock:
+            self._stats['last_error'] = message
+
+    def stats(self):
+        """Rows per source, model calls, and the share of rows the rules answered."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['rule_hit_rate'] = stats['rules'] / stats['rows'] if stats['rows'] else 0.0
+        return stats
+
+    def prometheus(self, prefix="budgetbee_categorizer"):
+        """Rows per source and model call counters in Prometheus text format."""
+        stats = self.stats()
+        lines = [f"# TYPE {prefix}_rows_total counter"]
+        lines += [f'{prefix}_rows_total{{source="{source}"}} {stats[source]}' for source in SOURCES]
+        for name in ('model_calls', 'model_inputs', 'model_errors'):
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {stats[name]}"]
+        lines += [f"# TYPE {prefix}_rule_hit_rate gauge", f"{prefix}_rule_hit_rate {stats['rule_hit_rate']:.6f}"]
+        return "\n".join(lines) + "\n"
+
+
+# The engine only looks at the lowercased text, so that's the whole cache key;
+# entries are dropped when the served model changes.
+_rule_cache = PredictionCache(maxsize=10000, normalize=lambda d: str(d).lower() if d else '')
+_engine = HybridCategorizer()
+_engine_lock = threading.Lock()
+_model_checked = False
+
+
+def default_engine():
+    """
+    The engine behind categorize_expense. On first use it attaches the
+    served model (the registry's active version, else MODEL_PATH) if there
+    is one that loads; otherwise it stays rules-only.
+    """
+    global _model_checked
+    if not _model_checked:
+        with _engine_lock:
+            if not _model_checked:
+                if ModelRegistry().active_version() or os.path.exists(MODEL_PATH):
+                    try:
+                        _engine.use_model(ModelServer(on_switch=_rule_cache.invalidate).start())
+                    except Exception as e:
+                        _engine.record_error(f"model load: {type(e).__name__}: {e}")
+                _model_checked = True
+    return _engine
+
+
+def categorize_expense(description):
+    """Categorize expenses based on description."""
+    return _rule_cache.lookup(description, lambda d: default_engine().categorize(d)['category'])
+
+
+def cache_stats():
+    """Hit-rate statistics for categorize_expense."""
+    return _rule_cache.stats()
+
+
+def categorize_many(descriptions):
+    """Vectorized categorize_expense over a pandas Series of descriptions."""
+    return default_engine().categorize_many(descriptions)['Category']
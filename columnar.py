@@ -0,0 +1,109 @@
+# columnar.py - Typed Arrow IPC snapshots of the expense table
+import json
+import os
+
+from aggregates import to_cents
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+if ARROW_AVAILABLE:
+    # Amount is stored in integer minor units (cents) so nothing is re-parsed
+    # or rounded on load; Category is dictionary-encoded (a handful of values).
+    SCHEMA = pa.schema([
+        ('ID', pa.string()),
+        ('Date', pa.date32()),
+        ('Description', pa.string()),
+        ('Amount', pa.int64()),
+        ('Category', pa.dictionary(pa.int32(), pa.string())),
+    ])
+
+_SOURCE_KEY = b'budgetbee.source'
+
+
+def rows_to_table(rows):
+    """
+    Builds a typed Arrow table from expense row dicts. Raises ValueError if
+    a Date isn't 'yyyy-mm-dd' (older snapshots may hold such rows).
+    """
+    rows = list(rows)
+    dates = pa.array([row['Date'] for row in rows], pa.string())
+    try:
+        dates = pc.cast(pc.strptime(dates, '%Y-%m-%d', 's'), pa.date32()) if rows else pa.array([], pa.date32())
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"Date not in yyyy-mm-dd form: {e}") from e
+    return pa.table({
+        'ID': pa.array([row['ID'] for row in rows], pa.string()),
+        'Date': dates,
+        'Description': pa.array([row['Description'] for row in rows], pa.string()),
+        'Amount': pa.array([to_cents(row['Amount']) for row in rows], pa.int64()),
+        'Category': pa.array([row['Category'] for row in rows], pa.string()).dictionary_encode(),
+    }, schema=SCHEMA)
+
+
+def write_rows(rows, path, source=None):
+    """
+    Writes rows to an uncompressed Arrow IPC file (so it can be memory-mapped).
+    `source` records which CSV snapshot the file was converted from.
+    """
+    table = rows_to_table(rows)
+    if source is not None:
+        table = table.replace_schema_metadata({_SOURCE_KEY: json.dumps(list(source))})
+    tmp_path = path + '.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_table(path, source=None):
+    """
+    Memory-maps an Arrow snapshot. Returns None if it's missing, unreadable or
+    was converted from a different CSV snapshot than `source`.
+    """
+    try:
+        table = ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+    if source is not None:
+        metadata = table.schema.metadata or {}
+        if json.loads(metadata.get(_SOURCE_KEY, b'null')) != list(source):
+            return None
+    return table
+
+
+def read_rows(path, source=None):
+    """Arrow snapshot -> {ID: row dict}, with the type conversions done column-wise."""
+    table = read_table(path, source)
+    if table is None:
+        return None
+    ids = table.column('ID').to_pylist()
+    dates = pc.cast(table.column('Date'), pa.string()).to_pylist()
+    descriptions = table.column('Description').to_pylist()
+    amounts = (table.column('Amount').to_numpy() / 100).tolist()
+    # Look categories up through the dictionary; it shares one str per category.
+    category_codes = table.column('Category').combine_chunks()
+    category_names = category_codes.dictionary.to_pylist()
+    categories = [category_names[code] for code in category_codes.indices.to_numpy(zero_copy_only=False).tolist()]
+    return {
+        expense_id: {'ID': expense_id, 'Date': date, 'Description': desc, 'Amount': amount, 'Category': category}
+        for expense_id, date, desc, amount, category in zip(ids, dates, descriptions, amounts, categories)
+    }
+
+
+def load_frame(path):
+    """
+    Arrow snapshot -> pandas DataFrame indexed by ID, with Amount back in
+    currency units, Date as datetime64 and Category as a pandas categorical.
+    """
+    table = read_table(path)
+    if table is None:
+        return None
+    df = table.to_pandas(date_as_object=False)
+    df['Amount'] = df['Amount'] / 100
+    return df.set_index('ID')
@@ -0,0 +1,259 @@
+# duplicates.py - Duplicate / near-duplicate expense detection
+#
+# Two expenses look like the same purchase when they have the same amount
+# (to the cent), dates at most WINDOW_DAYS apart (a receipt scanned on the
+# day, the bank posting it two days later) and the same vendor: the first
+# word of the description that isn't card / payment noise, so
+# "Starbucks (Receipt)" and "POS 4411 STARBUCKS #1234" agree.
+#
+# DuplicateIndex answers one expense in O(1) expected time and is kept
+# current on add / delete (ExpenseStore keeps one; SQLiteExpenseStore uses
+# an index on (amount, date) instead). BulkDuplicateIndex holds one 64-bit
+# key per stored expense and flags a whole imported file, vectorized.
+#
+# Usage (report likely duplicates already in the store):
+#   python duplicates.py [--backend csv|sqlite] [--data expenses.csv]
+import argparse
+import datetime
+import itertools
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from aggregates import to_cents
+
+WINDOW_DAYS = 3
+# Rows per chunk when hashing store rows for BulkDuplicateIndex
+CHUNK_ROWS = 50000
+# Words that say how something was paid for, not who was paid
+NOISE_WORDS = ['pos', 'purchase', 'card', 'debit', 'credit', 'payment', 'paid', 'upi', 'ach', 'neft', 'imps',
+               'visa', 'mastercard', 'contactless', 'online', 'txn', 'ref', 'the', 'receipt', 'www', 'com']
+VENDOR_PATTERN = re.compile(r"(?<![a-z])(?!(?:%s)(?![a-z]))([a-z]{3,})" % '|'.join(NOISE_WORDS))
+
+_EPOCH = datetime.date(1970, 1, 1)
+# BulkDuplicateIndex keys: (vendor, cents) hash in the high bits, day number in the low DAY_BITS
+DAY_BITS = 24
+_MAX_DAY = (1 << DAY_BITS) - 1 - WINDOW_DAYS
+
+
+def normalize_vendor(description):
+    """The vendor word of a description, lowercased ('' if it has none)."""
+    match = VENDOR_PATTERN.search(str(description or '').lower())
+    # Interned: an index holds the same few thousand vendors many times over
+    return sys.intern(match.group(1)) if match else ''
+
+
+def normalize_vendors(descriptions):
+    """normalize_vendor over a pandas Series, vectorized."""
+    return descriptions.astype(str).str.lower().str.extract(VENDOR_PATTERN, expand=False).fillna('')
+
+
+def day_number(date):
+    """Days since 1970-01-01 of a date, datetime or 'yyyy-mm-dd...' string."""
+    return (datetime.date.fromisoformat(str(date)[:10]) - _EPOCH).days
+
+
+class DuplicateIndex:
+    """
+    Expense IDs bucketed by (vendor, cents, day // (window + 1)). Any two
+    expenses at most `window` days apart fall in the same or neighbouring
+    buckets, so a lookup reads three dict entries, whatever the number of
+    expenses. add / remove are O(1) as well.
+
+    Sized to sit next to every row of the CSV store: the bucket is packed
+    into one int (vendors numbered as they're first seen) and holds a bare
+    (day, id) tuple until a second expense lands in it.
+    """
+
+    def __init__(self, window=WINDOW_DAYS):
+        self.window = window
+        self._vendors = {}
+        self._buckets = {}  # packed (vendor, cents, bucket) -> (day, id) or [(day, id), ...]
+
+    @classmethod
+    def from_rows(cls, rows, window=WINDOW_DAYS):
+        index = cls(window)
+        for row in rows:
+            index.add(row)
+        return index
+
+    def _key(self, vendor, cents, bucket):
+        vendor = self._vendors.setdefault(vendor, len(self._vendors))
+        # 48 bits of cents (offset to be non-negative) and 24 of bucket under the vendor number
+        return (vendor << 72) | ((cents + (1 << 47)) << 24) | bucket
+
+    def _locate(self, date, description, amount):
+        day = day_number(date)
+        return normalize_vendor(description), to_cents(amount), day // (self.window + 1), day
+
+    def _insert(self, vendor, cents, day, expense_id):
+        key = self._key(vendor, cents, day // (self.window + 1))
+        entries = self._buckets.get(key)
+        if entries is None:
+            self._buckets[key] = (day, expense_id)
+        elif isinstance(entries, tuple):
+            self._buckets[key] = [entries, (day, expense_id)]
+        else:
+            entries.append((day, expense_id))
+
+    def add(self, row):
+        try:
+            vendor, cents, _, day = self._locate(row['Date'], row['Description'], row['Amount'])
+        except ValueError:  # unreadable date: nothing to compare it with
+            return
+        self._insert(vendor, cents, day, row['ID'])
+
+    def remove(self, row):
+        try:
+            vendor, cents, bucket, _ = self._locate(row['Date'], row['Description'], row['Amount'])
+        except ValueError:
+            return
+        key = self._key(vendor, cents, bucket)
+        entries = self._buckets.get(key)
+        if entries is None:
+            return
+        remaining = [entry for entry in ([entries] if isinstance(entries, tuple) else entries)
+                     if entry[1] != row['ID']]
+        if not remaining:
+            del self._buckets[key]
+        else:
+            self._buckets[key] = remaining[0] if len(remaining) == 1 else remaining
+
+    def clear(self):
+        self._vendors.clear()
+        self._buckets.clear()
+
+    def __len__(self):
+        return sum(1 if isinstance(entries, tuple) else len(entries) for entries in self._buckets.values())
+
+    def find(self, date, description, amount):
+        """IDs of the indexed expenses that look like this one, nearest date first."""
+        vendor, cents, bucket, day = self._locate(date, description, amount)
+        if vendor not in self._vendors:
+            return []
+        matches = []
+        for neighbour in (bucket - 1, bucket, bucket + 1):
+            entries = self._buckets.get(self._key(vendor, cents, neighbour), [])
+            for other, expense_id in ([entries] if isinstance(entries, tuple) else entries):
+                if abs(other - day) <= self.window:
+                    matches.append((abs(other - day), expense_id))
+        return [expense_id for _, expense_id in sorted(matches)]
+
+
+def row_chunks(rows, chunk_rows=CHUNK_ROWS):
+    """DataFrames of Date / Description / Amount from an iterable of store rows, `chunk_rows` at a time."""
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_rows))
+        if not chunk:
+            return
+        yield pd.DataFrame({
+            'Date': [str(row['Date'])[:10] for row in chunk],
+            'Description': pd.Series([row['Description'] for row in chunk], dtype=object),
+            'Amount': np.array([row['Amount'] for row in chunk], dtype=float),
+        })
+
+
+def _cents(amounts):
+    """aggregates.to_cents, vectorized: half away from zero."""
+    amounts = np.asarray(amounts, dtype=float)
+    return np.copysign(np.floor(np.abs(amounts) * 100 + 0.5), amounts).astype(np.int64)
+
+
+def _dated_keys(dates, descriptions, amounts):
+    """(keys, readable): duplicate_keys of the rows whose date can be read, and the mask of those rows."""
+    days = pd.to_datetime(pd.Series(np.asarray(dates, dtype=object)), format='%Y-%m-%d', errors='coerce')
+    readable = days.notna().to_numpy()
+    frame = pd.DataFrame({
+        'vendor': normalize_vendors(pd.Series(np.asarray(descriptions, dtype=object)[readable])),
+        'cents': _cents(np.asarray(amounts, dtype=float)[readable]),
+    })
+    hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    days = days.to_numpy()[readable]
+    days = np.clip(days.astype('datetime64[D]').astype(np.int64), WINDOW_DAYS, _MAX_DAY).astype(np.uint64)
+    return (hashes >> np.uint64(DAY_BITS) << np.uint64(DAY_BITS)) | days, readable
+
+
+def duplicate_keys(dates, descriptions, amounts):
+    """
+    One uint64 per expense: a hash of (vendor, cents) in the high bits and
+    the day number in the low DAY_BITS, so keys of the same vendor and
+    amount sort by date and "within the window" is a range of keys.
+    Expenses whose date can't be read are left out, as in DuplicateIndex:
+    there's nothing to compare them with.
+    """
+    return _dated_keys(dates, descriptions, amounts)[0]
+
+
+class BulkDuplicateIndex:
+    """
+    Sorted duplicate_keys of the stored expenses (8 bytes each). flag()
+    marks every row of a batch that has a stored expense, or an earlier row
+    of the same import, within WINDOW_DAYS of it, then takes the batch in,
+    so a file can be flagged chunk by chunk. Matches are by 40-bit hash, so
+    a false match is possible but about one in 10^12 per pair.
+    """
+
+    def __init__(self, keys=()):
+        self.keys = np.sort(np.asarray(keys, dtype=np.uint64))
+
+    @classmethod
+    def from_rows(cls, rows, chunk_rows=CHUNK_ROWS):
+        keys = [duplicate_keys(chunk['Date'], chunk['Description'], chunk['Amount'])
+                for chunk in row_chunks(rows, chunk_rows)]
+        return cls(np.concatenate(keys) if keys else ())
+
+    def __len__(self):
+        return len(self.keys)
+
+    def flag(self, dates, descriptions, amounts):
+        """
+        Boolean mask of the rows that look like duplicates; the rows are added
+        to the index. Rows with an unreadable date are never flagged.
+        """
+        keys, readable = _dated_keys(dates, descriptions, amounts)
+        window = np.uint64(WINDOW_DAYS)
+        flagged = (np.searchsorted(self.keys, keys + window, side='right')
+                   > np.searchsorted(self.keys, keys - window, side='left'))
+
+        # Within the batch: after a stable sort, a row repeats the one before it if
+        # the vendor / amount bits match and the days are within the window
+        order = np.argsort(keys, kind='stable')
+        ordered = keys[order]
+        repeat = np.zeros(len(keys), dtype=bool)
+        repeat[1:] = ((ordered[1:] >> np.uint64(DAY_BITS)) == (ordered[:-1] >> np.uint64(DAY_BITS))) \
+            & (ordered[1:] - ordered[:-1] <= window)
+        flagged[order[repeat]] = True
+
+        # Both runs are sorted, so the stable sort is a near-linear merge
+        self.keys = np.sort(np.concatenate([self.keys, ordered]), kind='stable')
+        if readable.all():
+            return flagged
+        mask = np.zeros(len(readable), dtype=bool)
+        mask[readable] = flagged
+        return mask
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List expenses that look like duplicates of an earlier one.")
+    parser.add_argument("--backend", choices=('csv', 'sqlite'), default=os.environ.get('BUDGETBEE_STORAGE', 'csv'))
+    parser.add_argument("--data", help="expense file (default: expenses.csv / expenses.db for the backend)")
+    args = parser.parse_args(argv)
+
+    from expense_store import get_store
+
+    index, found = DuplicateIndex(), 0
+    for row in sorted(get_store(args.data, args.backend).iter_rows(), key=lambda row: row['Date']):
+        matches = index.find(row['Date'], row['Description'], row['Amount'])
+        if matches:
+            found += 1
+            print(f"{row['Date']}  {row['Amount']:>10.2f}  {row['Description']}  (like {', '.join(matches)})")
+        index.add(row)
+    print(f"{found} possible duplicate(s)")
+
+
+if __name__ == "__main__":
+    main()
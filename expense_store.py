@@ -0,0 +1,760 @@
+# expense_store.py - Append-only, journaled expense storage
+import bisect
+import csv
+import datetime
+import heapq
+import itertools
+import json
+import math
+import os
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+import columnar
+from aggregates import ExpenseAggregates
+from duplicates import DuplicateIndex
+from rollups import SpendingRollups, spending
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking is available
+    fcntl = None
+
+COLUMNS = ['ID', 'Date', 'Description', 'Amount', 'Category']
+
+# Fold the journal back into the snapshot after this many appended records.
+COMPACT_EVERY = 500
+# Date index upkeep: back-dated keys wait in a side list of at most
+# max(LATE_MIN, LATE_FACTOR * sqrt(n)) keys; deleted keys stay as tombstones
+# until they're 1 / DEAD_FRACTION of the index. Either way the index is then
+# rebuilt, O(n), which amortizes to O(1) per delete and O(sqrt(n)) per
+# back-dated add.
+LATE_MIN = 256
+LATE_FACTOR = 16
+DEAD_FRACTION = 8
+# A page this deep into an index with tombstones / back-dated keys pays for
+# the rebuild rather than walking past `offset` keys
+WALK_ROWS = 10000
+
+
+def new_expense_id():
+    """Stable, collision-resistant ID for a new expense row."""
+    return os.urandom(8).hex()
+
+
+def normalize_date(value):
+    """'yyyy-mm-dd' of a date, datetime or date string. Raises ValueError if it can't be read."""
+    if isinstance(value, datetime.date):
+        return value.strftime('%Y-%m-%d')
+    text = str(value).strip()
+    try:
+        return datetime.date.fromisoformat(text[:10]).isoformat()
+    except ValueError:
+        pass
+    parsed = pd.to_datetime(text, errors='coerce')
+    if pd.isna(parsed):
+        raise ValueError(f"Unreadable date {value!r}")
+    return parsed.strftime('%Y-%m-%d')
+
+
+def _normalize_row(row, strict=False):
+    """
+    Row with typed fields and an ISO date. New expenses are `strict`: an
+    unreadable date raises ValueError. Rows already stored keep such a date
+    as written rather than becoming unreadable.
+    """
+    try:
+        date = normalize_date(row['Date'])
+    except ValueError:
+        if strict:
+            raise
+        date = str(row['Date'])[:10]
+    return {
+        'ID': str(row['ID']),
+        'Date': date,
+        'Description': '' if row['Description'] is None else str(row['Description']),
+        'Amount': float(row['Amount']),
+        'Category': row['Category'] or 'Other',
+    }
+
+
+class BaseExpenseStore:
+    """
+    Interface shared by the storage backends. The apps only talk to a store
+    through these methods, so the backend can be swapped with
+    BUDGETBEE_STORAGE (see get_store).
+    """
+
+    def add(self, date, description, amount, category):
+        raise NotImplementedError
+
+    def delete(self, expense_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    @contextmanager
+    def bulk_add(self):
+        """
+        For large imports: yields add(rows), taking iterables of (date,
+        description, amount, category) tuples. Everything added in the block
+        is committed together when it exits, and nothing if it raises.
+        """
+        pending = []
+        yield pending.extend
+        for row in pending:
+            self.add(*row)
+
+    def refresh(self):
+        """Picks up writes made by other sessions or processes."""
+
+    def find_duplicates(self, date, description, amount):
+        """
+        Stored expenses that look like the same purchase (see duplicates.py):
+        same amount and vendor, dates at most WINDOW_DAYS apart. Nearest first.
+        """
+        index = DuplicateIndex.from_rows(self.iter_rows())
+        return [self.get(expense_id) for expense_id in index.find(date, description, amount)]
+
+    def get(self, expense_id):
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def summary(self):
+        """{'total', 'count', 'average'} over every expense, from the maintained aggregates."""
+        snapshot = self.aggregates_snapshot()
+        total, count = snapshot['total_cents'] / 100, snapshot['count']
+        return {'total': total, 'count': count, 'average': total / count if count else 0.0}
+
+    def category_totals(self):
+        """Amount spent per category as a pandas Series."""
+        return _totals_series(self.aggregates_snapshot()['categories'])
+
+    def month_totals(self):
+        """Amount spent per 'YYYY-MM' month as a pandas Series."""
+        return _totals_series(self.aggregates_snapshot()['months'])
+
+    def aggregates_snapshot(self):
+        """Maintained running totals (see aggregates.ExpenseAggregates.snapshot)."""
+        raise NotImplementedError
+
+    def rebuild_aggregates(self):
+        """Recomputes the running totals from the raw expenses."""
+        raise NotImplementedError
+
+    def spending(self, period='month', start=None, end=None, categories=None):
+        """
+        Amount spent per day / week / month bucket and category between two
+        dates, as a DataFrame indexed by bucket start (see rollups.spending).
+        Read from the maintained rollups, so the cost grows with the number
+        of buckets, not expenses.
+        """
+        return spending(self.rollup_records, period, start, end, categories)
+
+    def rollup_records(self, period, first=None, last=None, categories=None):
+        """(bucket, category, cents, count) of the maintained `period` rollups, bucket keys `first`..`last`."""
+        raise NotImplementedError
+
+    def rollups_snapshot(self):
+        """Every maintained rollup (see rollups.SpendingRollups.snapshot)."""
+        raise NotImplementedError
+
+    def page(self, offset=0, limit=100, search=None):
+        """
+        One page of expenses, newest first, as a DataFrame indexed by ID.
+        `search` keeps only descriptions containing it (case-insensitive).
+        """
+        raise NotImplementedError
+
+    def rows(self):
+        raise NotImplementedError
+
+    def iter_rows(self):
+        """Every expense row, streamed where the backend can rather than built as one list."""
+        return iter(self.rows())
+
+    def to_frame(self):
+        """Every expense as a DataFrame indexed by ID."""
+        return _rows_to_frame(self.rows())
+
+    def __len__(self):
+        return self.count()
+
+    # -------------------------------
+    # CSV import / export (compatibility with plain expenses.csv files)
+    # -------------------------------
+    def import_csv(self, path):
+        """Adds every row of a Date,Description,Amount,Category CSV. Returns the row count."""
+        added = 0
+        with open(path, newline='') as f:
+            for raw in csv.DictReader(f):
+                self.add(raw['Date'], raw['Description'], raw['Amount'], raw.get('Category'))
+                added += 1
+        return added
+
+    def export_csv(self, path):
+        """Writes every expense to `path` in the snapshot CSV layout."""
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.rows())
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+
+def _folded_offset(data, signature):
+    """
+    Byte offset in journal `data` just past the last 'compacted' record naming
+    `signature`, the snapshot currently on disk, or 0. Everything before that
+    record is already in the snapshot; replaying it again could undo writes
+    that never went through the journal (a 'clear' would wipe bulk_add rows).
+    """
+    end = len(data)
+    while True:
+        start = data.rfind(b'"op":"compacted"', 0, end)
+        if start < 0:
+            return 0
+        line_start = data.rfind(b'\n', 0, start) + 1
+        line_end = data.find(b'\n', start)
+        if line_end < 0:
+            return 0
+        try:
+            if json.loads(data[line_start:line_end]).get('snapshot') == signature:
+                return line_end + 1
+        except ValueError:
+            pass
+        end = line_start
+
+
+def read_store_rows(path):
+    """
+    Every expense of the CSV store at `path` (its snapshot plus the journal
+    records not yet compacted into it), read without writing anything: no
+    lock file, ID migration, Arrow copy or compaction. Torn or unreadable
+    journal lines are skipped. For copying a store elsewhere.
+    """
+    rows = {}
+    try:
+        with open(path, newline='') as f:
+            for raw in csv.DictReader(f):
+                if not raw.get('ID'):
+                    raw['ID'] = new_expense_id()
+                row = _normalize_row(raw)
+                rows[row['ID']] = row
+    except FileNotFoundError:
+        pass
+
+    try:
+        with open(os.path.splitext(path)[0] + '.log', 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        data = b''
+    lines = data[_folded_offset(data, _file_signature(path)):].split(b'\n')
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        op = record.get('op')
+        if op == 'add':
+            row = _normalize_row(record['row'])
+            rows[row['ID']] = row
+        elif op == 'delete':
+            rows.pop(str(record['id']), None)
+        elif op == 'clear':
+            rows.clear()
+    return list(rows.values())
+
+
+def _totals_series(buckets):
+    return pd.Series({key: cents / 100 for key, (cents, _) in sorted(buckets.items())}, dtype=float)
+
+
+def _rows_to_frame(rows):
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    # Rows stored before dates were normalized may hold unreadable ones: NaT
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d', errors='coerce')
+    df['Amount'] = df['Amount'].astype(float)
+    return df.set_index('ID')
+
+
+class ExpenseStore(BaseExpenseStore):
+    """
+    Expenses kept as a CSV snapshot (`expenses.csv`) plus an append-only
+    JSON-lines journal (`expenses.log`) of add / delete / clear records.
+
+    Every change is one fsync'd line appended under a file lock, so adding an
+    expense costs O(1) I/O and concurrent sessions never overwrite each other.
+    Loading replays the journal tail on top of the snapshot. Every
+    `compact_every` records the current state is written to a new snapshot
+    (atomically, via os.replace) and the journal is emptied.
+
+    When pyarrow is installed, a typed Arrow copy of the snapshot
+    (`expenses.arrow`, see columnar.py) is kept next to the CSV and loaded
+    instead of re-parsing text dates and floats. It's converted from the CSV
+    automatically whenever the CSV snapshot changes; a snapshot holding a
+    date Arrow can't type (from before dates were normalized) is read from
+    the CSV instead.
+
+    Replaying a journal on top of the snapshot it was already folded into is
+    not safe in general: bulk_add writes its rows straight into the snapshot,
+    and an old 'clear' record would wipe them. So compaction appends a
+    'compacted' record naming the new snapshot file before installing it,
+    and replay skips everything up to the last such record that matches the
+    snapshot on disk. That makes a crash between writing the snapshot and
+    truncating the journal harmless.
+    """
+
+    def __init__(self, path='expenses.csv', compact_every=COMPACT_EVERY, use_arrow=None):
+        self.path = path
+        self.log_path = os.path.splitext(path)[0] + '.log'
+        self.arrow_path = os.path.splitext(path)[0] + '.arrow'
+        self.use_arrow = columnar.ARROW_AVAILABLE if use_arrow is None else use_arrow
+        self.lock_path = path + '.lock'
+        self.compact_every = compact_every
+        self.skipped_records = 0
+
+        self._lock = threading.RLock()
+        self._rows = {}
+        self._aggregates = ExpenseAggregates()
+        # Date-ordered index for paging: sorted (date, seq, id) keys, with seq
+        # the order rows were added in so same-day expenses keep their order.
+        # A key is live while _order_keys maps its ID to that same tuple;
+        # deletes just drop the mapping (see _index_remove).
+        self._order = []
+        self._order_late = []    # sorted back-dated keys, not yet merged into _order
+        self._order_dead = 0     # tombstones in _order + _order_late
+        self._order_keys = {}
+        self._seq = 0
+        # Built on the first find_duplicates(), then kept current like the others
+        self._duplicates = None
+        # Day / week / month x category totals, built on the first spending() query
+        self._rollups = None
+        self._snapshot_sig = None
+        self._log_offset = 0
+        self._log_records = 0
+        self.reload()
+
+    # -------------------------------
+    # Locking & file helpers
+    # -------------------------------
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            with open(self.lock_path, 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _snapshot_signature(self):
+        return _file_signature(self.path)
+
+    def _log_size(self):
+        try:
+            return os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            return 0
+
+    # -------------------------------
+    # Recovery: snapshot + journal tail
+    # -------------------------------
+    def _read_snapshot(self):
+        """Returns (rows, needs_migration) from the Arrow or CSV snapshot."""
+        signature = self._snapshot_signature()
+        if signature is None:
+            return {}, False
+
+        if self.use_arrow:
+            rows = columnar.read_rows(self.arrow_path, source=signature)
+            if rows is not None:
+                return rows, False
+
+        rows = {}
+        with open(self.path, newline='') as f:
+            reader = csv.DictReader(f)
+            has_ids = reader.fieldnames is not None and 'ID' in reader.fieldnames
+            for raw in reader:
+                if not has_ids:
+                    raw['ID'] = new_expense_id()
+                row = _normalize_row(raw)
+                rows[row['ID']] = row
+
+        if self.use_arrow and has_ids:
+            self._write_arrow(rows.values(), signature)
+        return rows, not has_ids
+
+    def _write_arrow(self, rows, signature):
+        try:
+            columnar.write_rows(rows, self.arrow_path, source=signature)
+        except ValueError:
+            # A stored date Arrow can't type: the CSV snapshot stays the one loaded
+            pass
+
+    def _rebuild_indexes(self):
+        self._aggregates = ExpenseAggregates.from_rows(self._rows.values())
+        self._rollups = None
+        self._order = [(row['Date'], seq, expense_id) for seq, (expense_id, row) in enumerate(self._rows.items())]
+        self._order.sort()
+        self._order_late = []
+        self._order_dead = 0
+        self._order_keys = {key[2]: key for key in self._order}
+        self._seq = len(self._order)
+        self._duplicates = None
+
+    def _compact_order(self):
+        """Merges the back-dated keys into the date index and drops its tombstones, O(n)."""
+        live = self._order_keys
+        order, late = self._order, self._order_late
+        if self._order_dead:
+            order = [key for key in order if live.get(key[2]) is key]
+            late = [key for key in late if live.get(key[2]) is key]
+        if late:
+            order = order + late
+            order.sort()  # two sorted runs: a single merge pass
+        self._order = order
+        self._order_late = []
+        self._order_dead = 0
+
+    def _newest_keys(self):
+        """Live date-index keys, newest first."""
+        live = self._order_keys
+        keys = reversed(self._order)
+        if self._order_late:
+            keys = heapq.merge(keys, reversed(self._order_late), reverse=True)
+        return (key for key in keys if live.get(key[2]) is key)
+
+    def _index_add(self, row):
+        self._seq += 1
+        key = (row['Date'], self._seq, row['ID'])
+        self._order_keys[row['ID']] = key
+        if not self._order or key >= self._order[-1]:
+            # Today's expense, the usual case: it sorts last
+            self._order.append(key)
+        else:
+            bisect.insort(self._order_late, key)
+            if len(self._order_late) > max(LATE_MIN, LATE_FACTOR * math.isqrt(len(self._order))):
+                self._compact_order()
+        if self._duplicates is not None:
+            self._duplicates.add(row)
+        if self._rollups is not None:
+            self._rollups.add(row)
+
+    def _index_remove(self, row):
+        # Leaves a tombstone: the key stays in the index, no longer live
+        del self._order_keys[row['ID']]
+        self._order_dead += 1
+        if self._order_dead * DEAD_FRACTION > len(self._order) + len(self._order_late):
+            self._compact_order()
+        if self._duplicates is not None:
+            self._duplicates.remove(row)
+        if self._rollups is not None:
+            self._rollups.remove(row)
+
+    def _apply(self, record):
+        op = record.get('op')
+        if op == 'add':
+            row = _normalize_row(record['row'])
+            previous = self._rows.get(row['ID'])
+            if previous is not None:
+                self._aggregates.remove(previous)
+                self._index_remove(previous)
+            self._rows[row['ID']] = row
+            self._aggregates.add(row)
+            self._index_add(row)
+        elif op == 'delete':
+            previous = self._rows.pop(str(record['id']), None)
+            if previous is not None:
+                self._aggregates.remove(previous)
+                self._index_remove(previous)
+        elif op == 'clear':
+            self._rows.clear()
+            self._aggregates.clear()
+            self._rollups = None
+            self._duplicates = None
+            self._order = []
+            self._order_late = []
+            self._order_dead = 0
+            self._order_keys = {}
+
+    def _folded_log_offset(self):
+        try:
+            with open(self.log_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        return _folded_offset(data, self._snapshot_sig)
+
+    def _replay_log(self):
+        """Applies journal records written since the last replay (caller holds the lock)."""
+        try:
+            with open(self.log_path, 'rb') as f:
+                f.seek(self._log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        complete, _, torn = data.rpartition(b'\n')
+        if torn:
+            # A writer died mid-line. Everyone appends under the lock we hold,
+            # so this tail can never be completed - cut it off.
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(self._log_offset + len(complete) + (1 if complete else 0))
+
+        if complete:
+            for line in complete.split(b'\n'):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    self.skipped_records += 1
+                    continue
+                self._apply(record)
+                self._log_records += 1
+            self._log_offset += len(complete) + 1
+
+    def reload(self):
+        """Rebuilds in-memory state from the snapshot plus the whole journal."""
+        with self._locked():
+            self._reload_locked()
+
+    def _reload_locked(self):
+        self._rows, needs_migration = self._read_snapshot()
+        self._rebuild_indexes()
+        self._snapshot_sig = self._snapshot_signature()
+        self._log_offset = self._folded_log_offset()
+        self._log_records = 0
+        self._replay_log()
+        if needs_migration:
+            # Old expenses.csv without IDs: persist the IDs we just assigned.
+            self._compact_locked()
+
+    def _refresh_locked(self):
+        if self._snapshot_signature() != self._snapshot_sig or self._log_size() < self._log_offset:
+            # Another process compacted since we last looked.
+            self._reload_locked()
+        else:
+            self._replay_log()
+
+    def refresh(self):
+        """Picks up records appended by other sessions or processes."""
+        with self._locked():
+            self._refresh_locked()
+
+    # -------------------------------
+    # Writes
+    # -------------------------------
+    def _append(self, record):
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+        with self._locked():
+            self._refresh_locked()
+            with open(self.log_path, 'ab') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(record)
+            self._log_offset += len(line)
+            self._log_records += 1
+            if self._log_records >= self.compact_every:
+                self._compact_locked()
+
+    def add(self, date, description, amount, category):
+        """Appends one expense and returns its row (including the new ID)."""
+        row = _normalize_row({
+            'ID': new_expense_id(),
+            'Date': date,
+            'Description': description,
+            'Amount': amount,
+            'Category': category,
+        }, strict=True)
+        self._append({'op': 'add', 'row': row})
+        return row
+
+    def delete(self, expense_id):
+        """Deletes an expense by ID. Returns False if it didn't exist."""
+        with self._lock:
+            self.refresh()
+            if str(expense_id) not in self._rows:
+                return False
+            self._append({'op': 'delete', 'id': str(expense_id)})
+            return True
+
+    def clear(self):
+        """Deletes every expense."""
+        self._append({'op': 'clear'})
+
+    @contextmanager
+    def bulk_add(self):
+        """
+        Rows added in the block are held in memory (the store keeps every
+        row there anyway) and, when it exits, go into one new snapshot that
+        replaces the old one atomically, journal folded in. Other processes
+        see all of them or none, and indexes are rebuilt once instead of per
+        row. Nothing is written if the block raises.
+        """
+        pending = []
+
+        def add(rows):
+            pending.extend(
+                _normalize_row({'ID': new_expense_id(), 'Date': d, 'Description': desc, 'Amount': a, 'Category': c},
+                               strict=True)
+                for d, desc, a, c in rows
+            )
+
+        yield add
+        if not pending:
+            return
+        with self._locked():
+            self._refresh_locked()
+            self._rows.update((row['ID'], row) for row in pending)
+            self._rebuild_indexes()
+            self._compact_locked()
+
+    # -------------------------------
+    # Compaction
+    # -------------------------------
+    def _compact_locked(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(self._rows.values())
+            f.flush()
+            os.fsync(f.fileno())
+
+        # The rename keeps inode, mtime and size, so this names the snapshot
+        # we are about to install. If we die after the replace but before the
+        # truncate below, replay starts after this record (see class
+        # docstring); if we die before the replace, it names no file on disk
+        # and the old snapshot plus the whole journal is replayed as before.
+        marker = {'op': 'compacted', 'snapshot': _file_signature(tmp_path)}
+        with open(self.log_path, 'ab') as f:
+            f.write((json.dumps(marker, separators=(',', ':')) + '\n').encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._snapshot_sig = self._snapshot_signature()
+        if self.use_arrow:
+            self._write_arrow(self._rows.values(), self._snapshot_sig)
+
+        self._truncate_log()
+        self._log_offset = 0
+        self._log_records = 0
+
+    def _truncate_log(self):
+        with open(self.log_path, 'wb') as f:
+            os.fsync(f.fileno())
+
+    def compact(self):
+        """Writes the current state to a fresh snapshot and empties the journal."""
+        with self._locked():
+            self._refresh_locked()
+            self._compact_locked()
+
+    # -------------------------------
+    # Reads
+    # -------------------------------
+    def count(self):
+        return len(self._rows)
+
+    def get(self, expense_id):
+        return self._rows.get(str(expense_id))
+
+    def rows(self):
+        with self._lock:
+            return list(self._rows.values())
+
+    def aggregates_snapshot(self):
+        with self._lock:
+            return self._aggregates.snapshot()
+
+    def rebuild_aggregates(self):
+        with self._lock:
+            self._aggregates = ExpenseAggregates.from_rows(self._rows.values())
+            self._rollups = None
+
+    def _current_rollups(self):
+        if self._rollups is None:
+            self._rollups = SpendingRollups.from_rows(self._rows.values())
+        return self._rollups
+
+    def rollup_records(self, period, first=None, last=None, categories=None):
+        with self._lock:
+            self.refresh()
+            return self._current_rollups().records(period, first, last, categories)
+
+    def rollups_snapshot(self):
+        with self._lock:
+            return self._current_rollups().snapshot()
+
+    def find_duplicates(self, date, description, amount):
+        with self._lock:
+            self.refresh()
+            if self._duplicates is None:
+                self._duplicates = DuplicateIndex.from_rows(self._rows.values())
+            return [self._rows[expense_id] for expense_id in self._duplicates.find(date, description, amount)]
+
+    def page(self, offset=0, limit=100, search=None):
+        with self._lock:
+            if not search:
+                if (self._order_late or self._order_dead) and offset > WALK_ROWS:
+                    self._compact_order()
+                if self._order_late or self._order_dead:
+                    # Newest first, skipping tombstones: O(offset + limit + tombstones passed)
+                    keys = list(itertools.islice(self._newest_keys(), offset, offset + limit))
+                else:
+                    # Newest first: a slice off the end of the date index, O(limit).
+                    end = max(len(self._order) - offset, 0)
+                    keys = self._order[max(end - limit, 0):end][::-1]
+                return _rows_to_frame([self._rows[key[2]] for key in keys])
+
+            needle = search.lower()
+            rows, skipped = [], 0
+            for key in self._newest_keys():
+                row = self._rows[key[2]]
+                if needle in row['Description'].lower():
+                    if skipped < offset:
+                        skipped += 1
+                        continue
+                    rows.append(row)
+                    if len(rows) == limit:
+                        break
+            return _rows_to_frame(rows)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=None, backend=None):
+    """
+    Process-wide expense store shared by every Streamlit session.
+    `backend` (or the BUDGETBEE_STORAGE env var) picks 'csv' - the journaled
+    expenses.csv store - or 'sqlite' for expenses.db.
+    """
+    backend = backend or os.environ.get('BUDGETBEE_STORAGE', 'csv')
+    if backend not in ('csv', 'sqlite'):
+        raise ValueError(f"Unknown storage backend: {backend}")
+    path = path or ('expenses.db' if backend == 'sqlite' else 'expenses.csv')
+
+    with _stores_lock:
+        if (backend, path) not in _stores:
+            if backend == 'sqlite':
+                from sqlite_store import SQLiteExpenseStore
+                _stores[(backend, path)] = SQLiteExpenseStore(path)
+            else:
+                _stores[(backend, path)] = ExpenseStore(path)
+        return _stores[(backend, path)]
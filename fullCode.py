@@ -1,8 +1,13 @@
 # app.py (Streamlit Version)
+import startup
 import streamlit as st
-import pandas as pd
-import joblib
-from PIL import Image
+from categorizer import HybridCategorizer
+from microbatch import MicroBatcher
+from model_loader import MODEL_PATH
+from model_registry import ModelServer
+from prediction_cache import PredictionCache
+
+startup.mark('imports')
 
 # Set page config
 st.set_page_config(
@@ -54,17 +59,33 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Load your ML model
+# Repeated descriptions skip the model; dropped whenever the served model version changes
+@st.cache_resource
+def load_prediction_cache():
+    return PredictionCache()
+
+prediction_cache = load_prediction_cache()
+
+# Load your ML model: the registry's active version (memory-mapped, shared
+# with other processes), hot-swapped when a new version is activated
 @st.cache_resource
 def load_model():
     try:
-        pipeline = joblib.load("budgetbee_pipeline.joblib")
-        return pipeline
+        return ModelServer(on_switch=prediction_cache.invalidate).start()
     except Exception as e:
         st.error(f"Error loading model: {e}")
         return None
 
-pipeline = load_model()
+model = load_model()
+
+# Keyword rules first, the model only for what they don't match (rules only
+# if no model loaded); one batcher per process, so concurrent sessions'
+# predictions share predict calls
+@st.cache_resource
+def load_batcher(_model):
+    return MicroBatcher(HybridCategorizer(_model).categorize_records)
+
+batcher = load_batcher(model)
 
 # App header
 st.markdown("<h1 style='text-align: center; color: #ffcc00; text-shadow: 1px 1px black;'>🐝 BudgetBee</h1>", unsafe_allow_html=True)
@@ -82,12 +103,15 @@ with st.form("prediction_form"):
             st.error("Please enter a description")
         elif amt <= 0:
             st.error("Please enter a valid amount")
-        elif pipeline is None:
-            st.error("Model not loaded. Please check if budgetbee_pipeline.joblib exists.")
         else:
             # Make prediction
             with st.spinner("Analyzing your expense... 🐝"):
-                category = pipeline.predict([desc])[0]
+                prediction = prediction_cache.lookup(desc, batcher.predict_one)
+            if model is None and prediction["source"] == "default":
+                st.warning(f"No keyword rule matched and no model is loaded. Publish one with `python model_registry.py publish` or check that {MODEL_PATH} exists.")
+            source = {"rules": "Keyword rules", "model": f"Model {prediction['model_version']}"}.get(prediction["source"], "No match")
+            if prediction["confidence"] is not None:
+                source += f" · {prediction['confidence']:.0%} confidence"
             
             # Display results
             st.markdown("---")
@@ -98,7 +122,8 @@ with st.form("prediction_form"):
                 <p><b>Description:</b> {desc}</p>
                 <p><b>Amount:</b> ₹{amt:.2f}</p>
                 <p><b>Predicted Category:</b></p>
-                <div class='category-badge'>{category}</div>
+                <div class='category-badge'>{prediction["category"]}</div>
+                <p style='color: gray; font-size: 12px;'>{source}</p>
             </div>
             """, unsafe_allow_html=True)
             
@@ -112,3 +137,5 @@ st.markdown("<div style='text-align: center; padding: 15px; background: black; c
 st.markdown("<p>Made with 🐝 love by Novus</p>", unsafe_allow_html=True)
 st.markdown("<p>Buzzing your budget smartly 🐝</p>", unsafe_allow_html=True)
 st.markdown("</div>", unsafe_allow_html=True)
+
+startup.mark_rendered()
@@ -1,115 +1,116 @@
 # budgetbee_app.py
+import startup
 import streamlit as st
 import pandas as pd
-import numpy as np
-from datetime import datetime
-from PIL import Image
-import tempfile
+from datetime import datetime, timedelta
 import os
+from expense_store import get_store
+from rollups import PERIODS
+from categorizer import categorize_expense
+
+startup.mark('imports')
+
+PAGE_SIZE = 50  # expenses per page in the history table
+# Ranges offered by the spending-over-time chart (None: everything)
+SPENDING_WINDOWS = {"Last 30 days": 30, "Last 90 days": 90, "Last 12 months": 365, "All time": None}
 
 # --- Check for OCR dependencies ---
-try:
-    import cv2
-    import easyocr
-    import re
-    OCR_AVAILABLE = True
-except ImportError:
-    OCR_AVAILABLE = False
+# Only checked for here; the OCR / vision stack is imported on first use
+# (opening the Receipt Scanner), so the other pages start without it
+OCR_AVAILABLE = startup.available('cv2', 'easyocr')
+if OCR_AVAILABLE:
+    ocr_cache = startup.lazy_import('ocr_cache')
+    ocr_engine = startup.lazy_import('ocr_engine')
+    ocr_jobs = startup.lazy_import('ocr_jobs')
+    ocr_regions = startup.lazy_import('ocr_regions')
+    preprocessing = startup.lazy_import('preprocessing')
+    receipt_image = startup.lazy_import('receipt_image')
+else:
     st.sidebar.warning("⚠️ Receipt scanning is disabled. Required libraries (opencv-python, easyocr) could not be installed.")
 
 # -------------------------------
 # 1. VISION & EXTRACTION CORE (OCR Function)
 # -------------------------------
-def process_receipt_image(uploaded_file):
+def process_receipt_image(image_bytes, progress, preset='auto', ocr_mode='full'):
     """
-    Takes an uploaded Streamlit file, processes it with OpenCV & EasyOCR,
-    and returns parsed data (vendor, total, items).
+    Background job: takes the bytes of an uploaded receipt, processes them
+    with OpenCV & EasyOCR, and returns parsed data (vendor, total, items)
+    plus the preprocessing report (preset used, confidence, per-stage timings).
     """
-    if not OCR_AVAILABLE:
-        return None, None, []
-
-    # Save the uploaded file to a temporary file so OpenCV can read it
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-        tmp_file.write(uploaded_file.getvalue())
-        tmp_img_path = tmp_file.name
-
-    try:
-        # --- Image Loading and Preprocessing ---
-        image = cv2.imread(tmp_img_path)
-        if image is None:
-            return None, None, []
-
-        gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        thresh_image = cv2.adaptiveThreshold(gray_image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-
-        # --- Text Extraction with EasyOCR ---
-        reader = easyocr.Reader(['en'])
-        results = reader.readtext(thresh_image)
-
-        # --- Data Parsing ---
-        total_amount = None
-        vendor_name = None
-        items_list = []
-
-        # Logic to find TOTAL
-        for _, text, prob in results:
-            text_clean = text.upper().replace(' ', '').replace('$', '')
-            if 'TOTAL' in text_clean and prob > 0.3:
-                numbers_found = re.findall(r'\d+\.\d{2}', text_clean)
-                if numbers_found:
-                    total_amount = float(numbers_found[0])
-                    break
-
-        # Logic to find Items and Vendor
-        for i, (_, text, prob) in enumerate(results):
-            # Vendor is often near the top
-            if i < 3 and prob > 0.4 and vendor_name is None:
-                vendor_name = text
-
-            # Find items and prices
-            if prob > 0.3:
-                numbers_in_text = re.findall(r'\d+\.\d{2}', text)
-                if numbers_in_text and len(text) > 3:
-                    item_desc = re.sub(r'\d+\.\d{2}', '', text).strip()
-                    items_list.append({'item': item_desc, 'price': float(numbers_in_text[0])})
-                else:
-                    try:
-                        next_text = results[i+1][1]
-                        if re.match(r'^\d+\.\d{2}$', next_text.strip()):
-                            items_list.append({'item': text, 'price': float(next_text)})
-                    except IndexError:
-                        continue
-
-        return vendor_name, total_amount, items_list
-
-    except Exception as e:
-        st.error(f"Error processing image: {e}")
-        return None, None, []
-    finally:
-        # Clean up the temporary file
-        os.unlink(tmp_img_path)
+    # --- Image Loading ---
+    # Decoded straight from the upload bytes and downscaled to ~300 DPI
+    progress(0.0, "Decoding image")
+    gray_image = receipt_image.load_receipt(image_bytes)
 
-# -------------------------------
-# 2. ANALYTICS ENGINE (Pandas/NumPy)
-# -------------------------------
-def categorize_expense(description):
+    # --- Preprocessing, EasyOCR (shared, already-loaded reader) and Parsing ---
+    # A receipt scanned before with the same preprocessing comes straight from the OCR cache
+    (vendor, total, items), report = ocr_cache.scan_receipt(
+        gray_image, lambda image: ocr_engine.readtext(image, ['en']), preset=preset,
+        cache=ocr_cache.get_cache(['en']), progress=progress, ocr_mode=ocr_mode)
+    return {'vendor': vendor, 'total': total, 'items': items, 'report': report}
+
+
+@st.cache_resource
+def get_scan_jobs():
+    """One background OCR job queue per server process, shared by every session."""
+    return ocr_jobs.JobQueue(process_receipt_image)
+
+
+@st.fragment(run_every=1)
+def show_scan_progress(job_id):
+    """Polls a running scan without blocking the rest of the page."""
+    job = get_scan_jobs().get(job_id)
+    if job['status'] not in ocr_jobs.ACTIVE:
+        st.rerun()  # finished: redraw the page with the result
+    st.progress(job['progress'], text=f"🤖 {job['message']}...")
+    if st.button("Cancel scan"):
+        get_scan_jobs().cancel(job_id)
+        st.rerun()
+
+
+def expense_pager(key):
     """
-    A simple rule-based categorizer.
+    Search box + page controls over the expense store. Returns the current
+    page (newest first, indexed by expense ID); only that page is fetched
+    and rendered, however long the history is.
     """
-    if not description:
-        return 'Other'
-        
-    description_lower = description.lower()
-    if any(word in description_lower for word in ['coffee', 'mcdonald', 'kfc', 'restaurant', 'food', 'grocery', 'supermarket']):
-        return 'Food'
-    elif any(word in description_lower for word in ['shell', 'gas', 'petrol', 'metro', 'bus', 'uber', 'transport', 'fuel']):
-        return 'Transport'
-    elif any(word in description_lower for word in ['cine', 'movie', 'netflix', 'entertain', 'concert']):
-        return 'Entertainment'
-    elif any(word in description_lower for word in ['rent', 'electric', 'water', 'internet', 'bill']):
-        return 'Utilities'
+    search = st.text_input("🔎 Search descriptions", key=f"{key}_search").strip()
+    page_key = f"{key}_page"
+    if st.session_state.get(f"{key}_last_search") != search:
+        st.session_state[f"{key}_last_search"] = search
+        st.session_state[page_key] = 0
+    page_number = st.session_state.get(page_key, 0)
+
+    # One extra row tells us whether there's a next page without counting matches.
+    expenses = store.page(offset=page_number * PAGE_SIZE, limit=PAGE_SIZE + 1, search=search or None)
+    has_next = len(expenses) > PAGE_SIZE
+    expenses = expenses.iloc[:PAGE_SIZE]
+
+    prev_col, info_col, next_col = st.columns([1, 3, 1])
+    if prev_col.button("⬅️ Previous", key=f"{key}_prev", disabled=page_number == 0):
+        st.session_state[page_key] = page_number - 1
+        st.rerun()
+    if next_col.button("Next ➡️", key=f"{key}_next", disabled=not has_next):
+        st.session_state[page_key] = page_number + 1
+        st.rerun()
+    if search:
+        info_col.caption(f"Page {page_number + 1} of matches for “{search}”")
     else:
-        return 'Other'
+        total_pages = max(1, -(-store.count() // PAGE_SIZE))
+        info_col.caption(f"Page {page_number + 1} of {total_pages}")
+    return expenses
+
+
+def show_duplicates(duplicates):
+    """Warns that an expense about to be added looks like one already stored."""
+    listed = "\n".join(f"- {row['Date']}: {row['Description']} (${row['Amount']:.2f})" for row in duplicates[:5])
+    st.warning(f"⚠️ This looks like an expense you already added:\n{listed}")
+
+# -------------------------------
+# 2. ANALYTICS ENGINE (Pandas/NumPy)
+# -------------------------------
+# categorize_expense comes from categorizer.py (keyword rules compiled into one regex,
+# the served model, if any, for descriptions no rule matches)
 
 # -------------------------------
 # 3. THE HUB (Streamlit UI)
@@ -119,12 +120,10 @@ st.set_page_config(page_title="BudgetBee - ETHOS Stack", layout="wide")
 st.title("BudgetBee 🐝")
 st.header("The Complete ETHOS Stack Expense Tracker")
 
-# Initialize session state for our main DataFrame
-if 'df_expenses' not in st.session_state:
-    try:
-        st.session_state.df_expenses = pd.read_csv('expenses.csv', parse_dates=['Date'])
-    except FileNotFoundError:
-        st.session_state.df_expenses = pd.DataFrame(columns=['Date', 'Description', 'Amount', 'Category'])
+# Shared expense store (journaled CSV or SQLite, see BUDGETBEE_STORAGE);
+# refresh picks up expenses added by other sessions since the last rerun
+store = get_store()
+store.refresh()
 
 # Sidebar for navigation
 page = st.sidebar.radio("Navigate", ["Dashboard", "Add Expense", "Receipt Scanner"])
@@ -133,14 +132,26 @@ if page == "Dashboard":
     # --- DATA VISUALIZATION ---
     st.subheader("Financial Dashboard")
     
-    if not st.session_state.df_expenses.empty:
+    summary = store.summary()
+    if summary['count']:
         col1, col2 = st.columns(2)
         with col1:
-            st.metric("Total Expenses", f"${st.session_state.df_expenses['Amount'].sum():.2f}")
-            st.dataframe(st.session_state.df_expenses, use_container_width=True)
+            st.metric("Total Expenses", f"${summary['total']:.2f}")
+            st.dataframe(expense_pager("history"), use_container_width=True)
         with col2:
-            spending_by_category = st.session_state.df_expenses.groupby('Category')['Amount'].sum()
+            spending_by_category = store.category_totals()
             st.bar_chart(spending_by_category)
+
+        # --- SPENDING OVER TIME (from the maintained rollups: one read per bucket) ---
+        st.subheader("Spending Over Time")
+        period_col, window_col, category_col = st.columns(3)
+        period = period_col.selectbox("Group by", PERIODS, index=1)
+        window = window_col.selectbox("Range", list(SPENDING_WINDOWS), index=1)
+        categories = category_col.multiselect("Categories", list(spending_by_category.index))
+        days = SPENDING_WINDOWS[window]
+        today = datetime.today().date()
+        start, end = (today - timedelta(days=days - 1), today) if days else (None, None)
+        st.bar_chart(store.spending(period, start, end, categories or None))
     else:
         st.info("No expenses to show. Add some via 'Add Expense' or 'Receipt Scanner'!")
 
@@ -151,19 +162,50 @@ elif page == "Add Expense":
         date = st.date_input("Date", datetime.today())
         desc = st.text_input("Description")
         amount = st.number_input("Amount ($)", min_value=0.0, format="%.2f")
+        add_anyway = st.checkbox("Add even if it looks like a duplicate")
         submitted = st.form_submit_button("Add Expense")
         
         if submitted:
             if desc and amount > 0:
-                category = categorize_expense(desc)
-                new_row = pd.DataFrame([[date, desc, amount, category]], 
-                                      columns=['Date', 'Description', 'Amount', 'Category'])
-                st.session_state.df_expenses = pd.concat([st.session_state.df_expenses, new_row], ignore_index=True)
-                st.session_state.df_expenses.to_csv('expenses.csv', index=False)
-                st.success("Expense added!")
+                duplicates = [] if add_anyway else store.find_duplicates(date, desc, amount)
+                if duplicates:
+                    show_duplicates(duplicates)
+                else:
+                    category = categorize_expense(desc)
+                    store.add(date, desc, amount, category)
+                    st.success("Expense added!")
             else:
                 st.error("Please fill in description and amount.")
 
+    # --- BANK STATEMENT IMPORT ---
+    st.subheader("Import Bank Statement")
+    statement = st.file_uploader("CSV, OFX/QFX or QIF statement", type=["csv", "ofx", "qfx", "qif"])
+    sign_col, dayfirst_col = st.columns(2)
+    sign = sign_col.selectbox("Spending amounts are", ["auto", "negative", "positive"],
+                              help="For CSVs with one amount column; 'auto' goes by the sign most amounts have")
+    dayfirst = dayfirst_col.checkbox("Dates are day/month (e.g. 31/01/2024)")
+    if statement is not None and st.button("Import Statement"):
+        import tempfile
+        from statement_import import StatementError, import_statement
+
+        # Streamed from disk in chunks, so write the upload out instead of reading it into memory
+        suffix = os.path.splitext(statement.name)[1]
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+            f.write(statement.getbuffer())
+        try:
+            with st.spinner("Importing..."):
+                report = import_statement(f.name, store, sign=sign, dayfirst=dayfirst)
+            st.success(f"Imported {report['imported']:,} of {report['rows']:,} transactions "
+                       f"({report['rows_per_second']:,.0f} rows/s); {report['duplicates']:,} duplicates "
+                       f"and {report['credits']:,} credits skipped.")
+            if report['near_duplicates']:
+                st.warning(f"{report['near_duplicates']:,} imported transactions look like expenses already "
+                           f"added (same amount and vendor within a few days), e.g. from scanned receipts.")
+        except StatementError as e:
+            st.error(f"Could not import {statement.name}: {e}")
+        finally:
+            os.unlink(f.name)
+
 elif page == "Receipt Scanner":
     # --- OCR INTEGRATION UI ---
     st.subheader("Scan a Receipt")
@@ -172,14 +214,46 @@ elif page == "Receipt Scanner":
         st.error("The receipt scanning feature is not available on this deployment. Required libraries could not be installed.")
         st.info("To use receipt scanning, please run this app locally with: `pip install opencv-python easyocr`")
     else:
+        # First visit loads the OCR stack and model in the background, ready for the first scan
+        ocr_engine.warm_up()
         uploaded_file = st.file_uploader("Upload a receipt image (JPG, PNG)", type=['jpg', 'jpeg', 'png'])
         
         if uploaded_file is not None:
             st.image(uploaded_file, caption="Uploaded Receipt", use_column_width=True)
             
+            preset = st.selectbox("Image preprocessing", [preprocessing.AUTO] + list(preprocessing.PRESETS),
+                                  help="'auto' tries the cheaper presets first and stops once OCR is confident")
+            ocr_mode = st.radio("OCR mode", ocr_regions.OCR_MODES, horizontal=True,
+                                help="'tiled' reads only the text regions; faster on long receipts")
+
+            scan_jobs = get_scan_jobs()
+            # Scans run in the background; the job ID is remembered per uploaded file
+            job_ids = st.session_state.setdefault('scan_jobs', {})
             if st.button("Extract Data from Receipt"):
-                with st.spinner("Processing image with AI... 🤖"):
-                    vendor, total, items = process_receipt_image(uploaded_file)
+                try:
+                    job_ids[uploaded_file.file_id] = scan_jobs.submit(uploaded_file.getvalue(), preset=preset, ocr_mode=ocr_mode)
+                except ocr_jobs.QueueFull:
+                    st.warning("The scanner is busy with other receipts. Please try again in a moment.")
+
+            job = scan_jobs.get(job_ids.get(uploaded_file.file_id))
+            if job and job['status'] in ocr_jobs.ACTIVE:
+                show_scan_progress(job['id'])
+            elif job and job['status'] == ocr_jobs.FAILED:
+                st.error(f"Error processing image: {job['error']}")
+            elif job and job['status'] == ocr_jobs.CANCELLED:
+                st.info("Scan cancelled.")
+            elif job:
+                vendor, total, items, report = (job['result'][key] for key in ('vendor', 'total', 'items', 'report'))
+
+                ocr_stats = ocr_engine.ocr_stats()
+                load_col, infer_col = st.columns(2)
+                load_col.metric("OCR model load time", f"{ocr_stats['load_seconds']:.2f}s")
+                infer_col.metric("Avg OCR inference time", f"{ocr_stats['avg_inference_seconds']:.2f}s")
+                if report.get('cached'):
+                    st.caption(f"⚡ Scanned before: served from the OCR cache in {report['lookup_seconds'] * 1000:.0f}ms")
+                elif report:
+                    stage_times = ", ".join(f"{stage} {seconds * 1000:.0f}ms" for stage, seconds in report['stages'].items())
+                    st.caption(f"Preprocessing: {report['preset']} (OCR confidence {report['confidence']:.0%}) · {stage_times}")
                 
                 if vendor or items:
                     st.success("Data extracted!")
@@ -191,13 +265,14 @@ elif page == "Receipt Scanner":
                         df_extracted = pd.DataFrame(items)
                         st.dataframe(df_extracted, use_container_width=True)
                         
+                        today = datetime.today().date()
+                        receipt_desc = f"{vendor} (Receipt)" if vendor else 'Receipt Purchase'
+                        duplicates = store.find_duplicates(today, receipt_desc, total) if total else []
+                        if duplicates:
+                            show_duplicates(duplicates)
                         if total and st.button(f"Add Total (${total}) to Expenses"):
-                            today = datetime.today().date()
                             category = categorize_expense(vendor if vendor else "Receipt Purchase")
-                            new_row = pd.DataFrame([[today, f"{vendor} (Receipt)" if vendor else 'Receipt Purchase', total, category]], 
-                                                  columns=['Date', 'Description', 'Amount', 'Category'])
-                            st.session_state.df_expenses = pd.concat([st.session_state.df_expenses, new_row], ignore_index=True)
-                            st.session_state.df_expenses.to_csv('expenses.csv', index=False)
+                            store.add(today, receipt_desc, total, category)
                             st.success(f"Added ${total} to your expenses!")
                 else:
                     st.error("Could not extract any data from this image. Try a clearer photo.")
@@ -205,3 +280,5 @@ elif page == "Receipt Scanner":
 # Footer
 st.sidebar.divider()
 st.sidebar.info("**ETHOS Stack:** Extraction (OCR), Tracking (CSV), Hub (UI), Optimization (Categorization), System")
+
+startup.mark_rendered()
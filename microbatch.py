@@ -0,0 +1,139 @@
+# microbatch.py - Coalesce single predictions into batched predict calls
+import bisect
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_WAIT = 0.005  # seconds
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+QUEUE_DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class Histogram:
+    """Cumulative-bucket histogram, exported in Prometheus text format."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """{'buckets': {upper_bound: cumulative count}, 'sum', 'count'}"""
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        cumulative, running = {}, 0
+        for bound, n in zip(list(self.buckets) + ['+Inf'], counts):
+            running += n
+            cumulative[bound] = running
+        return {'buckets': cumulative, 'sum': total, 'count': count}
+
+    def prometheus_lines(self, name, help_text):
+        snap = self.snapshot()
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for bound, n in snap['buckets'].items():
+            lines.append(f'{name}_bucket{{le="{bound}"}} {n}')
+        lines.append(f"{name}_sum {snap['sum']}")
+        lines.append(f"{name}_count {snap['count']}")
+        return lines
+
+
+class MicroBatcher:
+    """
+    Sits in front of a vectorized `predict_fn(list) -> list`. Callers submit
+    one item each; a background thread waits up to `max_wait` seconds after
+    the first item arrives (or until `max_batch` items are queued), runs a
+    single predict over the lot and hands each caller its own result.
+    """
+
+    def __init__(self, predict_fn, max_batch=DEFAULT_MAX_BATCH, max_wait=DEFAULT_MAX_WAIT):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_depths = Histogram(QUEUE_DEPTH_BUCKETS)
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="microbatch", daemon=True)
+        self._worker.start()
+
+    def submit(self, item):
+        """Queues one item and returns a Future for its prediction."""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self.queue_depths.observe(self._queue.qsize())
+        self._queue.put((item, future))
+        return future
+
+    def predict_one(self, item, timeout=None):
+        """Blocking single prediction, batched with whatever else is in flight."""
+        return self.submit(item).result(timeout)
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                self._queue.put(None)  # finish this batch, stop on the next loop
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            items = [item for item, _ in batch]
+            self.batch_sizes.observe(len(items))
+            try:
+                results = list(self.predict_fn(items))
+                if len(results) != len(items):
+                    raise ValueError(f"predict returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def metrics(self):
+        return {
+            'max_batch': self.max_batch,
+            'max_wait': self.max_wait,
+            'queue_depth': self.queue_depths.snapshot(),
+            'batch_size': self.batch_sizes.snapshot(),
+        }
+
+    def prometheus(self, prefix="budgetbee_microbatch"):
+        """Queue-depth and batch-size histograms in Prometheus text format."""
+        lines = self.queue_depths.prometheus_lines(f"{prefix}_queue_depth", "Items already queued when a prediction was submitted")
+        lines += self.batch_sizes.prometheus_lines(f"{prefix}_batch_size", "Items per predict call")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,19 @@
+# model_loader.py - Load the categorization pipeline with memory-mapped weights
+import os
+
+import startup
+
+MODEL_PATH = os.environ.get("BUDGETBEE_MODEL", "budgetbee_pipeline.joblib")
+
+
+def load_pipeline(path=MODEL_PATH, mmap=True):
+    """
+    joblib.load of the pipeline at `path`. With `mmap`, numpy arrays stored
+    in the file are mapped read-only instead of copied into the heap, so
+    every worker process serving the model shares the same pages of the
+    OS page cache. Only uncompressed dumps (joblib.dump's default) can be
+    mapped; compressed ones load into memory as before.
+    """
+    joblib = startup.timed_import('joblib')
+    with startup.timed('model load'):
+        return joblib.load(path, mmap_mode='r' if mmap else None)
@@ -0,0 +1,330 @@
+# model_registry.py - Versioned categorization models with hot reload and rollback
+#
+# Layout of the registry directory (BUDGETBEE_MODEL_REGISTRY, default models/):
+#   versions/v0001/model.joblib   immutable once published (safe to mmap)
+#   versions/v0001/meta.json      sha256, size, created, note
+#   active.json                   {"version": ..., "history": [previous, ...]}
+# active.json is replaced atomically, so readers see either the old or the
+# new version. ModelServer watches it, loads and warms up the new model in
+# the background and only then swaps it in; requests in flight finish on
+# whichever model they started with. While the registry is empty, the plain
+# model file (budgetbee_pipeline.joblib) is served and watched the same way.
+#
+# Usage:
+#   python model_registry.py list
+#   python model_registry.py publish budgetbee_pipeline.joblib [--activate] [--note "..."]
+#   python model_registry.py activate v0002
+#   python model_registry.py rollback
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from model_loader import MODEL_PATH, load_pipeline
+
+DEFAULT_ROOT = os.environ.get("BUDGETBEE_MODEL_REGISTRY", "models")
+ARTIFACT = "model.joblib"
+# How often (seconds) servers look at active.json
+CHECK_INTERVAL = 2.0
+# Predicted once on a freshly loaded model before it takes traffic
+WARMUP_INPUTS = ("coffee", "uber ride", "monthly rent")
+# Reported when the registry is empty and the plain model file is served,
+# as "unversioned:<first 12 hex digits of its sha256>"
+UNVERSIONED = "unversioned"
+
+
+class RegistryError(RuntimeError):
+    """Unknown version, nothing to roll back to, or a malformed registry."""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-", suffix=".json")
+    with os.fdopen(fd, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class ModelRegistry:
+    """Directory of immutable model versions plus an atomically switched active pointer."""
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+        self.versions_dir = os.path.join(root, 'versions')
+        self.active_path = os.path.join(root, 'active.json')
+        self._lock = threading.Lock()
+
+    def path(self, version):
+        path = os.path.join(self.versions_dir, version, ARTIFACT)
+        if not os.path.exists(path):
+            raise RegistryError(f"Unknown model version: {version}")
+        return path
+
+    def versions(self):
+        """Metadata of every published version, oldest first."""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        found = []
+        for version in sorted(os.listdir(self.versions_dir)):
+            meta_path = os.path.join(self.versions_dir, version, 'meta.json')
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    found.append(json.load(f))
+        return found
+
+    def _state(self):
+        try:
+            with open(self.active_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'version': None, 'history': []}
+
+    def active_version(self):
+        """The active version, or None if nothing has been activated yet."""
+        return self._state()['version']
+
+    def publish(self, source, note='', activate=False):
+        """
+        Copies the model file `source` in as the next version (v0001, v0002, ...)
+        and returns that version. The copy is written under a temporary name
+        and renamed into place, so a half-written version is never visible.
+        """
+        os.makedirs(self.versions_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.versions_dir, prefix=".staging-")
+        try:
+            artifact = os.path.join(staging, ARTIFACT)
+            shutil.copyfile(source, artifact)
+            meta = {'sha256': _sha256(artifact), 'size': os.path.getsize(artifact),
+                    'created': time.time(), 'source': os.path.abspath(source), 'note': note}
+            while True:
+                existing = [v for v in os.listdir(self.versions_dir) if v.startswith('v')]
+                version = f"v{max((int(v[1:]) for v in existing if v[1:].isdigit()), default=0) + 1:04d}"
+                meta['version'] = version
+                with open(os.path.join(staging, 'meta.json'), 'w') as f:
+                    json.dump(meta, f, indent=2)
+                try:
+                    # Fails if another publisher took this number first; then try the next one
+                    os.rename(staging, os.path.join(self.versions_dir, version))
+                    break
+                except OSError:
+                    if not os.path.exists(os.path.join(self.versions_dir, version)):
+                        raise
+        finally:
+            if os.path.isdir(staging):
+                shutil.rmtree(staging)
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """Makes `version` the active model; the one it replaces goes on the rollback history."""
+        self.path(version)
+        with self._lock:
+            state = self._state()
+            if state['version'] == version:
+                return version
+            history = ([state['version']] if state['version'] else []) + state['history']
+            _write_json_atomic(self.active_path, {'version': version, 'history': history[:20],
+                                                  'activated': time.time()})
+        return version
+
+    def rollback(self):
+        """Re-activates the previously active version and returns it."""
+        with self._lock:
+            state = self._state()
+            if not state['history']:
+                raise RegistryError("No previous model version to roll back to")
+            version, history = state['history'][0], state['history'][1:]
+            self.path(version)
+            _write_json_atomic(self.active_path, {'version': version, 'history': history,
+                                                  'activated': time.time()})
+        return version
+
+
+class ModelServer:
+    """
+    Serves the registry's active model and follows it without a restart.
+
+    A watcher thread checks active.json every `check_interval` seconds.
+    When the version changes, the new model is loaded (memory-mapped) and
+    warmed up with one predict in the background; only if that succeeds is
+    it swapped in. A failed load keeps the current model and is reported in
+    status(). With an empty registry the plain `fallback_path` file is
+    served as version UNVERSIONED:<content hash>; replacing the file (seen
+    by its stat changing, confirmed by the hash) is a new version too.
+    `on_switch(version)` runs after each swap.
+    """
+
+    def __init__(self, registry=None, fallback_path=MODEL_PATH, check_interval=CHECK_INTERVAL,
+                 warmup_inputs=WARMUP_INPUTS, on_switch=None, loader=load_pipeline):
+        self.registry = registry or ModelRegistry()
+        self.fallback_path = fallback_path
+        self.check_interval = check_interval
+        self.warmup_inputs = list(warmup_inputs)
+        self.on_switch = on_switch
+        self.loader = loader
+        self._current = (None, None)  # (version, pipeline), replaced as one tuple
+        self._load_lock = threading.Lock()
+        self._status = {'loading': None, 'last_error': None, 'switches': 0, 'loaded_at': None}
+        self._watcher = None
+        self._stopped = threading.Event()
+        self._fallback_stat = None
+        self._fallback_hash = None
+
+        self._switch(*self._load(self._target()))
+
+    def _fallback_version(self):
+        """UNVERSIONED tagged with the fallback file's hash, re-hashed only when its stat changes."""
+        try:
+            st = os.stat(self.fallback_path)
+        except FileNotFoundError:
+            return UNVERSIONED
+        stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stat != self._fallback_stat:
+            self._fallback_hash = _sha256(self.fallback_path)[:12]
+            self._fallback_stat = stat
+        return f"{UNVERSIONED}:{self._fallback_hash}"
+
+    def _target(self):
+        """The version that should be served: the registry's active one, else the fallback file's."""
+        return self.registry.active_version() or self._fallback_version()
+
+    def _load(self, version):
+        path = self.fallback_path if version.startswith(UNVERSIONED) else self.registry.path(version)
+        pipeline = self.loader(path)
+        predictions = list(pipeline.predict(self.warmup_inputs))
+        if len(predictions) != len(self.warmup_inputs):
+            raise RegistryError(f"Warm-up predict returned {len(predictions)} results for {len(self.warmup_inputs)} inputs")
+        return version, pipeline
+
+    def _switch(self, version, pipeline):
+        self._current = (version, pipeline)
+        self._status['switches'] += 1
+        self._status['loaded_at'] = time.time()
+        if self.on_switch:
+            self.on_switch(version)
+
+    # -------------------------------
+    # Serving
+    # -------------------------------
+    @property
+    def version(self):
+        return self._current[0]
+
+    def snapshot(self):
+        """(version, pipeline) as one consistent pair, for callers that report the version."""
+        return self._current
+
+    def predict(self, items):
+        """pipeline.predict on the active model."""
+        return self._current[1].predict(items)
+
+    def predict_with_version(self, items):
+        """(predictions, version) from the same model, even if a switch happens meanwhile."""
+        version, pipeline = self._current
+        return list(pipeline.predict(items)), version
+
+    # -------------------------------
+    # Reloading
+    # -------------------------------
+    def reload(self):
+        """Loads the version that should be served now if it differs from the served one. Returns True on a switch."""
+        target = self._target()
+        if target == self.version:
+            return False
+        with self._load_lock:
+            if target == self.version:
+                return False
+            self._status['loading'] = target
+            try:
+                loaded = self._load(target)
+            except Exception as e:
+                self._status['last_error'] = f"{target}: {e}"
+                return False
+            finally:
+                self._status['loading'] = None
+            self._status['last_error'] = None
+            self._switch(*loaded)
+            return True
+
+    def start(self):
+        """Starts the background watcher (idempotent)."""
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._watcher.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def _watch(self):
+        failed = None
+        while not self._stopped.wait(self.check_interval):
+            target = self._target()
+            # Don't retry a version that already failed until the pointer moves again
+            if target != self.version and target != failed:
+                failed = None if self.reload() else target
+
+    def status(self):
+        return dict(self._status, version=self.version, registry=self.registry.root)
+
+    def prometheus(self, prefix="budgetbee_model"):
+        """Active version and switch count in Prometheus text format."""
+        status = self.status()
+        return "\n".join([
+            f"# TYPE {prefix}_info gauge", f'{prefix}_info{{version="{status["version"]}"}} 1',
+            f"# TYPE {prefix}_switches_total counter", f"{prefix}_switches_total {status['switches']}",
+            f"# TYPE {prefix}_load_failing gauge", f"{prefix}_load_failing {int(status['last_error'] is not None)}",
+        ]) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the versioned categorization model registry.")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help=f"registry directory (default: {DEFAULT_ROOT})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="show published versions")
+    publish = commands.add_parser("publish", help="add a model file as a new version")
+    publish.add_argument("model", nargs="?", default=MODEL_PATH)
+    publish.add_argument("--note", default="")
+    publish.add_argument("--activate", action="store_true", help="make it the active version straight away")
+    activate = commands.add_parser("activate", help="switch servers to a version")
+    activate.add_argument("version")
+    commands.add_parser("rollback", help="switch back to the previously active version")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.root)
+    try:
+        if args.command == "publish":
+            version = registry.publish(args.model, note=args.note, activate=args.activate)
+            print(f"Published {version}" + (" (active)" if args.activate else ""))
+        elif args.command == "activate":
+            print(f"Active: {registry.activate(args.version)}")
+        elif args.command == "rollback":
+            print(f"Rolled back to {registry.rollback()}")
+        else:
+            active = registry.active_version()
+            for meta in registry.versions():
+                marker = "*" if meta['version'] == active else " "
+                created = time.strftime("%Y-%m-%d %H:%M", time.localtime(meta['created']))
+                print(f"{marker} {meta['version']}  {created}  {meta['size'] / 1024:8.1f} KiB  {meta['sha256'][:12]}  {meta['note']}")
+            if active is None:
+                print("No active version; servers use the plain model file.")
+    except RegistryError as e:
+        raise SystemExit(str(e))
+
+
+if __name__ == "__main__":
+    main()
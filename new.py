@@ -1,11 +1,17 @@
 # new.py - BudgetBee with Moonstone & Dark Denim Theme
+import startup
 import streamlit as st
 import pandas as pd
-import numpy as np
-from datetime import datetime
-from PIL import Image
-import tempfile
-import os
+from datetime import datetime, timedelta
+from expense_store import get_store
+from rollups import PERIODS
+from categorizer import categorize_expense
+
+startup.mark('imports')
+
+PAGE_SIZE = 50  # expenses per page in the history and delete views
+# Ranges offered by the spending-over-time chart (None: everything)
+SPENDING_WINDOWS = {"Last 30 days": 30, "Last 90 days": 90, "Last 12 months": 365, "All time": None}
 
 # --- Moonstone & Dark Denim Color Theme ---
 PRIMARY_COLOR = "#4A6572"  # Dark Denim
@@ -67,105 +73,98 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 # --- Check for OCR dependencies ---
-try:
-    import cv2
-    import easyocr
-    import re
-    OCR_AVAILABLE = True
-except ImportError:
-    OCR_AVAILABLE = False
+# Only checked for here; the OCR / vision stack is imported on first use
+# (opening the Receipt Scanner), so the other pages start without it
+OCR_AVAILABLE = startup.available('cv2', 'easyocr')
+if OCR_AVAILABLE:
+    ocr_cache = startup.lazy_import('ocr_cache')
+    ocr_engine = startup.lazy_import('ocr_engine')
+    ocr_jobs = startup.lazy_import('ocr_jobs')
+    ocr_regions = startup.lazy_import('ocr_regions')
+    preprocessing = startup.lazy_import('preprocessing')
+    receipt_image = startup.lazy_import('receipt_image')
 
 # -------------------------------
 # 1. VISION & EXTRACTION CORE (OCR Function)
 # -------------------------------
-def process_receipt_image(uploaded_file):
-    """Process receipt image with OCR and return parsed data."""
-    if not OCR_AVAILABLE:
-        return None, None, []
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-        tmp_file.write(uploaded_file.getvalue())
-        tmp_img_path = tmp_file.name
-
-    try:
-        image = cv2.imread(tmp_img_path)
-        if image is None:
-            return None, None, []
-
-        gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        thresh_image = cv2.adaptiveThreshold(gray_image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-
-        reader = easyocr.Reader(['en'])
-        results = reader.readtext(thresh_image)
-
-        total_amount = None
-        vendor_name = None
-        items_list = []
-
-        # Parse receipt data
-        for _, text, prob in results:
-            text_clean = text.upper().replace(' ', '').replace('$', '')
-            if 'TOTAL' in text_clean and prob > 0.3:
-                numbers_found = re.findall(r'\d+\.\d{2}', text_clean)
-                if numbers_found:
-                    total_amount = float(numbers_found[0])
-                    break
-
-        for i, (_, text, prob) in enumerate(results):
-            if i < 3 and prob > 0.4 and vendor_name is None:
-                vendor_name = text
-            if prob > 0.3:
-                numbers_in_text = re.findall(r'\d+\.\d{2}', text)
-                if numbers_in_text and len(text) > 3:
-                    item_desc = re.sub(r'\d+\.\d{2}', '', text).strip()
-                    items_list.append({'item': item_desc, 'price': float(numbers_in_text[0])})
-
-        return vendor_name, total_amount, items_list
-
-    except Exception as e:
-        return None, None, []
-    finally:
-        os.unlink(tmp_img_path)
+def process_receipt_image(image_bytes, progress, preset='auto', ocr_mode='full'):
+    """Background job: OCR an uploaded receipt and return parsed data plus the preprocessing report."""
+    progress(0.0, "Decoding image")
+    gray_image = receipt_image.load_receipt(image_bytes)
+    (vendor, total, items), report = ocr_cache.scan_receipt(
+        gray_image, lambda image: ocr_engine.readtext(image, ['en']), preset=preset,
+        cache=ocr_cache.get_cache(['en']), progress=progress, ocr_mode=ocr_mode)
+    return {'vendor': vendor, 'total': total, 'items': items, 'report': report}
+
+
+@st.cache_resource
+def get_scan_jobs():
+    """One background OCR job queue per server process, shared by every session."""
+    return ocr_jobs.JobQueue(process_receipt_image)
+
+
+@st.fragment(run_every=1)
+def show_scan_progress(job_id):
+    """Polls a running scan without blocking the rest of the page."""
+    job = get_scan_jobs().get(job_id)
+    if job['status'] not in ocr_jobs.ACTIVE:
+        st.rerun()  # finished: redraw the page with the result
+    st.progress(job['progress'], text=f"🤖 {job['message']}...")
+    if st.button("✖️ Cancel scan"):
+        get_scan_jobs().cancel(job_id)
+        st.rerun()
 
 # -------------------------------
 # 2. ANALYTICS ENGINE
 # -------------------------------
-def categorize_expense(description):
-    """Categorize expenses based on description."""
-    if not description:
-        return 'Other'
-        
-    description_lower = description.lower()
-    categories = {
-        'Food': ['coffee', 'mcdonald', 'kfc', 'restaurant', 'food', 'grocery', 'supermarket', 'cafe'],
-        'Transport': ['shell', 'gas', 'petrol', 'metro', 'bus', 'uber', 'transport', 'fuel', 'taxi'],
-        'Entertainment': ['cine', 'movie', 'netflix', 'entertain', 'concert', 'game'],
-        'Utilities': ['rent', 'electric', 'water', 'internet', 'bill', 'wifi'],
-        'Shopping': ['mall', 'clothes', 'amazon', 'store', 'shop']
-    }
-    
-    for category, keywords in categories.items():
-        if any(keyword in description_lower for keyword in keywords):
-            return category
-    return 'Other'
-
-def load_data():
-    """Load expense data from CSV."""
-    try:
-        return pd.read_csv('expenses.csv', parse_dates=['Date'])
-    except FileNotFoundError:
-        return pd.DataFrame(columns=['Date', 'Description', 'Amount', 'Category'])
-
-def save_data(df):
-    """Save DataFrame to CSV."""
-    df.to_csv('expenses.csv', index=False)
+# categorize_expense comes from categorizer.py (keyword rules compiled into one regex,
+# the served model, if any, for descriptions no rule matches)
+
+def expense_pager(key):
+    """
+    Search box + page controls over the expense store. Returns the current
+    page (newest first, indexed by expense ID); only that page is fetched
+    and rendered, however long the history is.
+    """
+    search = st.text_input("🔎 Search descriptions", key=f"{key}_search").strip()
+    page_key = f"{key}_page"
+    if st.session_state.get(f"{key}_last_search") != search:
+        st.session_state[f"{key}_last_search"] = search
+        st.session_state[page_key] = 0
+    page_number = st.session_state.get(page_key, 0)
+
+    # One extra row tells us whether there's a next page without counting matches.
+    expenses = store.page(offset=page_number * PAGE_SIZE, limit=PAGE_SIZE + 1, search=search or None)
+    has_next = len(expenses) > PAGE_SIZE
+    expenses = expenses.iloc[:PAGE_SIZE]
+
+    prev_col, info_col, next_col = st.columns([1, 3, 1])
+    if prev_col.button("⬅️ Previous", key=f"{key}_prev", disabled=page_number == 0):
+        st.session_state[page_key] = page_number - 1
+        st.rerun()
+    if next_col.button("Next ➡️", key=f"{key}_next", disabled=not has_next):
+        st.session_state[page_key] = page_number + 1
+        st.rerun()
+    if search:
+        info_col.caption(f"Page {page_number + 1} of matches for “{search}”")
+    else:
+        total_pages = max(1, -(-store.count() // PAGE_SIZE))
+        info_col.caption(f"Page {page_number + 1} of {total_pages}")
+    return expenses
+
+
+def show_duplicates(duplicates):
+    """Warns that an expense about to be added looks like one already stored."""
+    listed = "\n".join(f"- {row['Date']}: {row['Description']} (${row['Amount']:.2f})" for row in duplicates[:5])
+    st.warning(f"⚠️ This looks like an expense you already added:\n{listed}")
 
 # -------------------------------
 # 3. THE HUB (Streamlit UI)
 # -------------------------------
-# Initialize session state
-if 'df_expenses' not in st.session_state:
-    st.session_state.df_expenses = load_data()
+# Shared expense store (journaled CSV or SQLite, see BUDGETBEE_STORAGE);
+# refresh picks up expenses added by other sessions since the last rerun
+store = get_store()
+store.refresh()
 
 # Page Config
 st.set_page_config(page_title="BudgetBee - Premium Tracker", layout="wide", page_icon="🐝")
@@ -180,25 +179,26 @@ page = st.sidebar.radio("Navigate", ["📊 Dashboard", "💸 Add Expense", "📷
 if page == "📊 Dashboard":
     st.header("📊 Financial Dashboard")
     
-    if not st.session_state.df_expenses.empty:
+    summary = store.summary()
+    if summary['count']:
         # Metrics Cards
         col1, col2, col3 = st.columns(3)
         with col1:
             st.markdown(f"""
             <div class='metric-card'>
                 <h3>Total Expenses</h3>
-                <h2>${st.session_state.df_expenses['Amount'].sum():.2f}</h2>
+                <h2>${summary['total']:.2f}</h2>
             </div>
             """, unsafe_allow_html=True)
         with col2:
             st.markdown(f"""
             <div class='metric-card'>
                 <h3>Total Transactions</h3>
-                <h2>{len(st.session_state.df_expenses)}</h2>
+                <h2>{summary['count']}</h2>
             </div>
             """, unsafe_allow_html=True)
         with col3:
-            avg_expense = st.session_state.df_expenses['Amount'].mean()
+            avg_expense = summary['average']
             st.markdown(f"""
             <div class='metric-card'>
                 <h3>Average Expense</h3>
@@ -208,13 +208,29 @@ if page == "📊 Dashboard":
 
         # Expenses Table
         st.subheader("💰 Expense History")
-        st.dataframe(st.session_state.df_expenses.style.format({'Amount': '${:.2f}'}), use_container_width=True)
+        history_page = expense_pager("history")
+        st.dataframe(history_page.style.format({'Amount': '${:.2f}'}), use_container_width=True)
 
         # Spending by Category Chart
         st.subheader("📈 Spending by Category")
-        category_totals = st.session_state.df_expenses.groupby('Category')['Amount'].sum()
+        category_totals = store.category_totals()
         st.bar_chart(category_totals)
 
+        # Spending by Month Chart
+        st.subheader("📅 Spending by Month")
+        st.bar_chart(store.month_totals())
+
+        # --- SPENDING OVER TIME (from the maintained rollups: one read per bucket) ---
+        st.subheader("📆 Spending Over Time")
+        period_col, window_col, category_col = st.columns(3)
+        period = period_col.selectbox("Group by", PERIODS, index=1)
+        window = window_col.selectbox("Range", list(SPENDING_WINDOWS), index=1)
+        categories = category_col.multiselect("Categories", list(category_totals.index))
+        days = SPENDING_WINDOWS[window]
+        today = datetime.today().date()
+        start, end = (today - timedelta(days=days - 1), today) if days else (None, None)
+        st.bar_chart(store.spending(period, start, end, categories or None))
+
     else:
         st.info("No expenses recorded yet. Add some via 'Add Expense' or 'Receipt Scanner'!")
 
@@ -230,23 +246,57 @@ elif page == "💸 Add Expense":
         with col2:
             desc = st.text_input("📝 Description")
             category = st.selectbox("🏷️ Category", ["Food", "Transport", "Entertainment", "Utilities", "Shopping", "Other"])
+        add_anyway = st.checkbox("Save even if it looks like a duplicate")
         
         submitted = st.form_submit_button("💾 Save Expense")
         
         if submitted:
             if desc and amount > 0:
-                new_row = pd.DataFrame([[date, desc, amount, category]], 
-                                      columns=['Date', 'Description', 'Amount', 'Category'])
-                st.session_state.df_expenses = pd.concat([st.session_state.df_expenses, new_row], ignore_index=True)
-                save_data(st.session_state.df_expenses)
-                st.markdown(f"""
-                <div class='success-message'>
-                    ✅ Expense added successfully! ${amount:.2f} for {desc}
-                </div>
-                """, unsafe_allow_html=True)
+                duplicates = [] if add_anyway else store.find_duplicates(date, desc, amount)
+                if duplicates:
+                    show_duplicates(duplicates)
+                else:
+                    store.add(date, desc, amount, category)
+                    st.markdown(f"""
+                    <div class='success-message'>
+                        ✅ Expense added successfully! ${amount:.2f} for {desc}
+                    </div>
+                    """, unsafe_allow_html=True)
             else:
                 st.error("Please fill in description and amount.")
 
+    st.subheader("📥 Import Bank Statement")
+    statement = st.file_uploader("CSV, OFX/QFX or QIF statement", type=["csv", "ofx", "qfx", "qif"])
+    sign_col, dayfirst_col = st.columns(2)
+    sign = sign_col.selectbox("Spending amounts are", ["auto", "negative", "positive"],
+                              help="For CSVs with one amount column; 'auto' goes by the sign most amounts have")
+    dayfirst = dayfirst_col.checkbox("Dates are day/month (e.g. 31/01/2024)")
+    if statement is not None and st.button("📥 Import Statement"):
+        import tempfile
+        from pathlib import Path
+        from statement_import import StatementError, import_statement
+
+        # Streamed from disk in chunks, so write the upload out instead of reading it into memory
+        with tempfile.NamedTemporaryFile(suffix=Path(statement.name).suffix, delete=False) as f:
+            f.write(statement.getbuffer())
+        try:
+            with st.spinner("Importing..."):
+                report = import_statement(f.name, store, sign=sign, dayfirst=dayfirst)
+            st.markdown(f"""
+            <div class='success-message'>
+                ✅ Imported {report['imported']:,} of {report['rows']:,} transactions
+                ({report['rows_per_second']:,.0f} rows/s); {report['duplicates']:,} duplicates
+                and {report['credits']:,} credits skipped.
+            </div>
+            """, unsafe_allow_html=True)
+            if report['near_duplicates']:
+                st.warning(f"{report['near_duplicates']:,} imported transactions look like expenses already "
+                           f"added (same amount and vendor within a few days), e.g. from scanned receipts.")
+        except StatementError as e:
+            st.error(f"Could not import {statement.name}: {e}")
+        finally:
+            Path(f.name).unlink()
+
 # Receipt Scanner Page
 elif page == "📷 Receipt Scanner":
     st.header("📷 Receipt Scanner")
@@ -258,14 +308,46 @@ elif page == "📷 Receipt Scanner":
         </div>
         """, unsafe_allow_html=True)
     else:
+        # First visit loads the OCR stack and model in the background, ready for the first scan
+        ocr_engine.warm_up()
         uploaded_file = st.file_uploader("Upload receipt image (JPG, PNG)", type=['jpg', 'jpeg', 'png'])
         
         if uploaded_file is not None:
             st.image(uploaded_file, caption="Uploaded Receipt", use_column_width=True)
             
+            preset = st.selectbox("Image preprocessing", [preprocessing.AUTO] + list(preprocessing.PRESETS),
+                                  help="'auto' tries the cheaper presets first and stops once OCR is confident")
+            ocr_mode = st.radio("OCR mode", ocr_regions.OCR_MODES, horizontal=True,
+                                help="'tiled' reads only the text regions; faster on long receipts")
+
+            scan_jobs = get_scan_jobs()
+            # Scans run in the background; the job ID is remembered per uploaded file
+            job_ids = st.session_state.setdefault('scan_jobs', {})
             if st.button("🔍 Extract Data from Receipt"):
-                with st.spinner("Processing image with AI... 🤖"):
-                    vendor, total, items = process_receipt_image(uploaded_file)
+                try:
+                    job_ids[uploaded_file.file_id] = scan_jobs.submit(uploaded_file.getvalue(), preset=preset, ocr_mode=ocr_mode)
+                except ocr_jobs.QueueFull:
+                    st.warning("The scanner is busy with other receipts. Please try again in a moment.")
+
+            job = scan_jobs.get(job_ids.get(uploaded_file.file_id))
+            if job and job['status'] in ocr_jobs.ACTIVE:
+                show_scan_progress(job['id'])
+            elif job and job['status'] == ocr_jobs.FAILED:
+                st.error(f"Error processing image: {job['error']}")
+            elif job and job['status'] == ocr_jobs.CANCELLED:
+                st.info("Scan cancelled.")
+            elif job:
+                vendor, total, items, report = (job['result'][key] for key in ('vendor', 'total', 'items', 'report'))
+
+                ocr_stats = ocr_engine.ocr_stats()
+                load_col, infer_col = st.columns(2)
+                load_col.metric("⏱️ OCR Model Load", f"{ocr_stats['load_seconds']:.2f}s")
+                infer_col.metric("⚡ Avg OCR Inference", f"{ocr_stats['avg_inference_seconds']:.2f}s")
+                if report.get('cached'):
+                    st.caption(f"⚡ Scanned before: served from the OCR cache in {report['lookup_seconds'] * 1000:.0f}ms")
+                elif report:
+                    stage_times = ", ".join(f"{stage} {seconds * 1000:.0f}ms" for stage, seconds in report['stages'].items())
+                    st.caption(f"Preprocessing: {report['preset']} (OCR confidence {report['confidence']:.0%}) · {stage_times}")
                 
                 if vendor or items:
                     st.success("Data extracted successfully!")
@@ -277,42 +359,43 @@ elif page == "📷 Receipt Scanner":
                         df_extracted = pd.DataFrame(items)
                         st.dataframe(df_extracted.style.format({'price': '${:.2f}'}), use_container_width=True)
                         
+                        today = datetime.today().date()
+                        receipt_desc = f"{vendor} (Receipt)" if vendor else 'Receipt Purchase'
+                        duplicates = store.find_duplicates(today, receipt_desc, total) if total else []
+                        if duplicates:
+                            show_duplicates(duplicates)
                         if total and st.button(f"💾 Add Total (${total}) to Expenses"):
-                            today = datetime.today().date()
                             category = categorize_expense(vendor if vendor else "Receipt Purchase")
-                            new_row = pd.DataFrame([[today, f"{vendor} (Receipt)" if vendor else 'Receipt Purchase', total, category]], 
-                                                  columns=['Date', 'Description', 'Amount', 'Category'])
-                            st.session_state.df_expenses = pd.concat([st.session_state.df_expenses, new_row], ignore_index=True)
-                            save_data(st.session_state.df_expenses)
+                            store.add(today, receipt_desc, total, category)
                             st.success(f"Added ${total} to your expenses!")
 
 # Manage Expenses Page (with Delete functionality)
 elif page == "⚙️ Manage Expenses":
     st.header("⚙️ Manage Expenses")
     
-    if not st.session_state.df_expenses.empty:
+    if store.count():
         st.subheader("Current Expenses")
-        st.dataframe(st.session_state.df_expenses.style.format({'Amount': '${:.2f}'}), use_container_width=True)
+        expense_page = expense_pager("manage")
+        st.dataframe(expense_page.style.format({'Amount': '${:.2f}'}), use_container_width=True)
         
         st.subheader("🗑️ Delete Expenses")
         
-        # Option 1: Delete by selection
-        expense_options = [f"{row['Date']} - {row['Description']} (${row['Amount']})" 
-                          for _, row in st.session_state.df_expenses.iterrows()]
+        # Option 1: Delete by selection (options are stable expense IDs from this page)
+        expense_labels = {
+            expense_id: f"{row.Date.date() if pd.notna(row.Date) else 'no date'} - {row.Description} (${row.Amount:.2f})"
+            for expense_id, row in zip(expense_page.index, expense_page.itertuples(index=False))
+        }
+        selected_id = st.selectbox("Select expense to delete:", list(expense_labels),
+                                   format_func=expense_labels.get)
         
-        selected_expense = st.selectbox("Select expense to delete:", expense_options)
-        
-        if st.button("🚮 Delete Selected Expense", type="secondary"):
-            # Find the index of the selected expense
-            selected_index = expense_options.index(selected_expense)
-            
+        if st.button("🚮 Delete Selected Expense", type="secondary", disabled=selected_id is None):
             # Get the description for confirmation
-            expense_desc = st.session_state.df_expenses.iloc[selected_index]['Description']
-            expense_amount = st.session_state.df_expenses.iloc[selected_index]['Amount']
+            expense_id = selected_id
+            expense_desc = expense_page.loc[expense_id, 'Description']
+            expense_amount = expense_page.loc[expense_id, 'Amount']
             
             # Remove the expense
-            st.session_state.df_expenses = st.session_state.df_expenses.drop(selected_index).reset_index(drop=True)
-            save_data(st.session_state.df_expenses)
+            store.delete(expense_id)
             
             st.markdown(f"""
             <div class='success-message'>
@@ -324,8 +407,7 @@ elif page == "⚙️ Manage Expenses":
         # Option 2: Clear all data
         st.subheader("🔄 Reset All Data")
         if st.button("🧹 Clear All Expenses", type="primary"):
-            st.session_state.df_expenses = pd.DataFrame(columns=['Date', 'Description', 'Amount', 'Category'])
-            save_data(st.session_state.df_expenses)
+            store.clear()
             st.success("All expenses have been cleared!")
             st.rerun()
             
@@ -335,3 +417,5 @@ elif page == "⚙️ Manage Expenses":
 # Footer
 st.sidebar.markdown("---")
 st.sidebar.markdown(f"<p style='color: {SECONDARY_COLOR}; font-size: 12px;'>ETHOS Stack: Extraction, Tracking, Hub, Optimization, System</p>", unsafe_allow_html=True)
+
+startup.mark_rendered()
@@ -0,0 +1,227 @@
+# ocr_cache.py - Content-addressed on-disk cache of receipt OCR results
+#
+# Usage (maintenance):
+#   python ocr_cache.py [--path ocr_cache.db] --stats | --invalidate | --clear
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Bump to drop every entry written by an older layout
+CACHE_FORMAT = 1
+DEFAULT_PATH = os.environ.get("BUDGETBEE_OCR_CACHE", "ocr_cache.db")
+DEFAULT_MAX_BYTES = int(float(os.environ.get("BUDGETBEE_OCR_CACHE_MB", 64)) * 1024 * 1024)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_results (
+    key       TEXT PRIMARY KEY,   -- sha256 of pixels + preprocessing config + version
+    version   TEXT NOT NULL,      -- OCR model / parser / cache format
+    payload   TEXT NOT NULL,      -- JSON: raw OCR boxes, parsed fields, preprocessing report
+    size      INTEGER NOT NULL,
+    created   REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ocr_results_last_used ON ocr_results(last_used);
+"""
+
+
+def image_key(image, config, version):
+    """sha256 over the decoded pixels (shape and dtype included), the preprocessing config and the version."""
+    digest = hashlib.sha256()
+    digest.update(f"{image.shape}|{image.dtype}|{config}|{version}|".encode())
+    digest.update(memoryview(image if image.flags['C_CONTIGUOUS'] else image.copy()))
+    return digest.hexdigest()
+
+
+def _plain_results(results):
+    """EasyOCR (bbox, text, prob) tuples with numpy scalars turned into JSON types."""
+    return [[[[float(x), float(y)] for x, y in bbox], str(text), float(prob)] for bbox, text, prob in results]
+
+
+class OCRCache:
+    """
+    SQLite file of OCR results keyed by image_key(). Total payload size is
+    capped at `max_bytes`; the least recently used entries go first.
+    invalidate() drops entries written under a different `version`.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES, version=''):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.version = f"{CACHE_FORMAT}:{version}"
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidated': 0}
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def key(self, image, config):
+        return image_key(image, config, self.version)
+
+    def get(self, key):
+        """Cached payload dict for `key`, or None."""
+        conn = self._conn()
+        row = conn.execute("SELECT payload FROM ocr_results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count('misses')
+            return None
+        conn.execute("UPDATE ocr_results SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._count('hits')
+        payload = json.loads(row[0])
+        payload['results'] = [(bbox, text, prob) for bbox, text, prob in payload['results']]
+        return payload
+
+    def put(self, key, results, parsed, report=None):
+        """Stores raw OCR boxes, the parsed (vendor, total, items) and the preprocessing report."""
+        payload = json.dumps({'results': _plain_results(results), 'parsed': list(parsed), 'report': report or {}})
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO ocr_results (key, version, payload, size, created, last_used)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (key, self.version, payload, len(payload), now, now),
+        )
+        self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM ocr_results ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM ocr_results WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        self._count('evictions', evicted)
+
+    def invalidate(self, all_versions=False):
+        """Drops entries from other versions (or every entry with `all_versions`)."""
+        conn = self._conn()
+        if all_versions:
+            cursor = conn.execute("DELETE FROM ocr_results")
+        else:
+            cursor = conn.execute("DELETE FROM ocr_results WHERE version != ?", (self.version,))
+        self._count('invalidated', cursor.rowcount)
+        return cursor.rowcount
+
+    def stats(self):
+        entries, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ocr_results").fetchone()
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats.update(entries=entries, bytes=size, max_bytes=self.max_bytes, version=self.version,
+                     hit_rate=stats['hits'] / lookups if lookups else 0.0)
+        return stats
+
+    def versions(self):
+        """[(version, entries, bytes)] currently on disk."""
+        return self._conn().execute(
+            "SELECT version, COUNT(*), SUM(size) FROM ocr_results GROUP BY version ORDER BY version"
+        ).fetchall()
+
+
+# -------------------------------
+# Cached receipt scan
+# -------------------------------
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def cache_version(languages=('en',)):
+    """Version the cached results of the current OCR model, parser and `languages` are stored under."""
+    import ocr_engine
+    from receipt_parser import PARSER_VERSION
+
+    return f"{ocr_engine.model_version(languages)}:parser-{PARSER_VERSION}"
+
+
+def get_cache(languages=('en',), path=None):
+    """
+    Process-wide OCRCache for the current OCR model, parser and `languages`.
+    Entries from older versions are dropped the first time it's opened.
+    """
+    version = cache_version(languages)
+    path = path or DEFAULT_PATH
+    with _caches_lock:
+        if (path, version) not in _caches:
+            cache = OCRCache(path, version=version)
+            cache.invalidate()
+            _caches[(path, version)] = cache
+        return _caches[(path, version)]
+
+
+def scan_receipt(image, readtext, preset='auto', cache=None, min_confidence=None, progress=None, ocr_mode='full'):
+    """
+    preprocessing.read_receipt + parse_receipt, answered from `cache` when
+    these pixels were already scanned with the same preprocessing and OCR
+    mode ('full' or 'tiled', see ocr_regions). Returns
+    ((vendor, total, items), report); report['cached'] says which it was.
+    """
+    import ocr_regions
+    import preprocessing
+    from receipt_parser import parse_receipt
+
+    if min_confidence is None:
+        min_confidence = preprocessing.DEFAULT_MIN_CONFIDENCE
+    start = time.perf_counter()
+    config = f"{preprocessing.preset_config_key(preset)}|min_confidence={min_confidence}"
+    if ocr_mode != ocr_regions.DEFAULT_OCR_MODE:
+        config += f"|ocr={ocr_regions.mode_config_key(ocr_mode)}"
+    key = cache.key(image, config) if cache is not None else None
+    if key is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            report = dict(hit['report'], cached=True, lookup_seconds=time.perf_counter() - start)
+            vendor, total, items = hit['parsed']
+            return (vendor, total, items), report
+
+    results, report = preprocessing.read_receipt(image, ocr_regions.for_mode(readtext, ocr_mode), preset=preset,
+                                                 min_confidence=min_confidence, progress=progress)
+    report['ocr_mode'] = ocr_mode
+    parsed = parse_receipt(results)
+    if key is not None:
+        cache.put(key, results, parsed, report)
+    return parsed, dict(report, cached=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or clear the receipt OCR cache.")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--stats", action="store_true", help="print entry count and size (default)")
+    action.add_argument("--invalidate", action="store_true", help="drop entries from other OCR model / parser versions")
+    action.add_argument("--clear", action="store_true", help="drop every entry")
+    args = parser.parse_args(argv)
+
+    if args.invalidate:
+        # Not get_cache(): it has already invalidated (and discarded the count) by the time it returns
+        print(f"Dropped {OCRCache(args.path, version=cache_version()).invalidate()} stale entries.")
+    elif args.clear:
+        print(f"Dropped {OCRCache(args.path).invalidate(all_versions=True)} entries.")
+    else:
+        versions = OCRCache(args.path).versions()
+        for version, entries, size in versions:
+            print(f"{version}: {entries} entries, {size / 1024:.1f} KiB")
+        if not versions:
+            print("OCR cache is empty.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# ocr_engine.py - Shared EasyOCR readers for BudgetBee
+import importlib.metadata
+import threading
+import time
+from collections import OrderedDict
+
+import startup
+
+# easyocr (and torch under it) is imported when the first reader loads,
+# not when this module is imported
+OCR_AVAILABLE = startup.available('easyocr')
+
+# Each EasyOCR reader holds its detection + recognition weights in memory,
+# so only keep a couple of language sets around per process.
+MAX_READERS = 2
+
+_readers = OrderedDict()          # languages tuple -> (reader, inference lock)
+_registry_lock = threading.Lock()
+_load_locks = {}                  # languages tuple -> lock held while loading
+_warmed = set()                   # language sets warm_up() has already been called for
+_stats = {
+    'loads': 0,
+    'load_seconds': 0.0,
+    'evictions': 0,
+    'inferences': 0,
+    'inference_seconds': 0.0,
+}
+
+
+def _reader_key(languages):
+    if isinstance(languages, str):
+        languages = [languages]
+    return tuple(languages)
+
+
+def _get_entry(languages):
+    key = _reader_key(languages)
+    with _registry_lock:
+        if key in _readers:
+            _readers.move_to_end(key)
+            return _readers[key]
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+
+    # Only one thread loads a given language set; the rest wait and reuse it.
+    with load_lock:
+        with _registry_lock:
+            if key in _readers:
+                _readers.move_to_end(key)
+                return _readers[key]
+
+        start = time.perf_counter()
+        easyocr = startup.timed_import('easyocr')
+        reader = easyocr.Reader(list(key))
+        elapsed = time.perf_counter() - start
+
+        entry = (reader, threading.Lock())
+        with _registry_lock:
+            _readers[key] = entry
+            _stats['loads'] += 1
+            _stats['load_seconds'] += elapsed
+            while len(_readers) > MAX_READERS:
+                _readers.popitem(last=False)
+                _stats['evictions'] += 1
+        return entry
+
+
+def get_reader(languages=('en',)):
+    """Return the process-wide EasyOCR reader for `languages`, loading it on first use."""
+    if not OCR_AVAILABLE:
+        raise RuntimeError("easyocr is not installed")
+    return _get_entry(languages)[0]
+
+
+def readtext(image, languages=('en',), **kwargs):
+    """Run `reader.readtext` on the shared reader and record inference time."""
+    if not OCR_AVAILABLE:
+        raise RuntimeError("easyocr is not installed")
+    reader, inference_lock = _get_entry(languages)
+
+    # A single reader isn't guaranteed to be re-entrant, so sessions take turns.
+    with inference_lock:
+        start = time.perf_counter()
+        results = reader.readtext(image, **kwargs)
+        elapsed = time.perf_counter() - start
+
+    with _registry_lock:
+        _stats['inferences'] += 1
+        _stats['inference_seconds'] += elapsed
+    return results
+
+
+def warm_up(languages=('en',), background=True):
+    """Load the reader (and run one tiny inference) so the first real scan is fast."""
+    if not OCR_AVAILABLE:
+        return None
+    key = _reader_key(languages)
+    with _registry_lock:
+        if key in _warmed:
+            return None
+        _warmed.add(key)
+
+    def _warm():
+        import numpy as np
+        readtext(np.full((32, 32), 255, dtype=np.uint8), languages)
+
+    if not background:
+        _warm()
+        return None
+    thread = threading.Thread(target=_warm, name="ocr-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def model_version(languages=('en',)):
+    """Identifies the OCR model (library version + languages) results came from."""
+    version = 'unavailable'
+    if OCR_AVAILABLE:
+        # Read from the package metadata so asking doesn't import easyocr
+        try:
+            version = importlib.metadata.version('easyocr')
+        except importlib.metadata.PackageNotFoundError:
+            version = 'unknown'
+    return f"easyocr-{version}:{'+'.join(_reader_key(languages))}"
+
+
+def ocr_stats():
+    """Snapshot of reader load time versus inference time for this process."""
+    with _registry_lock:
+        stats = dict(_stats)
+        stats['cached_readers'] = [list(key) for key in _readers]
+    stats['avg_load_seconds'] = stats['load_seconds'] / stats['loads'] if stats['loads'] else 0.0
+    stats['avg_inference_seconds'] = (
+        stats['inference_seconds'] / stats['inferences'] if stats['inferences'] else 0.0
+    )
+    return stats
@@ -0,0 +1,238 @@
+# ocr_jobs.py - Background receipt-scan jobs with progress, dedupe and cancellation
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+DEFAULT_PATH = os.environ.get("BUDGETBEE_JOBS_DB", "ocr_jobs.db")
+DEFAULT_WORKERS = int(os.environ.get("BUDGETBEE_OCR_WORKERS", 1))
+DEFAULT_MAX_PENDING = int(os.environ.get("BUDGETBEE_OCR_MAX_PENDING", 8))
+# Finished jobs older than this are pruned from the jobs file (at start, then hourly)
+KEEP_SECONDS = 7 * 24 * 3600
+PRUNE_INTERVAL = 3600
+# Finished jobs kept in memory; older ones are read back from the jobs file
+KEEP_FINISHED = 200
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+ACTIVE = (QUEUED, RUNNING)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id        TEXT PRIMARY KEY,
+    key       TEXT NOT NULL,      -- sha256 of payload + params, for dedupe
+    status    TEXT NOT NULL,
+    progress  REAL NOT NULL,
+    message   TEXT NOT NULL,
+    params    TEXT NOT NULL,
+    result    TEXT,
+    error     TEXT,
+    submitted REAL NOT NULL,
+    started   REAL,
+    finished  REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs(key, status);
+"""
+_FIELDS = ('id', 'key', 'status', 'progress', 'message', 'params', 'result', 'error', 'submitted', 'started', 'finished')
+
+
+class QueueFull(RuntimeError):
+    """Raised by submit() when `max_pending` jobs are already waiting."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job (from its progress callback) once it is cancelled."""
+
+
+class JobQueue:
+    """
+    Runs `process_fn(payload, progress, **params)` on a pool of worker
+    threads. submit() returns a job ID straight away; get() reports status,
+    progress and, once finished, the JSON-serializable result.
+
+    - Identical payload + params while a job is queued, running or done
+      return that job's ID instead of starting another.
+    - At most `max_pending` jobs wait; beyond that submit() raises QueueFull.
+    - cancel() drops a queued job (freeing its slot straight away), or
+      stops a running one at its next progress() call.
+    - Only the newest `keep_finished` finished jobs stay in memory; get()
+      reads older ones back from the file.
+    - Job state and results live in a SQLite file, so they survive reruns
+      and restarts (jobs cut off by a restart are marked failed).
+    """
+
+    def __init__(self, process_fn, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING, path=DEFAULT_PATH,
+                 keep_finished=KEEP_FINISHED):
+        self.process_fn = process_fn
+        self.path = path
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self._jobs = {}            # id -> job dict, for active and recently finished jobs of this process
+        self._finished = deque()   # ids of the finished jobs in _jobs, oldest first
+        self._cancelled = set()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        # Unbounded: IDs of jobs cancelled while queued stay in it until a
+        # worker skips them, so capacity is counted in _pending instead
+        self._queue = queue.Queue()
+        self._pending = 0          # jobs still QUEUED
+        self._payloads = {}        # id -> payload, until a worker picks the job up
+        self._pruned = 0.0
+
+        self._db = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._db.execute(
+            "UPDATE jobs SET status = ?, error = 'interrupted by a restart', finished = ? WHERE status IN (?, ?)",
+            (FAILED, time.time(), *ACTIVE),
+        )
+        self._prune()
+
+        self._workers = [threading.Thread(target=self._run, name=f"ocr-job-{i}", daemon=True) for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    # -------------------------------
+    # Persistence
+    # -------------------------------
+    def _save(self, job):
+        row = dict(job, params=json.dumps(job['params']),
+                   result=json.dumps(job['result']) if job['result'] is not None else None)
+        with self._db_lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(_FIELDS)}) VALUES ({', '.join('?' * len(_FIELDS))})",
+                [row[field] for field in _FIELDS],
+            )
+
+    def _prune(self):
+        self._pruned = time.time()
+        with self._db_lock:
+            self._db.execute("DELETE FROM jobs WHERE finished < ?", (self._pruned - KEEP_SECONDS,))
+
+    def _load(self, where, params):
+        with self._db_lock:
+            record = self._db.execute(
+                f"SELECT {', '.join(_FIELDS)} FROM jobs WHERE {where} ORDER BY submitted DESC LIMIT 1", params
+            ).fetchone()
+        if record is None:
+            return None
+        job = dict(zip(_FIELDS, record))
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    # -------------------------------
+    # Client side
+    # -------------------------------
+    @staticmethod
+    def job_key(payload, params):
+        digest = hashlib.sha256(bytes(payload))
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def submit(self, payload, **params):
+        """Queues a job and returns its ID (or the ID of an identical existing job)."""
+        key = self.job_key(payload, params)
+        with self._lock:
+            for job in self._jobs.values():
+                if job['key'] == key and job['status'] in ACTIVE + (DONE,):
+                    return job['id']
+            existing = self._load("key = ? AND status = ?", (key, DONE))
+            if existing is not None:
+                self._jobs[existing['id']] = existing
+                return existing['id']
+
+            job = {'id': uuid.uuid4().hex[:16], 'key': key, 'status': QUEUED, 'progress': 0.0,
+                   'message': 'Waiting for a free scanner', 'params': params, 'result': None,
+                   'error': None, 'submitted': time.time(), 'started': None, 'finished': None}
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} scans are already waiting")
+            self._pending += 1
+            self._queue.put(job['id'])
+            self._jobs[job['id']] = job
+            self._payloads[job['id']] = payload
+        self._save(job)
+        return job['id']
+
+    def get(self, job_id):
+        """Copy of the job dict (status, progress, message, result, error, times), or None."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        return self._load("id = ?", (job_id,))
+
+    def cancel(self, job_id):
+        """Cancels a queued or running job; returns False if it had already finished."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] not in ACTIVE:
+                return False
+            self._cancelled.add(job_id)
+            if job['status'] == QUEUED:
+                self._pending -= 1
+                self._finish(job, CANCELLED, message='Cancelled')
+        return True
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+        return {'pending': self._pending, 'max_pending': self.max_pending,
+                'workers': len(self._workers), 'jobs': counts}
+
+    # -------------------------------
+    # Worker side
+    # -------------------------------
+    def _finish(self, job, status, result=None, error=None, message=None):
+        # caller holds self._lock
+        job.update(status=status, result=result, error=error, finished=time.time(),
+                   message=message or job['message'])
+        if status == DONE:
+            job['progress'] = 1.0
+        self._payloads.pop(job['id'], None)
+        self._cancelled.discard(job['id'])
+        self._save(job)
+
+        # Saved above, so evicted jobs can still be read back by get() / deduped by submit()
+        self._finished.append(job['id'])
+        while len(self._finished) > self.keep_finished:
+            self._jobs.pop(self._finished.popleft(), None)
+        if job['finished'] - self._pruned > PRUNE_INTERVAL:
+            self._prune()
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job['status'] != QUEUED:  # cancelled while waiting (and maybe evicted since)
+                    continue
+                self._pending -= 1
+                payload = self._payloads.pop(job_id)
+                job.update(status=RUNNING, started=time.time(), message='Starting')
+            self._save(job)
+
+            def progress(fraction, message):
+                with self._lock:
+                    if job_id in self._cancelled:
+                        raise JobCancelled()
+                    job.update(progress=fraction, message=message)
+                self._save(job)
+
+            try:
+                result = self.process_fn(payload, progress, **job['params'])
+            except JobCancelled:
+                with self._lock:
+                    self._finish(job, CANCELLED, message='Cancelled')
+            except Exception as e:
+                with self._lock:
+                    self._finish(job, FAILED, error=str(e), message='Failed')
+            else:
+                with self._lock:
+                    self._finish(job, DONE, result=result, message='Done')
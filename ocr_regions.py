@@ -0,0 +1,202 @@
+# ocr_regions.py - Tiled OCR over the text regions of long receipts
+#
+# Full-frame OCR pays for every pixel of a tall thermal receipt, blank
+# stretches included, and EasyOCR shrinks images taller than its canvas.
+# Here text bands are found first with a cheap row projection, grouped
+# into tiles no taller than `tile_height` (bands that are taller still are
+# cut with an overlap), and only those tiles are recognised. Boxes come
+# back in full-image coordinates; each seam has one owner, so a line in an
+# overlap is kept once.
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+OCR_MODES = ('full', 'tiled')
+DEFAULT_OCR_MODE = 'full'
+
+# At ~300 DPI a receipt line is ~40px: tiles hold ~40 lines and seams
+# overlap by more than one line.
+TILE_HEIGHT = 1600
+TILE_OVERLAP = 64
+# Text bands closer than this are treated as one
+MERGE_GAP = 12
+# Blank stretches taller than this (~3 lines) are skipped rather than read
+SKIP_GAP = 120
+# Blank margin kept around each band
+PAD = 8
+# Rows / columns with fewer dark pixels than this count as blank
+MIN_INK = 2
+
+
+# -------------------------------
+# 1. REGIONS (row projection of the ink)
+# -------------------------------
+def _ink(image):
+    """
+    Dark pixels as a 0/1 mask with specks removed. Meant for the binarized
+    output of preprocessing; on plain grayscale, mid-grey is the cut-off.
+    """
+    mask = cv2.threshold(image, 127, 1, cv2.THRESH_BINARY_INV)[1]
+    return cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+
+
+def _runs(flags):
+    """(start, stop) of each run of True in a 1-D bool array."""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], flags.view(np.int8), [0]))))
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def _ink_per_row(ink):
+    return cv2.reduce(ink, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel()
+
+
+def _bands(ink, merge_gap, min_ink):
+    bands = []
+    for top, bottom in _runs(_ink_per_row(ink) >= min_ink):
+        if bands and top - bands[-1][1] < merge_gap:
+            bands[-1] = (bands[-1][0], bottom)
+        else:
+            bands.append((top, bottom))
+    return [(int(top), int(bottom)) for top, bottom in bands]
+
+
+def find_text_bands(image, merge_gap=MERGE_GAP, min_ink=MIN_INK):
+    """[(top, bottom)] row ranges holding ink, top to bottom, with gaps under `merge_gap` merged."""
+    return _bands(_ink(image), merge_gap, min_ink)
+
+
+def plan_tiles(image, tile_height=TILE_HEIGHT, overlap=TILE_OVERLAP, merge_gap=MERGE_GAP, skip_gap=SKIP_GAP,
+               pad=PAD):
+    """
+    Tiles to recognise, as dicts with the crop (top, bottom, left, right) and
+    the rows it owns (own_top, own_bottom). Bands less than `skip_gap` apart
+    share a tile while it stays under `tile_height`; taller bands are cut
+    into tiles that overlap by `overlap` rows, each owning up to the middle
+    of the overlap.
+    """
+    height, width = image.shape[:2]
+    ink = _ink(image)
+    spans = []  # (top, bottom, own_top, own_bottom)
+    for top, bottom in _bands(ink, merge_gap, MIN_INK):
+        top, bottom = max(0, top - pad), min(height, bottom + pad)
+        if (spans and top - spans[-1][1] < skip_gap and bottom - spans[-1][0] <= tile_height
+                and spans[-1][3] == spans[-1][1]):
+            spans[-1] = (spans[-1][0], bottom, spans[-1][2], bottom)
+            continue
+        start = top
+        while True:
+            stop = min(bottom, start + tile_height)
+            own_top = top if start == top else start + overlap // 2
+            own_bottom = bottom if stop == bottom else stop - overlap // 2
+            spans.append((start, stop, own_top, own_bottom))
+            if stop == bottom:
+                break
+            start = stop - overlap
+
+    tiles = []
+    for top, bottom, own_top, own_bottom in spans:
+        columns = np.flatnonzero(cv2.reduce(ink[top:bottom], 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel())
+        if not len(columns):
+            continue
+        left, right = max(0, int(columns[0]) - pad), min(width, int(columns[-1]) + 1 + pad)
+        tiles.append({'top': top, 'bottom': bottom, 'left': left, 'right': right,
+                      'own_top': own_top, 'own_bottom': own_bottom})
+    return tiles
+
+
+# -------------------------------
+# 2. TILED OCR
+# -------------------------------
+def _centre_y(bbox):
+    return (bbox[0][1] + bbox[2][1]) / 2
+
+
+def _overlap_ratio(a, b):
+    """Intersection over the smaller box, on axis-aligned bounds."""
+    ax0, ay0, ax1, ay1 = min(p[0] for p in a), min(p[1] for p in a), max(p[0] for p in a), max(p[1] for p in a)
+    bx0, by0, bx1, by1 = min(p[0] for p in b), min(p[1] for p in b), max(p[0] for p in b), max(p[1] for p in b)
+    inter = max(0, min(ax1, bx1) - max(ax0, bx0)) * max(0, min(ay1, by1) - max(ay0, by0))
+    smaller = min((ax1 - ax0) * (ay1 - ay0), (bx1 - bx0) * (by1 - by0))
+    return inter / smaller if smaller > 0 else 0.0
+
+
+def merge_tile_results(tile_results):
+    """
+    Shifts each tile's boxes into image coordinates and keeps those centred
+    in rows the tile owns. Boxes still overlapping across a seam (a line cut
+    at an unlucky height) are deduplicated, keeping the more confident one.
+    """
+    merged = []
+    seam_boxes = []  # (tile index, position in merged) for boxes from cut tiles
+    for index, (tile, results) in enumerate(tile_results):
+        for bbox, text, prob in results:
+            bbox = [[float(x) + tile['left'], float(y) + tile['top']] for x, y in bbox]
+            if not tile['own_top'] <= _centre_y(bbox) < tile['own_bottom']:
+                continue
+            box = (bbox, text, prob)
+            # Only tiles cut out of one tall band have seams to check
+            if tile['own_top'] != tile['top'] or tile['own_bottom'] != tile['bottom']:
+                duplicate = next((pos for other, pos in seam_boxes
+                                  if other != index and _overlap_ratio(merged[pos][0], bbox) > 0.5), None)
+                if duplicate is not None:
+                    if prob > merged[duplicate][2]:
+                        merged[duplicate] = box
+                    continue
+                seam_boxes.append((index, len(merged)))
+            merged.append(box)
+    merged.sort(key=lambda box: (box[0][0][1], box[0][0][0]))
+    return merged
+
+
+def readtext_tiled(image, readtext, tile_height=TILE_HEIGHT, overlap=TILE_OVERLAP, workers=1, stats=None):
+    """
+    Runs `readtext(crop)` on each planned tile and merges the results into
+    one EasyOCR-style list for the whole image. Falls back to a single
+    full-frame call when no ink is found. With `workers` > 1 tiles are
+    recognised on a thread pool; that only overlaps work when `readtext`
+    is re-entrant (ocr_engine.readtext serialises calls on one reader).
+    If `stats` is a dict, tile count, planning time and the share of pixels
+    read are added.
+    """
+    start = time.perf_counter()
+    tiles = plan_tiles(image, tile_height, overlap)
+    if not tiles:
+        tiles = [{'top': 0, 'bottom': image.shape[0], 'left': 0, 'right': image.shape[1],
+                  'own_top': 0, 'own_bottom': image.shape[0]}]
+    crops = [image[t['top']:t['bottom'], t['left']:t['right']] for t in tiles]
+    plan_seconds = time.perf_counter() - start
+    if workers > 1 and len(crops) > 1:
+        with ThreadPoolExecutor(max_workers=min(workers, len(crops)), thread_name_prefix="ocr-tile") as pool:
+            results = list(pool.map(readtext, crops))
+    else:
+        results = [readtext(crop) for crop in crops]
+
+    if stats is not None:
+        stats['tiles'] = len(tiles)
+        stats['plan_seconds'] = plan_seconds
+        stats['pixel_fraction'] = sum(crop.size for crop in crops) / image.size
+    return merge_tile_results(zip(tiles, results))
+
+
+def tiled(readtext, tile_height=TILE_HEIGHT, overlap=TILE_OVERLAP, workers=1):
+    """`readtext` wrapped so it reads only the text tiles of each image."""
+    return lambda image: readtext_tiled(image, readtext, tile_height, overlap, workers)
+
+
+def for_mode(readtext, mode=DEFAULT_OCR_MODE):
+    """`readtext` for an OCR mode: 'full' (unchanged) or 'tiled'."""
+    if mode not in OCR_MODES:
+        raise ValueError(f"Unknown OCR mode: {mode}")
+    return tiled(readtext) if mode == 'tiled' else readtext
+
+
+def mode_config_key(mode=DEFAULT_OCR_MODE):
+    """Stable description of an OCR mode for cache keys."""
+    if mode == 'tiled':
+        return 'tiled:' + json.dumps({'tile_height': TILE_HEIGHT, 'overlap': TILE_OVERLAP,
+                                      'merge_gap': MERGE_GAP, 'skip_gap': SKIP_GAP, 'pad': PAD, 'min_ink': MIN_INK},
+                                     sort_keys=True)
+    return mode
@@ -0,0 +1,246 @@
+# prediction_cache.py - LRU/TTL cache for categorization results
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAXSIZE = 10000
+# How often (seconds) to stat the model file for changes
+MODEL_CHECK_INTERVAL = 1.0
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_description(description):
+    """Cache key for a description: case-folded, trimmed, inner whitespace collapsed."""
+    if description is None:
+        return ''
+    return _WHITESPACE.sub(' ', str(description)).strip().casefold()
+
+
+def file_content_hash(path):
+    """sha256 of a file's contents, or None if it doesn't exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+class _DiskTier:
+    """SQLite table shared by every worker process, keyed by model hash."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            " model TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, created REAL NOT NULL,"
+            " PRIMARY KEY (model, key))"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, model, key, ttl):
+        row = self._conn().execute(
+            "SELECT value, created FROM predictions WHERE model = ? AND key = ?", (model, key)
+        ).fetchone()
+        if row is None or (ttl is not None and time.time() - row[1] > ttl):
+            return None
+        return json.loads(row[0]), row[1]
+
+    def put(self, model, key, value, created):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO predictions (model, key, value, created) VALUES (?, ?, ?, ?)",
+            (model, key, json.dumps(value), created),
+        )
+
+    def drop_other_models(self, model):
+        self._conn().execute("DELETE FROM predictions WHERE model != ?", (model,))
+
+
+class PredictionCache:
+    """
+    Size-bounded LRU of description -> prediction, with an optional TTL.
+
+    If `model_path` is given, the cache is tied to the content hash of that
+    file: when the file changes (checked at most every MODEL_CHECK_INTERVAL
+    seconds) and its hash differs, every cached prediction is dropped.
+    `disk_path` adds a SQLite tier so several worker processes share hits.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=None, model_path=None, disk_path=None,
+                 normalize=normalize_description):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.model_path = model_path
+        self.normalize = normalize
+        self._entries = OrderedDict()  # key -> (value, created)
+        self._lock = threading.Lock()
+        self._disk = _DiskTier(disk_path) if disk_path else None
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0,
+                       'expirations': 0, 'invalidations': 0}
+
+        self._model_stat = None
+        self._model_checked = 0.0
+        self.model_hash = ''
+        if model_path:
+            self._model_stat = self._stat_model()
+            self.model_hash = file_content_hash(model_path) or ''
+
+    # -------------------------------
+    # Model-change invalidation
+    # -------------------------------
+    def _stat_model(self):
+        try:
+            st = os.stat(self.model_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _check_model(self):
+        if not self.model_path:
+            return
+        now = time.monotonic()
+        if now - self._model_checked < MODEL_CHECK_INTERVAL:
+            return
+        self._model_checked = now
+        current = self._stat_model()
+        if current == self._model_stat:
+            return
+        self._model_stat = current
+        new_hash = file_content_hash(self.model_path) or ''
+        if new_hash != self.model_hash:
+            self.invalidate(new_hash)
+
+    def invalidate(self, model_hash=None):
+        """Drops every cached prediction (e.g. after the model was replaced)."""
+        with self._lock:
+            self._entries.clear()
+            self._stats['invalidations'] += 1
+            if model_hash is not None:
+                self.model_hash = model_hash
+        if self._disk is not None:
+            self._disk.drop_other_models(self.model_hash)
+
+    # -------------------------------
+    # Lookups
+    # -------------------------------
+    def _get_key(self, key):
+        """Returns (found, value) for an already-normalized key."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self.ttl is not None and time.time() - entry[1] > self.ttl:
+                    del self._entries[key]
+                    self._stats['expirations'] += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return True, entry[0]
+
+        if self._disk is not None:
+            found = self._disk.get(self.model_hash, key, self.ttl)
+            if found is not None:
+                value, created = found
+                with self._lock:
+                    self._store(key, value, created)
+                    self._stats['disk_hits'] += 1
+                return True, value
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return False, None
+
+    def _store(self, key, value, created):
+        self._entries[key] = (value, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _put_key(self, key, value):
+        created = time.time()
+        with self._lock:
+            self._store(key, value, created)
+        if self._disk is not None:
+            self._disk.put(self.model_hash, key, value, created)
+
+    def get(self, description):
+        self._check_model()
+        return self._get_key(self.normalize(description))
+
+    def put(self, description, value):
+        self._put_key(self.normalize(description), value)
+
+    def lookup(self, description, compute):
+        """Cached `compute(description)`."""
+        self._check_model()
+        key = self.normalize(description)
+        found, value = self._get_key(key)
+        if not found:
+            value = compute(description)
+            self._put_key(key, value)
+        return value
+
+    def predict_many(self, descriptions, predict_fn):
+        """
+        Cached `predict_fn(descriptions)`: hits are answered from the cache and
+        the distinct misses go through a single predict_fn call.
+        """
+        self._check_model()
+        keys = [self.normalize(d) for d in descriptions]
+        results = [None] * len(keys)
+        missing = {}  # key -> (first description seen, positions)
+        for i, key in enumerate(keys):
+            if key in missing:
+                missing[key][1].append(i)
+                continue
+            found, value = self._get_key(key)
+            if found:
+                results[i] = value
+            else:
+                missing[key] = (descriptions[i], [i])
+
+        if missing:
+            predictions = predict_fn([desc for desc, _ in missing.values()])
+            for (key, (_, positions)), value in zip(missing.items(), predictions):
+                value = value.item() if hasattr(value, 'item') else value  # numpy scalars -> plain
+                self._put_key(key, value)
+                for i in positions:
+                    results[i] = value
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        stats['model_hash'] = self.model_hash
+        return stats
+
+    def prometheus(self, prefix="budgetbee_prediction_cache"):
+        """Hit / miss counters and size in Prometheus text format."""
+        stats = self.stats()
+        lines = []
+        for name in ('hits', 'disk_hits', 'misses', 'evictions', 'expirations', 'invalidations'):
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {stats[name]}"]
+        lines += [f"# TYPE {prefix}_size gauge", f"{prefix}_size {stats['size']}",
+                  f"# TYPE {prefix}_hit_rate gauge", f"{prefix}_hit_rate {stats['hit_rate']:.6f}"]
+        return "\n".join(lines) + "\n"
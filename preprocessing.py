@@ -0,0 +1,238 @@
+# preprocessing.py - Staged receipt image preprocessing ahead of OCR
+#
+# A pipeline is a list of (stage name, params) run in order on a grayscale
+# image; every stage is timed. Presets are listed cheapest first, and
+# "auto" tries them in that order until OCR confidence is good enough.
+import json
+import time
+
+import cv2
+import numpy as np
+
+import receipt_image
+
+AUTO = 'auto'
+DEFAULT_MIN_CONFIDENCE = 0.6
+
+
+# -------------------------------
+# 1. STAGES (grayscale uint8 in, grayscale uint8 out)
+# -------------------------------
+STAGES = {}
+
+
+def register_stage(name):
+    """Decorator adding a stage function `fn(image, **params)` under `name`."""
+    def register(fn):
+        STAGES[name] = fn
+        return fn
+    return register
+
+
+@register_stage('grayscale')
+def to_grayscale(image):
+    if image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+@register_stage('crop')
+def crop_to_receipt(image, min_area=0.15, margin=8):
+    """
+    Crops to the bounding box of the largest outline (the receipt paper).
+    Leaves the image alone if nothing covers at least `min_area` of it.
+    """
+    edges = cv2.Canny(cv2.GaussianBlur(image, (5, 5), 0), 30, 90)
+    edges = cv2.dilate(edges, np.ones((5, 5), np.uint8), iterations=2)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return image
+    x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+    height, width = image.shape[:2]
+    if w * h < min_area * width * height:
+        return image
+    x0, y0 = max(0, x - margin), max(0, y - margin)
+    return image[y0:min(height, y + h + margin), x0:min(width, x + w + margin)]
+
+
+@register_stage('deskew')
+def deskew(image, max_angle=15.0, min_angle=0.3, probe_side=600):
+    """
+    Rotates text lines level, using the minimum-area rectangle around the
+    ink. The angle is measured on a copy no wider than `probe_side`.
+    """
+    probe = image
+    if min(image.shape[:2]) > probe_side:
+        scale = probe_side / min(image.shape[:2])
+        probe = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    ink = cv2.findNonZero(cv2.threshold(probe, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1])
+    if ink is None:
+        return image
+    angle = cv2.minAreaRect(ink)[-1]
+    # The angle convention differs between OpenCV versions; fold into [-45, 45]
+    if angle < -45:
+        angle += 90
+    elif angle > 45:
+        angle -= 90
+    if abs(angle) < min_angle or abs(angle) > max_angle:
+        return image
+    # Grow the canvas so rotated corners aren't cut off; fill with the paper colour
+    height, width = image.shape[:2]
+    rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    cos, sin = abs(rotation[0, 0]), abs(rotation[0, 1])
+    new_width, new_height = int(height * sin + width * cos), int(height * cos + width * sin)
+    rotation[0, 2] += (new_width - width) / 2
+    rotation[1, 2] += (new_height - height) / 2
+    paper = int(np.median(probe))
+    return cv2.warpAffine(image, rotation, (new_width, new_height), flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=paper)
+
+
+@register_stage('denoise')
+def denoise(image, method='median', strength=3):
+    if method == 'median':
+        return cv2.medianBlur(image, strength)
+    if method == 'gaussian':
+        return cv2.GaussianBlur(image, (strength, strength), 0)
+    if method == 'nlmeans':
+        return cv2.fastNlMeansDenoising(image, None, h=strength * 3, templateWindowSize=7, searchWindowSize=11)
+    raise ValueError(f"Unknown denoise method: {method}")
+
+
+@register_stage('resize')
+def resize(image, target_dpi=receipt_image.TARGET_DPI, upscale=False):
+    """Downscales to ~target_dpi; with `upscale`, small images are enlarged to it too."""
+    limit = receipt_image.target_side(target_dpi)
+    height, width = image.shape[:2]
+    if upscale and min(height, width) < limit:
+        scale = limit / min(height, width)
+        return cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_CUBIC)
+    return receipt_image.downscale_to_dpi(image, target_dpi)
+
+
+@register_stage('binarize')
+def binarize(image, method='adaptive', block_size=11, c=2):
+    """'otsu' (global), 'adaptive' (Gaussian-weighted) or 'adaptive_mean' (box filter, cheaper for big blocks)."""
+    if method == 'otsu':
+        return cv2.threshold(image, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+    if method == 'adaptive':
+        return cv2.adaptiveThreshold(image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block_size, c)
+    if method == 'adaptive_mean':
+        return cv2.adaptiveThreshold(image, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, block_size, c)
+    raise ValueError(f"Unknown binarize method: {method}")
+
+
+# -------------------------------
+# 2. PIPELINES & PRESETS
+# -------------------------------
+# Cheapest first.
+PRESETS = {
+    # The original grayscale -> adaptiveThreshold(11, 2)
+    'legacy': [('grayscale', {}), ('binarize', {'block_size': 11, 'c': 2})],
+    'fast': [('grayscale', {}), ('resize', {}), ('binarize', {'method': 'otsu'})],
+    'balanced': [('grayscale', {}), ('crop', {}), ('resize', {'upscale': True}),
+                 ('denoise', {'method': 'median', 'strength': 3}),
+                 ('binarize', {'method': 'adaptive_mean', 'block_size': 31, 'c': 10})],
+    # Non-local means is the slow part, so it runs before upscaling
+    'thorough': [('grayscale', {}), ('crop', {}), ('deskew', {}),
+                 ('denoise', {'method': 'nlmeans', 'strength': 3}), ('resize', {'upscale': True}),
+                 ('binarize', {'method': 'adaptive_mean', 'block_size': 31, 'c': 10})],
+}
+DEFAULT_PRESET = 'fast'
+# What auto mode tries, in order ('legacy' is kept only for comparison)
+AUTO_PRESETS = ('fast', 'balanced', 'thorough')
+
+
+class PreprocessPipeline:
+    """An ordered list of (stage name, params) with per-stage timing."""
+
+    def __init__(self, stages, name=None):
+        for stage, _ in stages:
+            if stage not in STAGES:
+                raise ValueError(f"Unknown preprocessing stage: {stage}")
+        self.stages = [(stage, dict(params)) for stage, params in stages]
+        self.name = name
+
+    @classmethod
+    def from_preset(cls, preset):
+        if preset not in PRESETS:
+            raise ValueError(f"Unknown preprocessing preset: {preset}")
+        return cls(PRESETS[preset], name=preset)
+
+    def config_key(self):
+        """Stable string describing the stages and their parameters."""
+        return json.dumps(self.stages, sort_keys=True, separators=(',', ':'))
+
+    def run(self, image, timings=None):
+        """Runs every stage; if `timings` is a dict, stage name -> seconds is added to it."""
+        for stage, params in self.stages:
+            start = time.perf_counter()
+            image = STAGES[stage](image, **params)
+            if timings is not None:
+                timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+        return image
+
+
+def preset_config_key(preset):
+    """Config key for a preset, or for every preset auto mode may try."""
+    if preset == AUTO:
+        return AUTO + ':' + '|'.join(PreprocessPipeline.from_preset(name).config_key() for name in AUTO_PRESETS)
+    return PreprocessPipeline.from_preset(preset).config_key()
+
+
+def preprocess(image, preset=DEFAULT_PRESET, timings=None):
+    return PreprocessPipeline.from_preset(preset).run(image, timings)
+
+
+# -------------------------------
+# 3. OCR WITH PRESET SELECTION
+# -------------------------------
+def ocr_confidence(results):
+    """Mean EasyOCR confidence, weighted by text length; 0 for no text."""
+    if not results:
+        return 0.0
+    weights = np.array([len(text.strip()) for _, text, _ in results], dtype=float)
+    confidences = np.array([prob for _, _, prob in results], dtype=float)
+    if not weights.sum():
+        return 0.0
+    return float(np.dot(weights, confidences) / weights.sum())
+
+
+def read_receipt(image, readtext, preset=AUTO, min_confidence=DEFAULT_MIN_CONFIDENCE, progress=None):
+    """
+    Preprocesses `image` and runs `readtext(image) -> EasyOCR results`.
+    With preset='auto', presets are tried cheapest first and the first whose
+    confidence reaches `min_confidence` wins (else the most confident one).
+
+    Returns (results, report); report has the preset used, its confidence,
+    per-stage seconds, ocr_seconds and every attempt made. `progress`, if
+    given, is called as progress(fraction, message) before each step.
+    """
+    presets = AUTO_PRESETS if preset == AUTO else [preset]
+    attempts, best = [], None
+    for i, name in enumerate(presets):
+        if progress:
+            progress(i / len(presets), f"Preprocessing ({name})")
+        timings = {}
+        processed = preprocess(image, name, timings)
+        if progress:
+            progress((i + 0.1) / len(presets), f"Reading text ({name})")
+        start = time.perf_counter()
+        results = readtext(processed)
+        attempt = {
+            'preset': name,
+            'confidence': ocr_confidence(results),
+            'stages': timings,
+            'ocr_seconds': time.perf_counter() - start,
+        }
+        attempts.append(attempt)
+        if best is None or attempt['confidence'] > best[1]['confidence']:
+            best = (results, attempt)
+        if attempt['confidence'] >= min_confidence:
+            break
+
+    results, chosen = best
+    report = dict(chosen)
+    report['attempts'] = attempts
+    report['seconds'] = sum(sum(a['stages'].values()) + a['ocr_seconds'] for a in attempts)
+    return results, report
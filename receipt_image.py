@@ -0,0 +1,109 @@
+# receipt_image.py - In-memory decode and resolution normalisation for receipt photos
+import struct
+
+import cv2
+import numpy as np
+
+# OCR reads receipt text fine at ~300 DPI; phone photos are often 2-4x that.
+TARGET_DPI = 300
+# Width the short side of a receipt photo is assumed to cover: 80 mm
+# thermal paper plus some margin around it.
+RECEIPT_WIDTH_INCHES = 4.0
+
+# JPEG can be decoded straight at 1/2, 1/4 or 1/8 scale, which skips most
+# of the IDCT work for oversized photos.
+_REDUCED_GRAYSCALE = ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+                      (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                      (2, cv2.IMREAD_REDUCED_GRAYSCALE_2))
+_REDUCED_COLOR = ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                  (4, cv2.IMREAD_REDUCED_COLOR_4),
+                  (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def as_buffer(data):
+    """
+    uint8 numpy view over image bytes without copying them. Accepts bytes,
+    bytearray, memoryview, a file path or a file-like object such as a
+    Streamlit UploadedFile (read through getbuffer()).
+    """
+    if isinstance(data, np.ndarray):
+        return data
+    if isinstance(data, str):
+        return np.fromfile(data, np.uint8)
+    if hasattr(data, 'getbuffer'):
+        data = data.getbuffer()
+    elif hasattr(data, 'read'):
+        data = data.read()
+    return np.frombuffer(data, np.uint8)
+
+
+def target_side(target_dpi=TARGET_DPI):
+    """Pixels the short side of a receipt photo needs at `target_dpi`."""
+    return int(target_dpi * RECEIPT_WIDTH_INCHES)
+
+
+def jpeg_size(buffer):
+    """(width, height) from a JPEG's frame header, or None if it isn't a JPEG."""
+    if bytes(buffer[:2]) != b'\xff\xd8':
+        return None
+    i = 2
+    while i + 9 <= len(buffer):
+        marker, length = struct.unpack('>xBH', bytes(buffer[i:i + 4]))
+        if buffer[i] != 0xFF:
+            return None
+        # SOF0..SOF15, except DHT / JPG / DAC which share the range
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', bytes(buffer[i + 5:i + 9]))
+            return width, height
+        i += 2 + length
+    return None
+
+
+def _reduce_factor(buffer, max_side):
+    """Largest JPEG decode reduction that still leaves the short side >= max_side."""
+    size = jpeg_size(buffer)
+    if size is None:
+        return 1
+    short_side = min(size)
+    for factor in (8, 4, 2):
+        if short_side // factor >= max_side:
+            return factor
+    return 1
+
+
+def decode_image(data, grayscale=True, max_side=None):
+    """
+    Decodes image bytes in memory (no temp file). With `max_side`, oversized
+    JPEGs are decoded at a reduced scale that still keeps the short side at
+    least that large. Raises ValueError if the bytes aren't an image.
+    """
+    buffer = as_buffer(data)
+    flag = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    if max_side:
+        factor = _reduce_factor(buffer, max_side)
+        for reduction, reduced_flag in (_REDUCED_GRAYSCALE if grayscale else _REDUCED_COLOR):
+            if reduction == factor:
+                flag = reduced_flag
+    image = cv2.imdecode(buffer, flag)
+    if image is None:
+        raise ValueError("could not decode image")
+    return image
+
+
+def downscale_to_dpi(image, target_dpi=TARGET_DPI):
+    """Shrinks `image` so its short side is at most target_side(target_dpi). Never upscales."""
+    limit = target_side(target_dpi)
+    height, width = image.shape[:2]
+    short_side = min(height, width)
+    if short_side <= limit:
+        return image
+    scale = limit / short_side
+    return cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+def load_receipt(data, target_dpi=TARGET_DPI):
+    """Upload bytes -> grayscale image at roughly `target_dpi`, ready for thresholding."""
+    if target_dpi is None:
+        return decode_image(data)
+    image = decode_image(data, max_side=target_side(target_dpi))
+    return downscale_to_dpi(image, target_dpi)
@@ -0,0 +1,157 @@
+# receipt_parser.py - Turn EasyOCR output into vendor / total / items
+import re
+from operator import itemgetter
+
+# Bump when parsing changes so cached parse results are recomputed
+PARSER_VERSION = 3
+
+# Boxes whose vertical centres are within this fraction of the box height share a line
+LINE_OVERLAP = 0.5
+# Lines from the top that may hold the vendor name
+VENDOR_LINES = 5
+# Lines read with lower confidence than this are ignored
+MIN_PROB = 0.3
+
+# Whole part with or without thousands separators ("1,234.56", "1.234,56", "1234.56")
+_AMOUNT = re.compile(r'(?<![\d.,])\$?\s?(\d{1,7}|\d{1,3}(?:[,.]\d{3})+)[.,](\d{2})(?![\d])')
+_SEPARATORS = re.compile(r'[,.]')
+# One scan per line classifies it; at the same position earlier alternatives win
+_KEYWORD = re.compile(
+    r'(?P<subtotal>\bsub\s*-?\s*total\b)'
+    r'|(?P<total>\b(?:grand\s*)?total\b|\bamount\s+due\b|\bbalance\s+due\b)'
+    r'|(?P<tax>\b(?:sales\s+)?(?:tax|vat|gst|hst)\b)'
+    r'|(?P<payment>\b(?:change|cash|card|visa|mastercard|amex|debit|credit|tender(?:ed)?|paid)\b)',
+    re.I,
+)
+_NOT_VENDOR = re.compile(r'\b(?:receipt|invoice|welcome|customer|copy|order|date|time|tel|phone|address)\b', re.I)
+_LETTERS = re.compile(r'[A-Za-z]')
+
+
+# -------------------------------
+# 1. LINES (group boxes by geometry)
+# -------------------------------
+def group_lines(results):
+    """
+    Groups EasyOCR results [(bbox, text, prob), ...] into text lines, top
+    to bottom, by the vertical overlap of their boxes. Returns
+    [(line text, lowest prob on the line)], each line read left to right.
+    """
+    boxes = []
+    for bbox, text, prob in results:
+        if text.strip():
+            # bbox corners run top-left, top-right, bottom-right, bottom-left
+            top, bottom = bbox[0][1], bbox[2][1]
+            boxes.append(((top + bottom) / 2, max(bottom - top, 1), bbox[0][0], text.strip(), prob))
+    boxes.sort(key=itemgetter(0))
+
+    lines, current, line_y, line_height = [], [], None, None
+    for centre, height, left, text, prob in boxes:
+        if current and abs(centre - line_y) <= LINE_OVERLAP * max(height, line_height):
+            current.append((left, text, prob))
+            line_y += (centre - line_y) / len(current)
+            line_height = max(line_height, height)
+            continue
+        if current:
+            lines.append(current)
+        current, line_y, line_height = [(left, text, prob)], centre, height
+    if current:
+        lines.append(current)
+
+    grouped = []
+    for tokens in lines:
+        if len(tokens) > 1:
+            tokens.sort(key=itemgetter(0))
+        grouped.append((' '.join(text for _, text, _ in tokens), min(prob for _, _, prob in tokens)))
+    return grouped
+
+
+# -------------------------------
+# 2. FIELDS (one pass over the lines)
+# -------------------------------
+def parse_receipt_details(results):
+    """
+    Parses EasyOCR results into a dict with vendor, items, subtotal, tax and
+    total, plus 'confidence' (0-1 per field). Items are
+    {'item', 'price', 'confidence'}. Prices are taken from the same text line
+    as their label, or from the next line when it holds only an amount. A
+    line without letters left of its price is a quantity line ("2 @ 3.50
+    7.00"): it's kept, named after the line above when that had no price.
+    """
+    fields = {'vendor': None, 'subtotal': None, 'tax': None, 'total': None}
+    confidence = {'vendor': 0.0, 'subtotal': 0.0, 'tax': 0.0, 'total': 0.0, 'items': 0.0}
+    items = []
+    pending = None          # (kind, label, prob) of a line waiting for its amount on the next line
+    after_total = False
+
+    for index, (text, line_prob) in enumerate(group_lines(results)):
+        if line_prob < MIN_PROB:
+            pending = None
+            continue
+
+        keyword = _KEYWORD.search(text)
+        kind = keyword.lastgroup if keyword else 'item'
+        amounts = list(_AMOUNT.finditer(text))
+        if not amounts:
+            label = text.replace('$', '').strip(' .:-*')
+            pending = (kind, label, line_prob) if label else None
+            if (fields['vendor'] is None and index < VENDOR_LINES and kind == 'item'
+                    and line_prob > 0.4 and len(_LETTERS.findall(text)) >= 3 and not _NOT_VENDOR.search(text)):
+                fields['vendor'] = label
+                # Names further down the header are less likely to be the vendor
+                confidence['vendor'] = line_prob * (1 - 0.1 * index)
+            continue
+
+        # Price is the rightmost amount; a bare amount belongs to the line above
+        price = amounts[-1]
+        whole, cents = price.groups()
+        value = float(f"{_SEPARATORS.sub('', whole)}.{cents}")
+        if kind == 'item':
+            # Other amounts on an item line are its unit price / quantity: part of the label
+            label = (text[:price.start()] + text[price.end():]).replace('$', '').strip(' .:-*')
+        else:
+            label = _AMOUNT.sub('', text).replace('$', '').strip(' .:-*')
+        prob = line_prob
+        if not _LETTERS.search(label) and pending is not None:
+            kind, name, label_prob = pending
+            label = f"{name} {label}".strip()
+            prob = min(prob, label_prob)
+        pending = None
+
+        if kind == 'item':
+            if not after_total and label:
+                items.append({'item': label, 'price': value, 'confidence': round(prob, 3)})
+        elif kind != 'payment' and fields[kind] is None:
+            fields[kind] = value
+            confidence[kind] = prob
+        after_total = after_total or kind == 'total'
+
+    # -------------------------------
+    # 3. CROSS-CHECKS (raise / infer from arithmetic)
+    # -------------------------------
+    subtotal, tax, total = fields['subtotal'], fields['tax'], fields['total']
+    item_sum = round(sum(item['price'] for item in items), 2)
+    if total is None and subtotal is not None:
+        fields['total'] = total = round(subtotal + (tax or 0.0), 2)
+        confidence['total'] = 0.5 * min(confidence['subtotal'], confidence['tax'] if tax is not None else 1.0)
+    if subtotal is not None and tax is not None and total is not None and abs(subtotal + tax - total) < 0.015:
+        for field in ('subtotal', 'tax', 'total'):
+            confidence[field] = max(confidence[field], 0.99)
+    if items:
+        confidence['items'] = sum(item['confidence'] for item in items) / len(items)
+        if any(target is not None and abs(item_sum - target) < 0.015 for target in (subtotal, total)):
+            confidence['items'] = max(confidence['items'], 0.99)
+            if subtotal is None and total is not None:
+                confidence['total'] = max(confidence['total'], 0.99)
+
+    fields['items'] = items
+    fields['confidence'] = {field: round(value, 3) for field, value in confidence.items()}
+    return fields
+
+
+def parse_receipt(results):
+    """
+    Takes EasyOCR `readtext` results [(bbox, text, prob), ...] and returns
+    parsed data (vendor, total, items).
+    """
+    details = parse_receipt_details(results)
+    return details['vendor'], details['total'], details['items']
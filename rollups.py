@@ -0,0 +1,214 @@
+# rollups.py - Day / week / month x category spending cubes
+#
+# Every expense is counted in three buckets: its day, its week (starting
+# Monday) and its month, each split by category. Buckets are keyed by the
+# ISO date they start on, so they sort chronologically. The stores keep the
+# cubes current on add / delete (ExpenseStore in memory, SQLiteExpenseStore
+# in a trigger-maintained `rollups` table), so a spending-over-time query
+# reads one entry per bucket and category, never the expenses themselves.
+#
+# Usage (spending per week over the last 90 days, from the command line):
+#   python rollups.py --period week --days 90 [--category Food] [--backend sqlite]
+import argparse
+import datetime
+import functools
+import os
+
+import pandas as pd
+
+from aggregates import to_cents
+
+PERIODS = ('day', 'week', 'month')
+# pandas frequency of each period's bucket starts
+FREQUENCIES = {'day': 'D', 'week': 'W-MON', 'month': 'MS'}
+
+
+@functools.lru_cache(maxsize=4096)
+def bucket_keys(date):
+    """(day, week, month) bucket keys of a 'yyyy-mm-dd' date: the ISO date each bucket starts on."""
+    day = str(date)[:10]
+    try:
+        parsed = datetime.date.fromisoformat(day)
+    except ValueError:
+        # Unreadable dates still get counted, under the raw text, as the SQLite triggers do
+        return day, day, day[:7] + '-01'
+    return day, (parsed - datetime.timedelta(days=parsed.weekday())).isoformat(), day[:7] + '-01'
+
+
+def bucket_start(period, date):
+    """Start of the `period` bucket a date falls in, as a datetime.date."""
+    return datetime.date.fromisoformat(bucket_keys(str(pd.Timestamp(date).date()))[PERIODS.index(period)])
+
+
+def bucket_end(period, start):
+    """Last day of the `period` bucket starting on `start`."""
+    return (pd.Timestamp(start) + pd.tseries.frequencies.to_offset(FREQUENCIES[period])).date() \
+        - datetime.timedelta(days=1)
+
+
+def bucket_range(period, first, last):
+    """Keys of every `period` bucket from the one holding `first` to the one holding `last`."""
+    return pd.date_range(bucket_start(period, first), last, freq=FREQUENCIES[period]).strftime('%Y-%m-%d').tolist()
+
+
+class SpendingRollups:
+    """
+    cubes[period][bucket][category] = [cents, count] for every period, in
+    integer cents like ExpenseAggregates. add / remove touch three buckets
+    whatever the history length; records() reads only the buckets asked for.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.cubes = {period: {} for period in PERIODS}
+
+    @classmethod
+    def from_rows(cls, rows):
+        rollups = cls()
+        for row in rows:
+            rollups.add(row)
+        return rollups
+
+    def _apply(self, row, sign):
+        cents = sign * to_cents(row['Amount'])
+        category = row['Category']
+        for period, key in zip(PERIODS, bucket_keys(row['Date'])):
+            categories = self.cubes[period].setdefault(key, {})
+            bucket = categories.setdefault(category, [0, 0])
+            bucket[0] += cents
+            bucket[1] += sign
+            if bucket[1] == 0:
+                del categories[category]
+                if not categories:
+                    del self.cubes[period][key]
+
+    def add(self, row):
+        self._apply(row, 1)
+
+    def remove(self, row):
+        self._apply(row, -1)
+
+    def records(self, period, first=None, last=None, categories=None):
+        """(bucket, category, cents, count) for the buckets with keys from `first` to `last` (either may be None)."""
+        cube = self.cubes[period]
+        if first is not None and last is not None:
+            keys = bucket_range(period, first, last)
+        else:
+            keys = sorted(key for key in cube if (first is None or key >= first) and (last is None or key <= last))
+        return [(key, category, cents, count)
+                for key in keys
+                for category, (cents, count) in cube.get(key, {}).items()
+                if categories is None or category in categories]
+
+    def snapshot(self):
+        """{period: {(bucket, category): (cents, count)}}, for consistency checks."""
+        return {period: {(key, category): tuple(value)
+                         for key, categories in cube.items() for category, value in categories.items()}
+                for period, cube in self.cubes.items()}
+
+
+def diff_rollups(expected, actual):
+    """Human-readable differences between two rollup snapshots."""
+    problems = []
+    for period in PERIODS:
+        for key in sorted(set(expected[period]) | set(actual[period])):
+            want = expected[period].get(key, (0, 0))
+            have = actual[period].get(key, (0, 0))
+            if want != have:
+                problems.append(f"rollups[{period}][{key[0]}, {key[1]}]: expected {want}, maintained {have}")
+    return problems
+
+
+def spending(fetch, period='month', start=None, end=None, categories=None):
+    """
+    Amount spent per `period` bucket and category from `start` to `end`
+    (dates, inclusive; None for open-ended), as a DataFrame indexed by
+    bucket start with one column per category. Buckets and requested
+    categories without spending are zeros. `fetch(period, first, last,
+    categories)` returns the (bucket, category, cents, count) records of a
+    store's rollups.
+
+    A week or month only partly inside the range is summed from its days
+    in range, so "the last 90 days by week" covers exactly 90 days; the
+    cost is one read per bucket plus at most two partial buckets of days.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period {period!r}; expected one of {', '.join(PERIODS)}")
+    start = pd.Timestamp(start).date() if start is not None else None
+    end = pd.Timestamp(end).date() if end is not None else None
+    categories = list(categories) if categories else None
+    if start is not None and end is not None and start > end:
+        return _frame([], period, start, end, categories)
+
+    if period == 'day':
+        records = fetch('day', start and start.isoformat(), end and end.isoformat(), categories)
+        return _frame(records, period, start, end, categories)
+
+    records = []
+    first_full = start and bucket_start(period, start)
+    if start is not None and first_full != start:
+        # Leading partial bucket
+        edge_end = min(bucket_end(period, first_full), end or datetime.date.max)
+        records += _relabel(fetch('day', start.isoformat(), edge_end.isoformat(), categories), first_full)
+        first_full = edge_end + datetime.timedelta(days=1)
+    last_full = end and bucket_start(period, end)
+    if end is not None and bucket_end(period, last_full) != end and (first_full is None or last_full >= first_full):
+        # Trailing partial bucket
+        records += _relabel(fetch('day', last_full.isoformat(), end.isoformat(), categories), last_full)
+        last_full -= datetime.timedelta(days=1)
+    if first_full is None or last_full is None or first_full <= last_full:
+        records += fetch(period, first_full and first_full.isoformat(),
+                         last_full and bucket_start(period, last_full).isoformat(), categories)
+    return _frame(records, period, start, end, categories)
+
+
+def _relabel(records, bucket):
+    return [(bucket.isoformat(), category, cents, count) for _, category, cents, count in records]
+
+
+def _frame(records, period, start, end, categories=None):
+    # One record per bucket and category at most a few thousand: summed in a dict, pivot_table costs more
+    cents = {}
+    for bucket, category, amount, _ in records:
+        column = cents.setdefault(category, {})
+        column[bucket] = column.get(bucket, 0) + amount
+    table = pd.DataFrame(cents).sort_index().fillna(0) / 100
+    table.index = pd.to_datetime(table.index, format='%Y-%m-%d', errors='coerce')
+    table = table[table.index.notna()]  # buckets of unreadable dates: counted in the totals, not charted
+    table.columns.name = None
+    if categories:
+        table = table.reindex(columns=categories, fill_value=0)
+    first = start if start is not None else (table.index.min() if len(table) else None)
+    last = end if end is not None else (table.index.max() if len(table) else None)
+    if first is not None and last is not None:
+        table = table.reindex(pd.to_datetime(bucket_range(period, first, last)), fill_value=0.0)
+    table.index.name = period.title()
+    return table.astype(float)
+
+
+def main(argv=None):
+    from expense_store import get_store
+
+    parser = argparse.ArgumentParser(description="Spending per day / week / month and category from the rollups.")
+    parser.add_argument("--period", choices=PERIODS, default='month')
+    parser.add_argument("--days", type=int, help="only the last N days (default: everything)")
+    parser.add_argument("--category", action="append", help="only this category; repeatable")
+    parser.add_argument("--backend", choices=('csv', 'sqlite'), default=os.environ.get('BUDGETBEE_STORAGE', 'csv'))
+    parser.add_argument("--data", help="expense file (default: expenses.csv / expenses.db for the backend)")
+    args = parser.parse_args(argv)
+
+    today = datetime.date.today()
+    start = today - datetime.timedelta(days=args.days - 1) if args.days else None
+    table = get_store(args.data, args.backend).spending(args.period, start, today if args.days else None,
+                                                        args.category)
+    if table.empty:
+        print("No spending in that range.")
+        return
+    table['Total'] = table.sum(axis=1)
+    print(table.to_string(float_format=lambda amount: f"{amount:,.2f}"))
+
+
+if __name__ == "__main__":
+    main()
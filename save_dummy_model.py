@@ -1,4 +1,5 @@
-# save_dummy_model.py
+# save_dummy_model.py - Placeholder model for trying the apps without data;
+# train a real one from your expenses with train_model.py
 import joblib
 
 class DummyPipeline:
@@ -1,23 +1,30 @@
 import cv2
 import easyocr
 import csv
+import os
 import re  # <--- Add this line
+import sys
 
-# --- Step 1: Image Loading and Preprocessing ---
-print("Step 1: Loading and preprocessing the image...")
+# Shared preprocessing lives at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import preprocessing
+
+# --- Step 1: Image Loading ---
+print("Step 1: Loading the image...")
 image = cv2.imread('receipt_image.jpg') 
 if image is None:
     print("Error: Could not open the image file. Please check the name and path.")
     exit()
 
-gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-thresh_image = cv2.adaptiveThreshold(gray_image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-print("Image preprocessing complete.")
-
-# --- Step 2: Text Extraction with EasyOCR ---
-print("\nStep 2: Initializing EasyOCR and extracting text...")
+# --- Step 2: Preprocessing + Text Extraction with EasyOCR ---
+# "auto" tries the cheap presets first and stops once OCR confidence is good enough
+print("\nStep 2: Initializing EasyOCR, preprocessing and extracting text...")
 reader = easyocr.Reader(['en'])
-results = reader.readtext(thresh_image)
+results, report = preprocessing.read_receipt(image, reader.readtext, preset=os.environ.get('PREPROCESS_PRESET', 'auto'))
+for attempt in report['attempts']:
+    stage_times = ", ".join(f"{stage} {seconds * 1000:.1f}ms" for stage, seconds in attempt['stages'].items())
+    print(f"  preset {attempt['preset']}: confidence {attempt['confidence']:.2f}, OCR {attempt['ocr_seconds']:.2f}s ({stage_times})")
+print(f"Using preset: {report['preset']}")
 print("Text extraction complete.")
 
 # --- Step 3: Data Parsing ---
@@ -0,0 +1,411 @@
+# sqlite_store.py - Embedded SQLite backend for BudgetBee expenses
+import datetime
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from aggregates import to_cents
+from duplicates import WINDOW_DAYS, day_number, normalize_vendor
+from rollups import PERIODS
+from expense_store import BaseExpenseStore, COLUMNS, _normalize_row, _rows_to_frame, new_expense_id, read_store_rows
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS expenses (
+    id          TEXT PRIMARY KEY,
+    date        TEXT NOT NULL,   -- ISO yyyy-mm-dd, sorts chronologically
+    description TEXT NOT NULL,
+    amount      REAL NOT NULL,
+    category    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(date);
+-- (category, amount) covers per-category scans without touching the table
+CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses(category, amount);
+CREATE INDEX IF NOT EXISTS idx_expenses_description ON expenses(description COLLATE NOCASE);
+-- find_duplicates(): same amount in cents, dates in a window
+CREATE INDEX IF NOT EXISTS idx_expenses_cents_date ON expenses(CAST(ROUND(amount * 100) AS INTEGER), date);
+"""
+
+# Running totals for the dashboard, kept in integer cents and maintained by
+# triggers, so every writer (any process) updates them in O(1) and reads
+# cost O(categories) / O(months) instead of a scan of the expenses table.
+TOTALS_TABLES = """
+CREATE TABLE IF NOT EXISTS category_totals (
+    category    TEXT PRIMARY KEY,
+    total_cents INTEGER NOT NULL,
+    count       INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS month_totals (
+    month       TEXT PRIMARY KEY,   -- yyyy-mm
+    total_cents INTEGER NOT NULL,
+    count       INTEGER NOT NULL
+);
+-- Day / week / month x category cubes (see rollups.py); a range query is a
+-- primary-key range scan over the buckets asked for
+CREATE TABLE IF NOT EXISTS rollups (
+    period      TEXT NOT NULL,      -- day | week | month
+    bucket      TEXT NOT NULL,      -- yyyy-mm-dd the bucket starts on
+    category    TEXT NOT NULL,
+    total_cents INTEGER NOT NULL,
+    count       INTEGER NOT NULL,
+    PRIMARY KEY (period, bucket, category)
+) WITHOUT ROWID;
+"""
+INSERT_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS expenses_totals_insert AFTER INSERT ON expenses BEGIN
+    INSERT INTO category_totals (category, total_cents, count)
+        VALUES (NEW.category, CAST(ROUND(NEW.amount * 100) AS INTEGER), 1)
+        ON CONFLICT(category) DO UPDATE SET total_cents = total_cents + excluded.total_cents, count = count + 1;
+    INSERT INTO month_totals (month, total_cents, count)
+        VALUES (substr(NEW.date, 1, 7), CAST(ROUND(NEW.amount * 100) AS INTEGER), 1)
+        ON CONFLICT(month) DO UPDATE SET total_cents = total_cents + excluded.total_cents, count = count + 1;
+    INSERT INTO rollups (period, bucket, category, total_cents, count)
+        VALUES ('day', NEW.date, NEW.category, CAST(ROUND(NEW.amount * 100) AS INTEGER), 1),
+               ('week', COALESCE(date(NEW.date, 'weekday 0', '-6 days'), NEW.date), NEW.category,
+                CAST(ROUND(NEW.amount * 100) AS INTEGER), 1),
+               ('month', substr(NEW.date, 1, 7) || '-01', NEW.category, CAST(ROUND(NEW.amount * 100) AS INTEGER), 1)
+        ON CONFLICT(period, bucket, category) DO UPDATE SET total_cents = total_cents + excluded.total_cents,
+            count = count + 1;
+END
+"""
+DELETE_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS expenses_totals_delete AFTER DELETE ON expenses BEGIN
+    UPDATE category_totals SET total_cents = total_cents - CAST(ROUND(OLD.amount * 100) AS INTEGER), count = count - 1
+        WHERE category = OLD.category;
+    DELETE FROM category_totals WHERE category = OLD.category AND count = 0;
+    UPDATE month_totals SET total_cents = total_cents - CAST(ROUND(OLD.amount * 100) AS INTEGER), count = count - 1
+        WHERE month = substr(OLD.date, 1, 7);
+    DELETE FROM month_totals WHERE month = substr(OLD.date, 1, 7) AND count = 0;
+    UPDATE rollups SET total_cents = total_cents - CAST(ROUND(OLD.amount * 100) AS INTEGER), count = count - 1
+        WHERE period = 'day' AND bucket = OLD.date AND category = OLD.category;
+    UPDATE rollups SET total_cents = total_cents - CAST(ROUND(OLD.amount * 100) AS INTEGER), count = count - 1
+        WHERE period = 'week' AND bucket = COALESCE(date(OLD.date, 'weekday 0', '-6 days'), OLD.date)
+        AND category = OLD.category;
+    UPDATE rollups SET total_cents = total_cents - CAST(ROUND(OLD.amount * 100) AS INTEGER), count = count - 1
+        WHERE period = 'month' AND bucket = substr(OLD.date, 1, 7) || '-01' AND category = OLD.category;
+    DELETE FROM rollups WHERE period = 'day' AND bucket = OLD.date AND category = OLD.category AND count = 0;
+    DELETE FROM rollups WHERE period = 'week' AND bucket = COALESCE(date(OLD.date, 'weekday 0', '-6 days'), OLD.date)
+        AND category = OLD.category AND count = 0;
+    DELETE FROM rollups WHERE period = 'month' AND bucket = substr(OLD.date, 1, 7) || '-01'
+        AND category = OLD.category AND count = 0;
+END
+"""
+# (period, bucket, category, cents) of the expenses matching {where}, the
+# rows the triggers add to the rollups
+ROLLUP_ROWS = (
+    "SELECT 'day' AS period, date AS bucket, category, CAST(ROUND(amount * 100) AS INTEGER) AS cents"
+    " FROM expenses WHERE {where}"
+    " UNION ALL SELECT 'week', COALESCE(date(date, 'weekday 0', '-6 days'), date), category,"
+    " CAST(ROUND(amount * 100) AS INTEGER) FROM expenses WHERE {where}"
+    " UNION ALL SELECT 'month', substr(date, 1, 7) || '-01', category, CAST(ROUND(amount * 100) AS INTEGER)"
+    " FROM expenses WHERE {where}"
+)
+AGGREGATE_SCHEMA = TOTALS_TABLES + INSERT_TRIGGER + ";" + DELETE_TRIGGER + ";"
+
+# bulk_add() folds the rows it inserted (rowid > ?) into the totals in one pass
+BULK_TOTALS = [
+    "INSERT INTO category_totals (category, total_cents, count)"
+    " SELECT category, SUM(CAST(ROUND(amount * 100) AS INTEGER)), COUNT(*) FROM expenses WHERE rowid > ?"
+    " GROUP BY category"
+    " ON CONFLICT(category) DO UPDATE SET total_cents = total_cents + excluded.total_cents,"
+    " count = count + excluded.count",
+    "INSERT INTO month_totals (month, total_cents, count)"
+    " SELECT substr(date, 1, 7), SUM(CAST(ROUND(amount * 100) AS INTEGER)), COUNT(*) FROM expenses WHERE rowid > ?"
+    " GROUP BY substr(date, 1, 7)"
+    " ON CONFLICT(month) DO UPDATE SET total_cents = total_cents + excluded.total_cents,"
+    " count = count + excluded.count",
+    "INSERT INTO rollups (period, bucket, category, total_cents, count)"
+    " SELECT period, bucket, category, SUM(cents), COUNT(*) FROM ({rows}) GROUP BY period, bucket, category"
+    " ON CONFLICT(period, bucket, category) DO UPDATE SET total_cents = total_cents + excluded.total_cents,"
+    " count = count + excluded.count".format(rows=ROLLUP_ROWS.format(where="rowid > ?")),
+]
+
+POOL_SIZE = 4
+# Page cache (KiB) while bulk_add() runs, so index pages stay in memory
+BULK_CACHE_KIB = 64 * 1024
+
+_SELECT_ROWS = "SELECT id, date, description, amount, category FROM expenses"
+
+
+def _to_row(record):
+    return dict(zip(COLUMNS, record))
+
+
+class SQLiteExpenseStore(BaseExpenseStore):
+    """
+    Expenses in a SQLite database (WAL mode, so readers never block the
+    writer). History pages are answered by indexed queries and dashboard
+    numbers by the trigger-maintained totals tables, instead of loading the
+    whole history into a DataFrame.
+
+    Connections come from a small pool shared by every Streamlit session.
+    If the database is new and `import_from` (default: expenses.csv next to
+    it) exists, that CSV store - snapshot and journal - is imported once.
+    """
+
+    def __init__(self, path='expenses.db', pool_size=POOL_SIZE, import_from=None):
+        self.path = path
+        is_new = not os.path.exists(path)
+        self._pool = queue.Queue()
+        self._created = 0
+        self._pool_size = pool_size
+        self._create_lock = threading.Lock()
+
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            had_rollups = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rollups'"
+            ).fetchone()
+            if not had_rollups:
+                # Database from before the totals tables or the rollups existed:
+                # replace triggers that don't maintain them, then rebuild.
+                conn.execute("DROP TRIGGER IF EXISTS expenses_totals_insert")
+                conn.execute("DROP TRIGGER IF EXISTS expenses_totals_delete")
+            conn.executescript(AGGREGATE_SCHEMA)
+        if not had_rollups:
+            self.rebuild_aggregates()
+
+        if import_from is None:
+            import_from = os.path.join(os.path.dirname(os.path.abspath(path)), 'expenses.csv')
+        journal = os.path.splitext(import_from)[0] + '.log'
+        if is_new and (os.path.isfile(import_from) or os.path.isfile(journal)):
+            self.import_csv(import_from)
+
+    # -------------------------------
+    # Connection pool
+    # -------------------------------
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._create_lock:
+                can_create = self._created < self._pool_size
+                if can_create:
+                    self._created += 1
+            conn = self._connect() if can_create else self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def _transaction(self):
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        self._created = 0
+
+    # -------------------------------
+    # Writes
+    # -------------------------------
+    def add(self, date, description, amount, category):
+        row = _normalize_row({
+            'ID': new_expense_id(),
+            'Date': date,
+            'Description': description,
+            'Amount': amount,
+            'Category': category,
+        }, strict=True)
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO expenses (id, date, description, amount, category) VALUES (?, ?, ?, ?, ?)",
+                [row[column] for column in COLUMNS],
+            )
+        return row
+
+    def add_many(self, rows):
+        """Inserts (date, description, amount, category) tuples in one transaction."""
+        rows = [
+            _normalize_row({'ID': new_expense_id(), 'Date': d, 'Description': desc, 'Amount': a, 'Category': c},
+                           strict=True)
+            for d, desc, a, c in rows
+        ]
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO expenses (id, date, description, amount, category) VALUES (?, ?, ?, ?, ?)",
+                ([row[column] for column in COLUMNS] for row in rows),
+            )
+        return rows
+
+    @contextmanager
+    def bulk_add(self):
+        """
+        Every add(rows) in the block is inserted inside one write transaction,
+        committed when it exits. The per-row insert trigger is dropped for the
+        duration and the totals are updated once from the new rows instead;
+        both happen inside the transaction, so no other connection ever sees
+        the trigger missing or the totals out of step.
+        """
+        with self._transaction() as conn:
+            last_rowid = conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM expenses").fetchone()[0]
+            cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+            conn.execute(f"PRAGMA cache_size=-{BULK_CACHE_KIB}")
+            conn.execute("DROP TRIGGER IF EXISTS expenses_totals_insert")
+
+            def add(rows):
+                conn.executemany(
+                    "INSERT INTO expenses (id, date, description, amount, category) VALUES (?, ?, ?, ?, ?)",
+                    ([row[column] for column in COLUMNS] for row in (
+                        _normalize_row({'ID': new_expense_id(), 'Date': d, 'Description': desc, 'Amount': a,
+                                        'Category': c}, strict=True)
+                        for d, desc, a, c in rows)),
+                )
+
+            try:
+                yield add
+                for statement in BULK_TOTALS:
+                    conn.execute(statement, (last_rowid,) * statement.count('?'))
+                conn.execute(INSERT_TRIGGER)
+            finally:
+                conn.execute(f"PRAGMA cache_size={cache_size}")
+
+    def delete(self, expense_id):
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM expenses WHERE id = ?", (str(expense_id),))
+        return cursor.rowcount > 0
+
+    def clear(self):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM expenses")
+
+    def import_csv(self, path):
+        """
+        Copies every expense of the CSV store at `path` (its snapshot plus the
+        journal records not yet compacted into it) in one transaction,
+        keeping their IDs. The CSV store is only read, never written. Returns
+        the number of rows inserted (IDs already present are skipped).
+        """
+        rows = read_store_rows(path)
+        with self._transaction() as conn:
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO expenses (id, date, description, amount, category) VALUES (?, ?, ?, ?, ?)",
+                ([row[column] for column in COLUMNS] for row in rows),
+            )
+        return cursor.rowcount
+
+    # -------------------------------
+    # Indexed reads
+    # -------------------------------
+    def get(self, expense_id):
+        with self._connection() as conn:
+            record = conn.execute(_SELECT_ROWS + " WHERE id = ?", (str(expense_id),)).fetchone()
+        return _to_row(record) if record else None
+
+    def count(self):
+        with self._connection() as conn:
+            return conn.execute("SELECT COALESCE(SUM(count), 0) FROM category_totals").fetchone()[0]
+
+    def aggregates_snapshot(self):
+        with self._connection() as conn:
+            categories = conn.execute("SELECT category, total_cents, count FROM category_totals").fetchall()
+            months = conn.execute("SELECT month, total_cents, count FROM month_totals").fetchall()
+        return {
+            'total_cents': sum(cents for _, cents, _ in categories),
+            'count': sum(count for _, _, count in categories),
+            'categories': {category: (cents, count) for category, cents, count in categories},
+            'months': {month: (cents, count) for month, cents, count in months},
+        }
+
+    def rebuild_aggregates(self):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM category_totals")
+            conn.execute("DELETE FROM month_totals")
+            conn.execute(
+                "INSERT INTO category_totals (category, total_cents, count)"
+                " SELECT category, SUM(CAST(ROUND(amount * 100) AS INTEGER)), COUNT(*) FROM expenses GROUP BY category"
+            )
+            conn.execute(
+                "INSERT INTO month_totals (month, total_cents, count)"
+                " SELECT substr(date, 1, 7), SUM(CAST(ROUND(amount * 100) AS INTEGER)), COUNT(*)"
+                " FROM expenses GROUP BY substr(date, 1, 7)"
+            )
+            conn.execute("DELETE FROM rollups")
+            conn.execute(
+                "INSERT INTO rollups (period, bucket, category, total_cents, count)"
+                f" SELECT period, bucket, category, SUM(cents), COUNT(*) FROM ({ROLLUP_ROWS.format(where='1')})"
+                " GROUP BY period, bucket, category"
+            )
+
+    def rollup_records(self, period, first=None, last=None, categories=None):
+        # Primary-key range scan: (period, bucket between first and last)
+        where, params = "period = ?", [period]
+        if first is not None:
+            where, params = where + " AND bucket >= ?", params + [first]
+        if last is not None:
+            where, params = where + " AND bucket <= ?", params + [last]
+        if categories is not None:
+            where += f" AND category IN ({', '.join('?' * len(categories))})"
+            params += list(categories)
+        with self._connection() as conn:
+            return conn.execute(
+                "SELECT bucket, category, total_cents, count FROM rollups WHERE " + where + " ORDER BY bucket", params
+            ).fetchall()
+
+    def rollups_snapshot(self):
+        with self._connection() as conn:
+            records = conn.execute("SELECT period, bucket, category, total_cents, count FROM rollups").fetchall()
+        snapshot = {period: {} for period in PERIODS}
+        for period, bucket, category, cents, count in records:
+            snapshot.setdefault(period, {})[(bucket, category)] = (cents, count)
+        return snapshot
+
+    def page(self, offset=0, limit=100, search=None):
+        # Walks idx_expenses_date newest-first and stops after offset + limit rows.
+        where, params = "", []
+        if search:
+            escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            where, params = " WHERE description LIKE ? ESCAPE '\\'", [f"%{escaped}%"]
+        with self._connection() as conn:
+            records = conn.execute(
+                _SELECT_ROWS + where + " ORDER BY date DESC, rowid DESC LIMIT ? OFFSET ?", params + [limit, offset]
+            ).fetchall()
+        return _rows_to_frame([_to_row(record) for record in records])
+
+    def find_duplicates(self, date, description, amount):
+        # idx_expenses_cents_date narrows to the same amount within the window
+        # (a handful of rows); the vendor is compared on those in Python.
+        day = datetime.date.fromisoformat(str(date)[:10])
+        window = datetime.timedelta(days=WINDOW_DAYS)
+        with self._connection() as conn:
+            records = conn.execute(
+                _SELECT_ROWS + " WHERE CAST(ROUND(amount * 100) AS INTEGER) = ? AND date BETWEEN ? AND ?",
+                (to_cents(amount), (day - window).isoformat(), (day + window).isoformat()),
+            ).fetchall()
+        vendor = normalize_vendor(description)
+        rows = [_to_row(record) for record in records if normalize_vendor(record[2]) == vendor]
+        return sorted(rows, key=lambda row: abs(day_number(row['Date']) - day_number(day)))
+
+    def rows(self):
+        with self._connection() as conn:
+            return [_to_row(record) for record in conn.execute(_SELECT_ROWS + " ORDER BY date, rowid")]
+
+    def iter_rows(self):
+        # Table order (no sort), fetched in batches on a connection of our own
+        conn = self._connect()
+        try:
+            cursor = conn.execute(_SELECT_ROWS)
+            for records in iter(lambda: cursor.fetchmany(10000), []):
+                yield from map(_to_row, records)
+        finally:
+            conn.close()
@@ -0,0 +1,123 @@
+# startup.py - Lazy imports and startup timing for the BudgetBee apps
+#
+# The OCR / vision stack is expensive to import (easyocr pulls in torch),
+# so the apps take it through lazy_import() and only pay for it on first
+# scan. Imports made through here are timed; mark() records named startup
+# phases and mark_rendered() time-to-first-render, once per process.
+import importlib
+import importlib.util
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Imported first by every app, so this is (close to) when the app started
+STARTED = time.perf_counter()
+
+_lock = threading.Lock()
+_imports = {}      # module name -> seconds spent importing it
+_timings = {}      # label -> seconds (model load, ...)
+_phases = {}       # phase name -> seconds since STARTED
+_rendered = False
+
+
+def available(*names):
+    """True when every module in `names` is installed, without importing any of them."""
+    try:
+        return all(importlib.util.find_spec(name) is not None for name in names)
+    except (ImportError, ValueError):
+        return False
+
+
+def timed_import(name):
+    """Imports `name` (no-op if already imported) and records how long the first import took."""
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - start
+    with _lock:
+        _imports.setdefault(name, elapsed)
+    return module
+
+
+class LazyModule:
+    """Stands in for a module; the real import (timed) happens on first attribute access."""
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        if self._module is None:
+            self.__dict__['_module'] = timed_import(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+@contextmanager
+def timed(label):
+    """Records the seconds spent in the block under `label` (e.g. 'model load')."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _timings[label] = time.perf_counter() - start
+
+
+def mark(phase):
+    """Records that `phase` was reached, in seconds since startup; only the first time counts."""
+    with _lock:
+        _phases.setdefault(phase, time.perf_counter() - STARTED)
+
+
+def mark_rendered():
+    """Call at the end of a page run; the first call records time-to-first-render and prints the report to stderr."""
+    global _rendered
+    mark('first render')
+    with _lock:
+        if _rendered:
+            return
+        _rendered = True
+    summary = report()
+    slowest = sorted(summary['imports'].items(), key=lambda item: -item[1])[:5]
+    print(f"[startup] first render after {summary['phases']['first render']:.2f}s | phases: "
+          + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in summary['phases'].items())
+          + " | lazy imports: " + (", ".join(f"{name} {seconds:.2f}s" for name, seconds in slowest) or "none yet")
+          + "".join(f" | {label} {seconds:.2f}s" for label, seconds in summary['timings'].items()),
+          file=sys.stderr)
+
+
+def report():
+    """Phases (seconds since startup), per-module import seconds and other timings."""
+    with _lock:
+        return {'phases': dict(_phases), 'imports': dict(_imports), 'timings': dict(_timings)}
+
+
+def prometheus():
+    """report() as Prometheus text-format gauges."""
+    summary = report()
+    lines = ["# HELP budgetbee_startup_phase_seconds Seconds from process start to each startup phase",
+             "# TYPE budgetbee_startup_phase_seconds gauge"]
+    lines += [f'budgetbee_startup_phase_seconds{{phase="{phase}"}} {seconds:.6f}'
+              for phase, seconds in summary['phases'].items()]
+    lines += ["# HELP budgetbee_import_seconds Seconds spent on the first import of each lazily imported module",
+              "# TYPE budgetbee_import_seconds gauge"]
+    lines += [f'budgetbee_import_seconds{{module="{name}"}} {seconds:.6f}'
+              for name, seconds in summary['imports'].items()]
+    lines += ["# HELP budgetbee_startup_timing_seconds Seconds spent in timed startup steps such as loading the model",
+              "# TYPE budgetbee_startup_timing_seconds gauge"]
+    lines += [f'budgetbee_startup_timing_seconds{{label="{label}"}} {seconds:.6f}'
+              for label, seconds in summary['timings'].items()]
+    return "\n".join(lines) + "\n"
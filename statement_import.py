@@ -0,0 +1,465 @@
+# statement_import.py - Bulk import of bank statements (CSV, OFX/QFX, QIF)
+#
+# Statements are read in chunks of CHUNK_ROWS transactions, so memory stays
+# flat however long the file is. Each chunk is normalized (ISO dates,
+# spending as positive amounts, credits skipped), checked against a hash
+# index of the expenses already stored, categorized in one batch by the
+# categorizer engine (keyword rules, then the model for the rest) and handed
+# to the store's bulk_add(), which commits the whole import at once.
+#
+# Usage:
+#   python statement_import.py statement.csv [--map date="Txn Date" --map description=Narration]
+#   python statement_import.py export.ofx --backend sqlite
+#   python statement_import.py money.qif --date-format %d/%m/%Y --dry-run
+import argparse
+import os
+import re
+import sys
+import time
+import warnings
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+
+from duplicates import BulkDuplicateIndex, duplicate_keys, row_chunks
+
+CHUNK_ROWS = 50000
+FORMATS = ('csv', 'ofx', 'qif')
+EXTENSIONS = {'.csv': 'csv', '.txt': 'csv', '.ofx': 'ofx', '.qfx': 'ofx', '.qif': 'qif'}
+# Header names (case-insensitive) recognised for each field of a CSV statement
+COLUMN_ALIASES = {
+    'date': ['date', 'transaction date', 'txn date', 'posting date', 'posted date', 'booking date', 'value date'],
+    'description': ['description', 'narration', 'details', 'transaction details', 'particulars', 'payee',
+                    'merchant', 'name', 'memo', 'remarks'],
+    'amount': ['amount', 'transaction amount', 'amt'],
+    'debit': ['debit', 'debit amount', 'withdrawal', 'withdrawals', 'withdrawal amt', 'paid out', 'money out'],
+    'credit': ['credit', 'credit amount', 'deposit', 'deposits', 'deposit amt', 'paid in', 'money in'],
+    'category': ['category'],
+}
+# Signs of a spending amount in a CSV amount column ('auto': whichever sign
+# most of the file's amounts have); OFX and QIF always use negative
+SIGNS = ('auto', 'negative', 'positive')
+
+class StatementError(ValueError):
+    """Unknown format, or a CSV whose columns can't be mapped."""
+
+
+def detect_format(path):
+    fmt = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise StatementError(f"Can't tell the statement format of {path}; pass --format ({', '.join(FORMATS)})")
+    return fmt
+
+
+# -------------------------------
+# 1. READERS (chunks of raw string columns)
+# -------------------------------
+def map_columns(header, overrides=None):
+    """
+    {field: column} for a CSV header. `overrides` ({field: column name})
+    wins over COLUMN_ALIASES. Needs a date, a description and either an
+    amount or debit / credit columns.
+    """
+    by_name = {str(column).strip().casefold(): column for column in header}
+    mapping = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        found = next((by_name[alias] for alias in aliases if alias in by_name), None)
+        if found is not None and found not in mapping.values():
+            mapping[field] = found
+    for field, column in (overrides or {}).items():
+        if field not in COLUMN_ALIASES:
+            raise StatementError(f"Unknown field {field!r}; expected one of {', '.join(COLUMN_ALIASES)}")
+        if column not in header:
+            raise StatementError(f"Column {column!r} (for {field}) is not in the header: {', '.join(map(str, header))}")
+        mapping[field] = column
+    missing = [field for field in ('date', 'description') if field not in mapping]
+    if 'amount' not in mapping and 'debit' not in mapping:
+        missing.append('amount (or debit)')
+    if missing:
+        raise StatementError(f"Could not find columns for {', '.join(missing)} in header "
+                             f"{', '.join(map(str, header))}; map them with --map field=column")
+    return mapping
+
+
+def read_csv_chunks(path, mapping=None, chunk_rows=CHUNK_ROWS, encoding='utf-8-sig'):
+    """Yields DataFrames of up to `chunk_rows` rows with the mapped fields as string columns."""
+    header = pd.read_csv(path, nrows=0, encoding=encoding).columns.tolist()
+    columns = map_columns(header, mapping)
+    reader = pd.read_csv(path, usecols=list(columns.values()), dtype=str, keep_default_na=False,
+                         chunksize=chunk_rows, encoding=encoding, skipinitialspace=True)
+    for chunk in reader:
+        yield chunk.rename(columns={column: field for field, column in columns.items()})
+
+
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+
+def _ofx_tags(f, block=1 << 20):
+    """(closing, TAG, text) for every tag in an SGML or XML OFX file, read a block at a time."""
+    tail = ''
+    while True:
+        data = f.read(block)
+        text = tail + data
+        # The last tag may continue in the next block
+        cut = max(text.rfind('<'), 0) if data else len(text)
+        for match in _OFX_TAG.finditer(text, 0, cut):
+            yield match.group(1) == '/', match.group(2).upper(), match.group(3).strip()
+        tail = text[cut:]
+        if not data:
+            return
+
+
+def read_ofx_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yields DataFrames (date, description, amount) from the <STMTTRN> records of an OFX / QFX file."""
+    records, current = [], None
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for closing, tag, text in _ofx_tags(f):
+            if tag == 'STMTTRN':
+                # SGML OFX may leave records unclosed; a new one ends the previous
+                if current is not None:
+                    records.append(current)
+                current = None if closing else {}
+                if len(records) >= chunk_rows:
+                    yield _ofx_frame(records)
+                    records = []
+            elif current is not None and not closing and text:
+                current.setdefault(tag, text)
+    if current is not None:
+        records.append(current)
+    if records:
+        yield _ofx_frame(records)
+
+
+def _ofx_frame(records):
+    frame = pd.DataFrame.from_records(records, columns=['DTPOSTED', 'TRNAMT', 'NAME', 'MEMO']).fillna('')
+    return pd.DataFrame({
+        'date': frame['DTPOSTED'].str[:8],
+        'description': frame['NAME'].where(frame['NAME'] != '', frame['MEMO']),
+        'amount': frame['TRNAMT'],
+    })
+
+
+def read_qif_chunks(path, chunk_rows=CHUNK_ROWS):
+    """
+    Yields DataFrames (date, description, amount, category) from the records
+    of a QIF file. Transfers between accounts (category [Account]) are left
+    out: they move money rather than spend it.
+    """
+    records, current = [], {}
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if not line or line.startswith('!'):
+                continue
+            code, value = line[0], line[1:].strip()
+            if code == '^':
+                if current:
+                    records.append(current)
+                    current = {}
+                if len(records) >= chunk_rows:
+                    yield _qif_frame(records)
+                    records = []
+            # T and U both carry the amount; L is the category ([Account] for transfers)
+            elif code in 'DTUPML':
+                current.setdefault({'U': 'T'}.get(code, code), value)
+    if current:
+        records.append(current)
+    if records:
+        yield _qif_frame(records)
+
+
+def _qif_frame(records):
+    frame = pd.DataFrame.from_records(records, columns=['D', 'T', 'P', 'M', 'L']).fillna('')
+    frame = frame[~frame['L'].str.startswith('[')]
+    # Top-level category of Quicken's Category:Subcategory
+    category = frame['L'].str.split(':').str[0]
+    return pd.DataFrame({
+        # Quicken writes 1/31'24 for 2024 dates
+        'date': frame['D'].str.replace("'", '/', regex=False).str.replace(' ', '', regex=False),
+        'description': frame['P'].where(frame['P'] != '', frame['M']),
+        'amount': frame['T'],
+        'category': category,
+    })
+
+
+def read_chunks(path, fmt=None, mapping=None, chunk_rows=CHUNK_ROWS):
+    fmt = fmt or detect_format(path)
+    if fmt == 'csv':
+        return read_csv_chunks(path, mapping, chunk_rows)
+    if fmt == 'ofx':
+        return read_ofx_chunks(path, chunk_rows)
+    if fmt == 'qif':
+        return read_qif_chunks(path, chunk_rows)
+    raise StatementError(f"Unknown statement format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+# -------------------------------
+# 2. NORMALIZING (vectorized per chunk)
+# -------------------------------
+def parse_amounts(values):
+    """Floats from statement amount strings: '1,234.50', '-12', '(12.00)', '$12', '12.00 DR'. NaN if unparseable."""
+    text = values.astype(str).str.strip()
+    negative = text.str.startswith('(') & text.str.endswith(')') | text.str.upper().str.endswith('DR')
+    cleaned = text.str.replace(r"[^0-9.\-]", '', regex=True)
+    amounts = pd.to_numeric(cleaned.where(cleaned != '', None), errors='coerce')
+    return amounts.where(~negative, -amounts.abs())
+
+
+def parse_dates(values, date_format=None, dayfirst=False):
+    """
+    Timestamps (NaT if unreadable). Without `date_format` the format is
+    inferred from the first date and applied to all, vectorized; only dates
+    that don't fit it are parsed one by one.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)  # "Could not infer format" - handled below
+        dates = pd.to_datetime(values, format=date_format, dayfirst=dayfirst, errors='coerce')
+        if date_format is None:
+            retry = dates.isna() & (values.str.strip() != '')
+            if retry.any():
+                dates[retry] = pd.to_datetime(values[retry], format='mixed', dayfirst=dayfirst, errors='coerce')
+    return dates
+
+
+def normalize_descriptions(values):
+    """Runs of whitespace collapsed to one space, ends trimmed; only rows that need it are rewritten."""
+    text = values.astype(str)
+    messy = text.str.contains(r"\s\s|[^\S ]|^\s|\s$", regex=True)
+    if messy.any():
+        text = text.mask(messy, text[messy].str.replace(r"\s+", ' ', regex=True).str.strip())
+    return text
+
+
+def detect_sign(amounts):
+    """
+    Sign of spending in a column of signed amounts: 'positive' when most
+    non-zero amounts are positive (statements listing debits as positive
+    numbers), else 'negative'. Most statement lines are spending either way.
+    None if there are no non-zero amounts to go by.
+    """
+    amounts = amounts[amounts.notna() & (amounts != 0)]
+    if amounts.empty:
+        return None
+    return 'positive' if (amounts > 0).sum() * 2 > len(amounts) else 'negative'
+
+
+def normalize_chunk(raw, fmt, sign='negative', date_format=None, dayfirst=False):
+    """
+    (expenses, counts) for one raw chunk. `expenses` has Date (yyyy-mm-dd),
+    Description, Amount (positive spending) and Category (None where the
+    statement had none). `counts` holds how many rows were credits (money
+    in, skipped) and how many were rejected for an unreadable date or amount.
+    A `sign` of 'auto' is decided from this chunk's amounts (detect_sign).
+    """
+    dates = parse_dates(raw['date'], '%Y%m%d' if fmt == 'ofx' else date_format, dayfirst)
+
+    if 'amount' in raw:
+        signed = parse_amounts(raw['amount'])
+        if sign == 'auto':
+            sign = detect_sign(signed) or 'negative'
+        spending = -signed if sign == 'negative' or fmt != 'csv' else signed
+    else:
+        # Separate debit / credit columns: a debit is spending, whatever its sign
+        spending = parse_amounts(raw['debit']).abs()
+        if 'credit' in raw:
+            credit = parse_amounts(raw['credit']).abs().fillna(0)
+            spending = spending.where(spending.notna() | (credit == 0), -credit)
+
+    bad = dates.isna() | spending.isna()
+    credits = ~bad & (spending <= 0)
+    keep = ~bad & ~credits
+    category = raw['category'] if 'category' in raw else pd.Series(None, index=raw.index, dtype=object)
+    expenses = pd.DataFrame({
+        'Date': dates[keep].dt.strftime('%Y-%m-%d'),
+        'Description': normalize_descriptions(raw['description'][keep]),
+        'Amount': spending[keep].round(2),
+        'Category': category[keep].where(category[keep].astype(bool), None),
+    })
+    return expenses, {'credits': int(credits.sum()), 'rejected': int(bad.sum())}
+
+
+# -------------------------------
+# 3. DUPLICATES (hash index of stored expenses; near duplicates in duplicates.py)
+# -------------------------------
+def expense_keys(dates, descriptions, amounts):
+    """64-bit hash per expense of (date, lowercased description, amount in cents); descriptions already normalized."""
+    amounts = np.asarray(amounts, dtype=float)
+    frame = pd.DataFrame({
+        'date': np.asarray(dates, dtype=object),
+        'description': pd.Series(np.asarray(descriptions, dtype=object)).astype(str).str.lower(),
+        # Half away from zero, like aggregates.to_cents
+        'cents': np.copysign(np.floor(np.abs(amounts) * 100 + 0.5), amounts).astype(np.int64),
+    })
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def _chunk_keys(chunk):
+    return expense_keys(chunk['Date'], normalize_descriptions(chunk['Description']), chunk['Amount'])
+
+
+class ExpenseIndex:
+    """
+    How many stored expenses share each (date, description, amount) key, as
+    a sorted uint64 array plus counts. A statement row is a duplicate while
+    the file hasn't yet used up the stored copies of its key, so importing
+    the same statement twice adds nothing, while two identical coffees on
+    the same day in one statement are both kept.
+    """
+
+    def __init__(self, keys=()):
+        self.keys, self.counts = np.unique(np.asarray(keys, dtype=np.uint64), return_counts=True)
+        self._used = {}
+
+    @classmethod
+    def from_rows(cls, rows, chunk_rows=CHUNK_ROWS):
+        """Index of an iterable of store rows, hashed a chunk at a time so only the keys are held."""
+        keys = [_chunk_keys(chunk) for chunk in row_chunks(rows, chunk_rows)]
+        return cls(np.concatenate(keys) if keys else ())
+
+    def __len__(self):
+        return int(self.counts.sum())
+
+    def new_rows(self, keys):
+        """Boolean mask of the rows in `keys` that are not duplicates of stored expenses."""
+        keep = np.ones(len(keys), dtype=bool)
+        if not len(self.keys):
+            return keep
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = np.flatnonzero(self.keys[positions] == keys)
+        used = self._used
+        for i in found:
+            position = positions[i]
+            seen = used.get(position, 0)
+            if seen < self.counts[position]:
+                used[position] = seen + 1
+                keep[i] = False
+        return keep
+
+
+# -------------------------------
+# 4. IMPORT
+# -------------------------------
+def import_statement(path, store, fmt=None, mapping=None, sign='auto', date_format=None, dayfirst=False,
+                     chunk_rows=CHUNK_ROWS, engine=None, dry_run=False, skip_near_duplicates=False, progress=None):
+    """
+    Streams the statement at `path` into `store` in one bulk_add() commit
+    and returns a report: rows read, imported, duplicates, near_duplicates,
+    credits, rejected, categories by source, seconds and rows_per_second.
+    Near duplicates (duplicates.py: same amount and vendor a few days from
+    a stored expense or an earlier row, e.g. a scanned receipt) are counted
+    and imported unless `skip_near_duplicates`. A `sign` of 'auto' is
+    decided once, from the first chunk with amounts, and reported as
+    report['sign']. With `dry_run` nothing is written. `progress(report)`
+    runs after each chunk.
+    """
+    if engine is None:
+        from categorizer import default_engine
+        engine = default_engine()
+    fmt = fmt or detect_format(path)
+    start = time.perf_counter()
+    report = {'file': path, 'format': fmt, 'sign': sign, 'rows': 0, 'imported': 0, 'duplicates': 0, 'near_duplicates': 0,
+              'credits': 0, 'rejected': 0, 'sources': {'statement': 0, 'rules': 0, 'model': 0, 'default': 0}}
+
+    # Both indexes from one pass over the stored expenses
+    store.refresh()
+    exact, near = [], []
+    for chunk in row_chunks(store.iter_rows(), chunk_rows):
+        exact.append(_chunk_keys(chunk))
+        near.append(duplicate_keys(chunk['Date'], chunk['Description'], chunk['Amount']))
+    index = ExpenseIndex(np.concatenate(exact) if exact else ())
+    nearby = BulkDuplicateIndex(np.concatenate(near) if near else ())
+    del exact, near
+    report['index_seconds'] = time.perf_counter() - start
+
+    with nullcontext(lambda rows: None) if dry_run else store.bulk_add() as add:
+        for raw in read_chunks(path, fmt, mapping, chunk_rows):
+            if report['sign'] == 'auto' and fmt == 'csv' and 'amount' in raw:
+                # One convention for the whole file, not a guess per chunk
+                report['sign'] = detect_sign(parse_amounts(raw['amount'])) or 'auto'
+            expenses, counts = normalize_chunk(raw, fmt, report['sign'], date_format, dayfirst)
+            report['rows'] += len(raw)
+            report['credits'] += counts['credits']
+            report['rejected'] += counts['rejected']
+
+            new = index.new_rows(expense_keys(expenses['Date'], expenses['Description'], expenses['Amount']))
+            report['duplicates'] += int((~new).sum())
+            expenses = expenses[new]
+
+            flagged = nearby.flag(expenses['Date'], expenses['Description'], expenses['Amount'])
+            report['near_duplicates'] += int(flagged.sum())
+            if skip_near_duplicates:
+                expenses = expenses[~flagged]
+
+            missing = expenses['Category'].isna()
+            report['sources']['statement'] += int((~missing).sum())
+            if missing.any():
+                predicted = engine.categorize_many(expenses.loc[missing, 'Description'])
+                expenses.loc[missing, 'Category'] = predicted['Category']
+                for source, count in predicted['Source'].value_counts().items():
+                    report['sources'][source] += int(count)
+
+            add(expenses[['Date', 'Description', 'Amount', 'Category']].itertuples(index=False, name=None))
+            report['imported'] += len(expenses)
+            if progress:
+                progress(report)
+
+    report['seconds'] = time.perf_counter() - start
+    report['rows_per_second'] = report['rows'] / report['seconds'] if report['seconds'] else 0.0
+    return report
+
+
+def _parse_mapping(pairs):
+    mapping = {}
+    for pair in pairs or []:
+        field, sep, column = pair.partition('=')
+        if not sep:
+            raise StatementError(f"--map expects field=column, got {pair!r}")
+        mapping[field.strip().lower()] = column
+    return mapping
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import bank statements (CSV, OFX/QFX, QIF) into BudgetBee.")
+    parser.add_argument("statements", nargs="+")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    parser.add_argument("--map", action="append", metavar="FIELD=COLUMN",
+                        help=f"CSV column for a field ({', '.join(COLUMN_ALIASES)}); repeatable")
+    parser.add_argument("--sign", choices=SIGNS, default='auto',
+                        help="sign of spending in a CSV amount column (default: auto, the sign most amounts have)")
+    parser.add_argument("--date-format", help="strftime format of the dates, e.g. %%d/%%m/%%Y (default: inferred)")
+    parser.add_argument("--dayfirst", action="store_true", help="read ambiguous dates as day/month")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--backend", choices=('csv', 'sqlite'), default=os.environ.get('BUDGETBEE_STORAGE', 'csv'))
+    parser.add_argument("--data", help="expense file (default: expenses.csv / expenses.db for the backend)")
+    parser.add_argument("--skip-near-duplicates", action="store_true",
+                        help="also leave out rows that look like an expense already added, e.g. from a receipt")
+    parser.add_argument("--dry-run", action="store_true", help="parse, dedupe and categorize but write nothing")
+    args = parser.parse_args(argv)
+
+    from expense_store import get_store
+
+    store = get_store(args.data, args.backend)
+
+    def progress(report):
+        print(f"  {report['rows']:>12,} rows read, {report['imported']:,} new", file=sys.stderr)
+
+    try:
+        mapping = _parse_mapping(args.map)
+        for path in args.statements:
+            report = import_statement(path, store, args.format, mapping, args.sign, args.date_format, args.dayfirst,
+                                      args.chunk_rows, dry_run=args.dry_run,
+                                      skip_near_duplicates=args.skip_near_duplicates, progress=progress)
+            sources = ", ".join(f"{source} {count:,}" for source, count in report['sources'].items() if count)
+            print(f"{path}: {report['rows']:,} rows in {report['seconds']:.2f}s "
+                  f"({report['rows_per_second']:,.0f} rows/s); "
+                  f"{'would import' if args.dry_run else 'imported'} {report['imported']:,}, "
+                  f"{report['duplicates']:,} duplicates, {report['near_duplicates']:,} near duplicates "
+                  f"({'skipped' if args.skip_near_duplicates else 'imported'}), {report['credits']:,} credits skipped, "
+                  f"{report['rejected']:,} unreadable" + (f"; categories: {sources}" if sources else ""))
+    except (StatementError, FileNotFoundError) as e:
+        raise SystemExit(str(e))
+
+
+if __name__ == "__main__":
+    main()
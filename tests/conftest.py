@@ -0,0 +1,14 @@
+# conftest.py - Shared fixtures; the modules under test live in the repo root
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """An empty directory to run in, so stores and caches don't touch the repo."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,83 @@
+# test_expense_store.py - Journaled CSV store
+import pandas as pd
+import pytest
+
+import expense_store
+from expense_store import ExpenseStore, read_store_rows
+
+
+def test_add_rejects_unreadable_date(workdir):
+    store = ExpenseStore(str(workdir / 'expenses.csv'))
+    with pytest.raises(ValueError):
+        store.add('not a date', 'Coffee', 3.5, 'Food')
+
+
+def test_page_survives_stored_unreadable_date(workdir):
+    # Snapshot from before dates were normalized on write
+    (workdir / 'expenses.csv').write_text(
+        "ID,Date,Description,Amount,Category\n"
+        "a1,n/a,Legacy row,1.50,Food\n"
+        "a2,2024-01-05,Coffee,3.50,Food\n"
+    )
+    store = ExpenseStore(str(workdir / 'expenses.csv'))
+    lunch = store.add('2024-01-06', 'Lunch', 9.0, 'Food')
+
+    page = store.page(limit=10)
+    assert set(page.index) == {'a1', 'a2', lunch['ID']}
+    assert pd.isna(page.loc['a1', 'Date'])
+    assert page.loc['a2', 'Date'] == pd.Timestamp('2024-01-05')
+    assert len(store.page(limit=10, search='legacy')) == 1
+    assert len(store.to_frame()) == 3
+
+
+class Crash(Exception):
+    pass
+
+
+def _journal_with_clear(path):
+    store = ExpenseStore(path, use_arrow=False)
+    store.add('2024-01-01', 'Gone', 1.0, 'Food')
+    store.clear()
+    kept = store.add('2024-01-02', 'Kept', 2.0, 'Food')
+    return store, kept['ID']
+
+
+def test_bulk_add_survives_crash_before_journal_truncate(workdir, monkeypatch):
+    path = str(workdir / 'expenses.csv')
+    store, kept = _journal_with_clear(path)
+
+    def crash(self):
+        raise Crash
+    monkeypatch.setattr(ExpenseStore, '_truncate_log', crash)
+    with pytest.raises(Crash):
+        with store.bulk_add() as add:
+            add([('2024-02-01', 'Bulk', 3.0, 'Food'), ('2024-02-02', 'Bulk', 4.0, 'Food')])
+    monkeypatch.undo()
+
+    # The old journal, 'clear' included, is still there next to the new snapshot
+    reopened = ExpenseStore(path, use_arrow=False)
+    assert reopened.count() == 3
+    assert reopened.get(kept)['Description'] == 'Kept'
+    assert sorted(row['Description'] for row in read_store_rows(path)) == ['Bulk', 'Bulk', 'Kept']
+
+    # Writes after the crash are replayed, and the next compaction cleans up
+    reopened.add('2024-03-01', 'Later', 5.0, 'Food')
+    assert ExpenseStore(path, use_arrow=False).count() == 4
+    reopened.compact()
+    assert ExpenseStore(path, use_arrow=False).count() == 4
+
+
+def test_bulk_add_crash_before_replace_keeps_old_state(workdir, monkeypatch):
+    path = str(workdir / 'expenses.csv')
+    store, kept = _journal_with_clear(path)
+
+    def crash(src, dst):
+        raise Crash
+    monkeypatch.setattr(expense_store.os, 'replace', crash)
+    with pytest.raises(Crash):
+        with store.bulk_add() as add:
+            add([('2024-02-01', 'Bulk', 3.0, 'Food')])
+    monkeypatch.undo()
+
+    reopened = ExpenseStore(path, use_arrow=False)
+    assert [row['ID'] for row in reopened.iter_rows()] == [kept]
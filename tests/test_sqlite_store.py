@@ -0,0 +1,24 @@
+# test_sqlite_store.py - SQLite backend
+from expense_store import ExpenseStore
+from sqlite_store import SQLiteExpenseStore
+
+
+def _snapshot(directory):
+    return {path.name: path.read_bytes() for path in directory.iterdir()}
+
+
+def test_first_open_imports_csv_store_without_touching_it(workdir):
+    source = workdir / 'source'
+    source.mkdir()
+    csv_store = ExpenseStore(str(source / 'expenses.csv'), compact_every=3)
+    ids = [csv_store.add(f'2024-01-0{day}', f'Coffee {day}', day, 'Food')['ID'] for day in range(1, 6)]
+    csv_store.delete(ids[0])
+    before = _snapshot(source)
+    assert 'expenses.log' in before  # some expenses only exist in the journal
+
+    store = SQLiteExpenseStore(str(workdir / 'expenses.db'), import_from=str(source / 'expenses.csv'))
+
+    assert sorted(row['ID'] for row in store.rows()) == sorted(ids[1:])
+    assert _snapshot(source) == before
+    assert store.import_csv(str(source / 'expenses.csv')) == 0  # nothing new the second time
+    store.close()
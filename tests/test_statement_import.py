@@ -0,0 +1,31 @@
+# test_statement_import.py - Bank statement import
+import pandas as pd
+
+from expense_store import ExpenseStore
+from statement_import import import_statement
+
+
+class OtherEngine:
+    """Categorizer engine that files everything under Other."""
+
+    def categorize_many(self, descriptions):
+        return pd.DataFrame({'Category': 'Other', 'Source': 'default'}, index=descriptions.index)
+
+
+def test_import_with_unreadable_stored_date(workdir):
+    (workdir / 'expenses.csv').write_text(
+        "ID,Date,Description,Amount,Category\n"
+        "a1,n/a,STARBUCKS,4.50,Food\n"
+        "a2,2024-01-02,STARBUCKS,4.50,Food\n"
+    )
+    store = ExpenseStore(str(workdir / 'expenses.csv'))
+    statement = workdir / 'statement.csv'
+    statement.write_text("Date,Description,Amount\n"
+                         "2024-01-03,POS STARBUCKS 1234,-4.50\n"
+                         "2024-01-20,UBER TRIP,-12.00\n")
+
+    report = import_statement(str(statement), store, engine=OtherEngine())
+
+    assert report['imported'] == 2
+    assert report['near_duplicates'] == 1  # the coffee a day after the stored one
+    assert len(store) == 4
@@ -0,0 +1,21 @@
+# test_text_classifier.py - Compact serving model
+import warnings
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from text_classifier import HashedTextClassifier
+
+
+def test_predict_proba_large_scores_do_not_overflow():
+    vectorizer = HashingVectorizer(analyzer='char_wb', ngram_range=(2, 3), n_features=2 ** 10, alternate_sign=False)
+    coef = np.zeros((3, 2 ** 10))
+    coef[:, :] = [[1000.0], [-1000.0], [0.0]]
+    model = HashedTextClassifier(vectorizer, ['Food', 'Transport', 'Other'], coef, [0.0, -200.0, 0.0])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        proba = model.predict_proba(['coffee', 'bus ticket to the airport'])
+    assert np.isfinite(proba).all()
+    np.testing.assert_allclose(proba.sum(axis=1), 1)
+    assert (model.predict(['coffee']) == ['Food']).all()
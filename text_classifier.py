@@ -0,0 +1,100 @@
+# text_classifier.py - Compact linear classifier over hashed character n-grams
+#
+# What train_model.py writes to budgetbee_pipeline.joblib. Kept separate from
+# the training command so servers that unpickle the model only import numpy,
+# scipy and sklearn's HashingVectorizer.
+import math
+from collections import Counter
+
+import numpy as np
+
+# Batches up to this size are hashed in Python: HashingVectorizer.transform
+# costs ~0.3 ms per call before it looks at the text, which dominates a
+# single-item predict.
+SMALL_BATCH = 16
+
+
+class HashedTextClassifier:
+    """
+    A fitted linear model (one weight vector per category) over the hashed
+    char n-grams of a HashingVectorizer, cut down for serving.
+
+    Of the vectorizer's hash buckets only those some category gives a
+    non-zero weight are kept, in sorted order, with their weights as one
+    dense (buckets x categories) float32 matrix. Predicting maps each
+    n-gram's bucket to its row with a binary search (unknown buckets drop
+    out) and multiplies the remapped sparse features by that matrix, so the
+    cost depends on the text length, not on the number of hash buckets.
+    Small batches skip HashingVectorizer.transform's per-call overhead and
+    hash the analyzer's n-grams directly, the same way it does.
+    Probabilities are normalised one-vs-rest sigmoids, as sklearn's
+    SGDClassifier(loss='log_loss') computes them.
+    """
+
+    def __init__(self, vectorizer, classes, coef, intercept):
+        coef = np.atleast_2d(np.asarray(coef))
+        used = np.flatnonzero(np.any(coef != 0, axis=0))
+        self.vectorizer = vectorizer
+        self.classes_ = np.asarray(classes, dtype=object)
+        self.buckets = used.astype(np.int32)
+        self.weights = np.ascontiguousarray(coef[:, used].T, dtype=np.float32)
+        self.intercept = np.asarray(intercept, dtype=np.float32)
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """Compacts a fitted make_pipeline(HashingVectorizer, linear classifier)."""
+        vectorizer, estimator = pipeline[0], pipeline[-1]
+        return cls(vectorizer, estimator.classes_, estimator.coef_, estimator.intercept_)
+
+    @property
+    def nnz(self):
+        return int(np.count_nonzero(self.weights))
+
+    def _hash_small(self, texts):
+        """HashingVectorizer.transform(texts) (term counts, l2-normalised, unsigned) computed in Python."""
+        from scipy.sparse import csr_matrix
+        from sklearn.utils.murmurhash import murmurhash3_32
+
+        analyze = self.vectorizer.build_analyzer()
+        n_features = self.vectorizer.n_features
+        indices, data, indptr = [], [], [0]
+        for text in texts:
+            counts = Counter()
+            for gram in analyze(text):
+                h = murmurhash3_32(gram, seed=0)
+                # FeatureHasher's bucket for a signed 32-bit hash, including the abs() overflow case
+                counts[(2147483647 - (n_features - 1)) % n_features if h == -2147483648 else abs(h) % n_features] += 1
+            norm = math.sqrt(sum(c * c for c in counts.values())) or 1.0
+            for bucket in sorted(counts):
+                indices.append(bucket)
+                data.append(counts[bucket] / norm)
+            indptr.append(len(indices))
+        return csr_matrix((np.array(data, dtype=self.vectorizer.dtype), np.array(indices, dtype=np.int32), indptr),
+                          shape=(len(texts), n_features))
+
+    def decision_function(self, texts):
+        from scipy.sparse import csr_matrix
+
+        texts = list(texts)
+        features = self._hash_small(texts) if len(texts) <= SMALL_BATCH else self.vectorizer.transform(texts)
+        rows = np.searchsorted(self.buckets, features.indices)
+        np.minimum(rows, len(self.buckets) - 1, out=rows)
+        known = self.buckets[rows] == features.indices
+        remapped = csr_matrix((features.data * known, rows, features.indptr),
+                              shape=(features.shape[0], len(self.buckets)))
+        return remapped @ self.weights + self.intercept
+
+    def predict_proba(self, texts):
+        from scipy.special import expit  # 1 / (1 + exp(-x)) without overflowing for large negative scores
+
+        scores = self.decision_function(texts)
+        if scores.shape[1] == 1:
+            positive = expit(scores[:, 0])
+            return np.column_stack([1 - positive, positive])
+        proba = expit(scores)
+        return proba / proba.sum(axis=1, keepdims=True)
+
+    def predict(self, texts):
+        scores = self.decision_function(texts)
+        best = (scores[:, 0] > 0).astype(int) if scores.shape[1] == 1 else scores.argmax(axis=1)
+        return self.classes_[best]
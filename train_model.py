@@ -0,0 +1,162 @@
+# train_model.py - Train the categorization model from the expense history
+#
+# Hashed character n-grams (no vocabulary to store) feed a linear classifier
+# trained with SGD on the distinct descriptions, weighted by how often each
+# occurs. Features stay scipy-sparse from vectorizing to predicting, and
+# only the weights of hash buckets seen in training are kept
+# (text_classifier.HashedTextClassifier), so the model file is small and
+# memory-maps cleanly (model_loader.load_pipeline). The result is written
+# to budgetbee_pipeline.joblib and published to the model registry as the
+# next version (model_registry.py), which servers pick up once activated.
+#
+# Usage:
+#   python train_model.py                              # expenses.csv -> budgetbee_pipeline.joblib + registry
+#   python train_model.py --backend sqlite --data expenses.db --activate
+#   python train_model.py --no-publish --output /tmp/candidate.joblib
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+from categorizer import DEFAULT_CATEGORY
+from expense_store import get_store
+from model_loader import MODEL_PATH
+from model_registry import DEFAULT_ROOT, ModelRegistry
+from text_classifier import HashedTextClassifier
+
+# Hash buckets for the char n-grams; collisions cost a little accuracy, never memory
+N_FEATURES = 2 ** 18
+NGRAM_RANGE = (2, 4)
+# Share of distinct descriptions held out to report accuracy
+HOLDOUT = 0.2
+# Items per call when measuring batch throughput
+BATCH_SIZE = 1000
+
+
+def build_pipeline(n_features=N_FEATURES, seed=0):
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import make_pipeline
+
+    # log_loss gives predict_proba, which HybridCategorizer reports as confidence
+    return make_pipeline(
+        HashingVectorizer(n_features=n_features, analyzer='char_wb', ngram_range=NGRAM_RANGE,
+                          alternate_sign=False, dtype=np.float32),
+        SGDClassifier(loss='log_loss', alpha=1e-5, max_iter=20, tol=None, random_state=seed),
+    )
+
+
+def fit(descriptions, labels, n_features=N_FEATURES, seed=0):
+    """HashedTextClassifier trained on each distinct (description, category) pair once, weighted by its count."""
+    counts = Counter(zip(descriptions, labels))
+    pairs = list(counts)
+    pipeline = build_pipeline(n_features, seed).fit(
+        [d for d, _ in pairs], [c for _, c in pairs],
+        sgdclassifier__sample_weight=np.fromiter(counts.values(), dtype=float, count=len(pairs)))
+    return HashedTextClassifier.from_pipeline(pipeline)
+
+
+def training_data(store, keep_default=False):
+    """(descriptions, categories) from the store; DEFAULT_CATEGORY rows are skipped unless `keep_default`."""
+    descriptions, labels = [], []
+    for row in store.rows():
+        text = row['Description'].strip()
+        if text and (keep_default or row['Category'] != DEFAULT_CATEGORY):
+            descriptions.append(text)
+            labels.append(row['Category'])
+    return descriptions, labels
+
+
+def holdout_accuracy(descriptions, labels, n_features, seed=0):
+    """Accuracy on HOLDOUT of the distinct descriptions, trained on the rest (None if too little data)."""
+    distinct = sorted(set(descriptions))
+    random.Random(seed).shuffle(distinct)
+    held = set(distinct[:int(len(distinct) * HOLDOUT)])
+    train = [(d, c) for d, c in zip(descriptions, labels) if d not in held]
+    test = [(d, c) for d, c in zip(descriptions, labels) if d in held]
+    if not test or len({c for _, c in train}) < 2:
+        return None
+    model = fit(*zip(*train), n_features=n_features, seed=seed)
+    predicted = model.predict([d for d, _ in test])
+    return float(np.mean([p == c for p, (_, c) in zip(predicted, test)]))
+
+
+def throughput(model, descriptions, single=2000):
+    """Median and p99 seconds per single-item predict_proba call, and items/s for BATCH_SIZE batches."""
+    rng = random.Random(0)
+    sample = [rng.choice(descriptions) for _ in range(max(single, BATCH_SIZE))]
+    model.predict_proba(sample[:10])
+    timings = []
+    for text in sample[:single]:
+        start = time.perf_counter()
+        model.predict_proba([text])
+        timings.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(5):
+        model.predict_proba(sample[:BATCH_SIZE])
+    batch_rate = 5 * BATCH_SIZE / (time.perf_counter() - start)
+    return float(np.median(timings)), float(np.percentile(timings, 99)), batch_rate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the categorization model from the expense history.")
+    parser.add_argument("--backend", choices=('csv', 'sqlite'), default=os.environ.get('BUDGETBEE_STORAGE', 'csv'))
+    parser.add_argument("--data", help="expense file (default: expenses.csv / expenses.db for the backend)")
+    parser.add_argument("--output", default=MODEL_PATH, help=f"model file to write (default: {MODEL_PATH})")
+    parser.add_argument("--features", type=int, default=N_FEATURES, help="hash buckets for the char n-grams")
+    parser.add_argument("--keep-default", action="store_true",
+                        help=f"also learn '{DEFAULT_CATEGORY}' (by default those rows are unlabelled leftovers)")
+    parser.add_argument("--registry", default=DEFAULT_ROOT)
+    parser.add_argument("--no-publish", action="store_true", help="only write --output, don't add a registry version")
+    parser.add_argument("--activate", action="store_true", help="make the new version active straight away")
+    args = parser.parse_args(argv)
+
+    import joblib
+
+    descriptions, labels = training_data(get_store(args.data, args.backend), args.keep_default)
+    classes = sorted(set(labels))
+    if len(classes) < 2:
+        raise SystemExit(f"Need expenses in at least two categories to train; found {classes or 'none'}")
+    print(f"Training on {len(descriptions):,} expenses ({len(set(descriptions)):,} distinct), "
+          f"{len(classes)} categories: {', '.join(classes)}")
+
+    accuracy = holdout_accuracy(descriptions, labels, args.features)
+    start = time.perf_counter()
+    model = fit(descriptions, labels, args.features)
+    train_seconds = time.perf_counter() - start
+    # Uncompressed, so load_pipeline can memory-map the weights. Written
+    # beside the output and renamed over it: servers may have the old file
+    # memory-mapped, and rewriting it in place would change their weights.
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(args.output)), prefix=".tmp-", suffix=".joblib")
+    os.close(fd)
+    try:
+        joblib.dump(model, tmp)
+        os.replace(tmp, args.output)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    size = os.path.getsize(args.output)
+    model = joblib.load(args.output, mmap_mode='r')
+    single, single_p99, batch_rate = throughput(model, descriptions)
+
+    print(f"  train time       {train_seconds:8.2f} s")
+    print(f"  model size       {size / 1024:8.1f} KiB ({model.nnz:,} weights in {len(model.buckets):,} buckets) -> {args.output}")
+    if accuracy is not None:
+        print(f"  holdout accuracy {accuracy:8.1%} ({HOLDOUT:.0%} of distinct descriptions)")
+    print(f"  predict, single  {single * 1e6:8.0f} us median, {single_p99 * 1e6:.0f} us p99")
+    print(f"  predict, batch   {batch_rate:8,.0f} items/s ({BATCH_SIZE} per call)")
+
+    if not args.no_publish:
+        note = (f"{len(descriptions)} expenses, {len(classes)} categories"
+                + (f", holdout accuracy {accuracy:.3f}" if accuracy is not None else ""))
+        version = ModelRegistry(args.registry).publish(args.output, note=note, activate=args.activate)
+        print(f"Published {version}" + (" (active)" if args.activate else
+                                        f"; activate with: python model_registry.py activate {version}"))
+
+
+if __name__ == "__main__":
+    main()